@@ -1,20 +1,58 @@
 import csv
+import hashlib
 import os
 import json
+import logging
 import asyncio
 import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 
-from flask import Flask, request, jsonify, send_from_directory, redirect, url_for, Response
-import requests
+from flask import Flask, request, jsonify, send_file, redirect, url_for, Response, g
 from flask_cors import CORS
 import sqlite3
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from boot_profile import BOOT
+from db_schema import ensure_schema
+from ingestion import INGEST_TIMEOUT, IngestionService, get_ingestion_service
+from log_config import get_logger, redact
+from report_time import now_local
+from media_store import WA_GRAPH_BASE, WA_GRAPH_VERSION, get_media_store
+from static_assets import (
+    HTML_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, LOGICAL_CACHE_CONTROL, Asset, PageCache, get_registry,
+)
+from backups import backup_dir, list_backups, start_backup_scheduler
+from archives import ArchiveError, attached_editions, editions_stats, list_editions, rollover
+from export import FORMATS, STREAMS, build_filters, gzip_stream, iter_model_chunks, iter_row_chunks
+from read_cache import ReadCache, get_read_cache
+from read_model import ReportColumns, get_read_model
+from search import fts_available, search_signalements
+from snapshot_version import compare, read_header, version_of
+from snapshot_writer import SnapshotWriter, get_snapshot_writer
+from zones import get_zones
+from metrics import (
+    HTTP_REQUEST_DURATION,
+    OUTBOUND_ERRORS,
+    OUTBOUND_REQUEST_DURATION,
+    REGISTRY,
+    WEBHOOK_QUEUE_DEPTH,
+    TimedConnection,
+    monitor_loop_lag,
+)
+
 # Charger les variables d'environnement
 load_dotenv('config.env')
+_module_ready = time.perf_counter()
+BOOT.record("imports", BOOT.origin, _module_ready)
+
+
+log = get_logger("app")
+tg_log = get_logger("telegram")
+webhook_log = get_logger("webhook")
+wa_log = get_logger("whatsapp")
 
 
 # ==== CONSTANTES ====
@@ -27,6 +65,9 @@ WA_VERIFY_TOKEN = os.getenv("WA_VERIFY_TOKEN")  # pour la vérification du webho
 WA_ACCESS_TOKEN = os.getenv("WA_ACCESS_TOKEN")  # token d'accès Graph API
 WA_PHONE_NUMBER_ID = os.getenv("WA_PHONE_NUMBER_ID")  # identifiant du numéro business
 
+# Nombre maximal de signalements par appel à /api/signalements/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
 
 def _ensure_parent_dir(path: str) -> None:
     try:
@@ -34,13 +75,14 @@ def _ensure_parent_dir(path: str) -> None:
         if parent:
             os.makedirs(parent, exist_ok=True)
     except Exception as e:
-        print(f"Erreur création dossier parent pour {path}: {e}")
+        log.error("Erreur création dossier parent pour %s: %s", path, e)
 
 
 @contextmanager
-def get_db_connection():
-    _ensure_parent_dir(DB_FILE)
-    conn = sqlite3.connect(DB_FILE)
+def get_db_connection(db_file: Optional[str] = None):
+    db_file = db_file or DB_FILE
+    _ensure_parent_dir(db_file)
+    conn = sqlite3.connect(db_file, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     try:
         yield conn
@@ -48,113 +90,215 @@ def get_db_connection():
         conn.close()
 
 
-def ensure_db_exists() -> None:
-    with get_db_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS signalements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date_heure TEXT NOT NULL,
-                utilisateur TEXT NOT NULL,
-                type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                photo_id TEXT,
-                latitude REAL,
-                longitude REAL
-            )
-        """)
-        conn.commit()
+def ensure_db_exists(db_file: Optional[str] = None) -> None:
+    with get_db_connection(db_file) as conn:
+        ensure_schema(conn)
 
 
-def clean_type_string(type_str: str) -> str:
-    """Nettoie et normalise les chaînes de type"""
-    if not type_str:
-        return "Autre"
-    
-    # Décodage des caractères Unicode échappés
-    try:
-        # Si c'est déjà une chaîne normale, on la retourne
-        if "\\u" not in type_str:
-            return type_str
-        
-        # Décodage des séquences Unicode
-        cleaned = type_str.encode('utf-8').decode('unicode_escape')
-        return cleaned
-    except:
-        return type_str
-
-def read_signalements_from_db() -> List[Dict[str, Any]]:
-    ensure_db_exists()
-    with get_db_connection() as conn:
+def read_signalements_from_db(db_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    ensure_db_exists(db_file)
+    with get_db_connection(db_file) as conn:
         cursor = conn.execute("""
-            SELECT date_heure, utilisateur, type, message, photo_id, latitude, longitude
-            FROM signalements
-            ORDER BY date_heure DESC
+            SELECT s.id, s.date_heure, s.utilisateur, COALESCE(t.label, s.type) AS type, s.message, s.photo_id, s.latitude, s.longitude,
+                   s.confirmations, s.duplicate_of, m.sha256 AS media_sha256
+            FROM signalements s
+            LEFT JOIN media m ON m.photo_id = s.photo_id
+            LEFT JOIN types t ON t.id = s.type_id
+            ORDER BY s.ts DESC, s.id DESC
         """)
         return [
             {
+                "id": row["id"],
                 "Date/Heure": row["date_heure"],
                 "Utilisateur": row["utilisateur"],
-                "Type": clean_type_string(row["type"]),
+                "Type": row["type"],
                 "Message": row["message"],
                 "Photo": row["photo_id"] if row["photo_id"] else None,
+                "Media": row["media_sha256"],
                 "Latitude": row["latitude"],
                 "Longitude": row["longitude"],
+                "Confirmations": row["confirmations"],
+                "DoublonDe": row["duplicate_of"],
             }
             for row in cursor.fetchall()
         ]
 
 
-def append_signalement_to_db(utilisateur: str, type_signalement: str, message: str, latitude: float, longitude: float, photo_id: str = None) -> Dict[str, Any]:
+def _snapshot_writer() -> SnapshotWriter:
+    """Écrivain du snapshot JSON (un par processus, partagé avec le bot, cf. snapshot_writer.py)."""
+    db_file = DB_FILE
+    # Base liée à l'écrivain: les relectures du thread d'écriture ne suivent pas DB_FILE
+    return get_snapshot_writer(db_file, JSON_FILE, lambda: read_signalements_from_db(db_file))
+
+
+def _apply_tombstones_to_snapshot(deleted_ids: List[int]) -> None:
+    """Retire les signalements supprimés du snapshot JSON sans relire la table."""
+    if deleted_ids:
+        _snapshot_writer().remove(deleted_ids)
+
+
+def delete_signalements(where: str, params: List[Any]) -> List[int]:
+    """Supprime les signalements correspondant à `where` en une transaction et journalise les tombstones.
+
+    Retourne les ids supprimés; le snapshot JSON est mis à jour par différence.
+    """
     ensure_db_exists()
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     with get_db_connection() as conn:
-        conn.execute("""
-            INSERT INTO signalements (date_heure, utilisateur, type, message, photo_id, latitude, longitude)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (now_str, utilisateur, type_signalement, message, photo_id, latitude, longitude))
-        conn.commit()
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [row[0] for row in conn.execute(f"SELECT id FROM signalements WHERE {where}", params)]
+            if ids:
+                conn.execute(f"DELETE FROM signalements WHERE {where}", params)
+                conn.executemany(
+                    "INSERT INTO tombstones (signalement_id, deleted_at) VALUES (?, ?)",
+                    [(signalement_id, deleted_at) for signalement_id in ids],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    if ids:
+        _apply_tombstones_to_snapshot(ids)
+        log.info("Signalements supprimés", extra={"deleted_count": len(ids)})
+    return ids
+
+
+def delete_signalements_by_ids(ids: List[int]) -> List[int]:
+    # Les ids viennent d'un JSON validé: liste d'entiers, un paramètre par id
+    return delete_signalements(f"id IN ({', '.join('?' for _ in ids)})", list(ids)) if ids else []
+
+
+def read_tombstones(since: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+    ensure_db_exists()
+    with get_db_connection() as conn:
+        cursor = conn.execute(
+            "SELECT seq, signalement_id, deleted_at FROM tombstones WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, limit),
+        )
+        return [{"seq": row["seq"], "id": row["signalement_id"], "deleted_at": row["deleted_at"]} for row in cursor.fetchall()]
+
+
+def _ingestion() -> IngestionService:
+    service = get_ingestion_service(DB_FILE)
+    service.add_listener("snapshot", _snapshot_writer().add)
+    # Téléchargement des photos en arrière-plan (même écouteur que le bot)
+    service.add_listener("media", get_media_store(DB_FILE).enqueue_records)
+    return service
+
+
+def _signalement_record(utilisateur: str, type_signalement: str, message: str, latitude: float | None, longitude: float | None, photo_id: str | None, photo_kind: str | None, date_heure: str | None = None, source: str = "web") -> Dict[str, Any]:
     return {
-        "Date/Heure": now_str,
-        "Utilisateur": utilisateur,
-        "Type": type_signalement,
-        "Message": message,
-        "Photo": photo_id,
-        "Latitude": latitude,
-        "Longitude": longitude,
+        "date_heure": date_heure or now_local(),
+        "utilisateur": utilisateur,
+        "type": type_signalement,
+        "message": message,
+        "photo_id": photo_id,
+        "photo_kind": photo_kind,
+        "latitude": latitude,
+        "longitude": longitude,
+        "source": source,
     }
 
 
-def append_signalement_nullable(utilisateur: str, type_signalement: str, message: str, latitude: float | None, longitude: float | None, photo_id: str | None = None) -> Dict[str, Any]:
-    ensure_db_exists()
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with get_db_connection() as conn:
-        conn.execute(
-            """
-            INSERT INTO signalements (date_heure, utilisateur, type, message, photo_id, latitude, longitude)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (now_str, utilisateur, type_signalement, message, photo_id, latitude, longitude),
-        )
-        conn.commit()
+def _signalement_response(record: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "Date/Heure": now_str,
-        "Utilisateur": utilisateur,
-        "Type": type_signalement,
-        "Message": message,
-        "Photo": photo_id,
-        "Latitude": latitude,
-        "Longitude": longitude,
+        "id": record.get("id"),
+        "Date/Heure": record["date_heure"],
+        "Utilisateur": record["utilisateur"],
+        "Type": record["type"],
+        "Message": record["message"],
+        "Photo": record["photo_id"],
+        "Latitude": record["latitude"],
+        "Longitude": record["longitude"],
     }
 
 
+def append_signalement_to_db(utilisateur: str, type_signalement: str, message: str, latitude: float, longitude: float, photo_id: str = None, photo_kind: str | None = None) -> Dict[str, Any]:
+    record = _signalement_record(utilisateur, type_signalement, message, latitude, longitude, photo_id, photo_kind)
+    record["id"] = _ingestion().insert(record)
+    return _signalement_response(record)
+
+
+def append_signalement_nullable(utilisateur: str, type_signalement: str, message: str, latitude: float | None, longitude: float | None, photo_id: str | None = None, photo_kind: str | None = None) -> Dict[str, Any]:
+    record = _signalement_record(utilisateur, type_signalement, message, latitude, longitude, photo_id, photo_kind, source="whatsapp")
+    record["id"] = _ingestion().insert(record)
+    return _signalement_response(record)
+
+
+def append_signalements_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Soumet plusieurs signalements validés au pipeline d'écriture (validés ensemble).
+
+    Un résultat par élément: {"status": "created" | "duplicate", "signalement": ...}
+    ou {"status": "error", "message": ..., "retry": True} si l'écriture a échoué
+    (les autres éléments du lot ne sont pas concernés).
+    """
+    records = [
+        _signalement_record(
+            item["utilisateur"], item["type_signalement"], item["message"], item["latitude"], item["longitude"],
+            item.get("photo_id"), item.get("photo_kind"), date_heure=item.get("date_heure"),
+        )
+        for item in items
+    ]
+    for record, item in zip(records, items):
+        record["client_id"] = item.get("client_id")
+    results: List[Dict[str, Any]] = []
+    for record, future in zip(records, _ingestion().submit_many(records)):
+        try:
+            record["id"] = future.result(INGEST_TIMEOUT)
+        except Exception as e:
+            log.error("Signalement du lot non enregistré: %s", e)
+            results.append({"status": "error", "message": "Enregistrement impossible, réessayer", "retry": True})
+            continue
+        # ClientId enregistré entre-temps par une autre requête: ligne existante renvoyée
+        status = "duplicate" if record.get("replayed") else "created"
+        results.append({"status": status, "signalement": _signalement_response(record)})
+    return results
+
+
+def signalements_by_client_id(client_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Signalements déjà enregistrés pour ces identifiants client (renvois de la file hors ligne)."""
+    if not client_ids:
+        return {}
+    ensure_db_exists()
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, client_id, date_heure, utilisateur, type, message, photo_id, latitude, longitude "
+            f"FROM signalements WHERE client_id IN ({', '.join('?' for _ in client_ids)})",
+            client_ids,
+        ).fetchall()
+    return {row["client_id"]: _signalement_response(dict(row)) for row in rows}
+
+
 def write_json_snapshot(signalements: List[Dict[str, Any]]) -> None:
-    _ensure_parent_dir(JSON_FILE)
-    with open(JSON_FILE, "w", encoding="utf-8") as file:
-        json.dump(signalements, file, ensure_ascii=False, indent=4)
+    """Réécrit tout le snapshot (relecture complète déjà faite par l'appelant)."""
+    _snapshot_writer().rebuild(signalements)
 
 
-app = Flask(__name__)
+# Le dossier static est servi par /static/<path> (noms versionnés, voir static_assets)
+app = Flask(__name__, static_folder=None)
 CORS(app)
+REGISTRY.start_flusher()
+# Sauvegardes en ligne de la base vive (un seul worker sauvegarde, cf. backups.py)
+_backups = start_backup_scheduler(DB_FILE)
+log.info("Base vive", extra={"db_file": os.path.abspath(DB_FILE), "backup_dir": backup_dir(DB_FILE)})
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _observe_request_duration(response: Response) -> Response:
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, route=route, method=request.method, status=str(response.status_code)
+        )
+    return response
 
 # ==== Initialisation Application Telegram (sans serveur webhook propre) ====
 # Déférer la création de l'application Telegram pour éviter les erreurs au boot
@@ -185,55 +329,122 @@ def _compute_full_webhook_url(base_url: str, path: str) -> str | None:
     return base.rstrip("/") + path_clean
 
 
-print(f"🔧 Configuration Telegram: enabled={_tg_enabled}, webhook_url={TG_WEBHOOK_URL}, secret={'***' if TG_WEBHOOK_SECRET else 'None'}")
+# Les updates en attente sont conservées par défaut (un redéploiement ne perd rien)
+TG_DROP_PENDING_UPDATES = os.getenv("WEBHOOK_DROP_PENDING_UPDATES", "0").lower() in ("1", "true", "yes")
+
+
+def _webhook_fingerprint(full_url: str) -> str:
+    # getWebhookInfo ne renvoie pas le secret: empreinte locale de (URL, secret) enregistrés
+    return hashlib.sha256(f"{full_url}\0{TG_WEBHOOK_SECRET or ''}".encode("utf-8")).hexdigest()
+
+
+def _webhook_marker_path() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), ".telegram_webhook")
+
+
+async def _ensure_webhook(bot: Any, full_url: str) -> bool:
+    """Appelle set_webhook seulement si Telegram ne connaît pas déjà cette URL et ce secret."""
+    fingerprint = _webhook_fingerprint(full_url)
+    info = await bot.get_webhook_info()
+    try:
+        with open(_webhook_marker_path(), "r", encoding="utf-8") as f:
+            known = f.read().strip() == fingerprint
+    except OSError:
+        known = False
+    if info.url == full_url and known:
+        tg_log.info("Webhook Telegram déjà enregistré: %s", full_url, extra={"pending_update_count": info.pending_update_count})
+        return False
+    tg_log.debug("Enregistrement du webhook: %s", full_url)
+    await bot.set_webhook(url=full_url, secret_token=TG_WEBHOOK_SECRET, drop_pending_updates=TG_DROP_PENDING_UPDATES)
+    try:
+        _ensure_parent_dir(_webhook_marker_path())
+        with open(_webhook_marker_path(), "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+    except OSError as e:
+        tg_log.warning("Empreinte du webhook non enregistrée: %s", e)
+    tg_log.info("Webhook Telegram enregistré: %s", full_url)
+    return True
+
+
+tg_log.info("Configuration Telegram", extra={"enabled": _tg_enabled, "webhook_url": TG_WEBHOOK_URL, "secret_set": bool(TG_WEBHOOK_SECRET)})
 
 async def _start_telegram_app() -> None:
     global telegram_app, _tg_loop
-    print("🚀 Démarrage de l'application Telegram...")
+    tg_log.info("Démarrage de l'application Telegram")
     if telegram_app is None:
-        # Import paresseux pour éviter erreurs d'import au boot
-        from gamousonagedbot import build_application as build_telegram_application
-        print("📦 Construction de l'application Telegram...")
-        telegram_app = build_telegram_application()
-    print("⚡ Initialisation de l'application Telegram...")
-    await telegram_app.initialize()
-    print("▶️ Démarrage de l'application Telegram...")
-    await telegram_app.start()
+        with BOOT.phase("telegram_build"):
+            # Import paresseux pour éviter erreurs d'import au boot
+            from gamousonagedbot import build_application as build_telegram_application
+            tg_log.debug("Construction de l'application Telegram")
+            telegram_app = build_telegram_application()
+    with BOOT.phase("telegram_start"):
+        tg_log.debug("Initialisation de l'application Telegram")
+        await telegram_app.initialize()
+        tg_log.debug("Démarrage de l'application Telegram")
+        await telegram_app.start()
     _tg_loop = asyncio.get_running_loop()
+    _tg_loop.create_task(monitor_loop_lag())
     # Enregistrer le webhook côté Telegram si une URL publique est fournie
     full_url = _compute_full_webhook_url(TG_WEBHOOK_URL, TG_WEBHOOK_PATH)
     if full_url:
         try:
-            print(f"🌐 Enregistrement du webhook: {full_url}")
-            await telegram_app.bot.set_webhook(
-                url=full_url,
-                secret_token=TG_WEBHOOK_SECRET,
-                drop_pending_updates=True,
-            )
-            print(f"✅ Webhook Telegram enregistré: {full_url}")
+            with BOOT.phase("telegram_webhook"):
+                await _ensure_webhook(telegram_app.bot, full_url)
         except Exception as e:
-            print(f"⚠️ Impossible d'enregistrer le webhook Telegram: {e}")
+            tg_log.warning("Impossible d'enregistrer le webhook Telegram: %s", redact(str(e)))
     else:
-        print("⚠️ WEBHOOK_URL non défini, webhook non enregistré")
+        tg_log.warning("WEBHOOK_URL non défini, webhook non enregistré")
+
+# Updates en cours ou en attente par chat (sur la boucle PTB): [verrou, nombre d'updates]
+_tg_chat_locks: Dict[Any, List[Any]] = {}
+
+
+async def process_update_in_order(update: Any) -> None:
+    """Traite un update après ceux déjà reçus pour le même chat.
+
+    Le ConversationHandler n'enregistre le nouvel état qu'au retour du
+    callback, après l'envoi de la réponse: un update suivant du même chat
+    traité en parallèle trouverait l'ancien état et resterait sans réponse.
+    Les chats différents restent traités en parallèle (verrous FIFO).
+    """
+    chat = getattr(update, "effective_chat", None)
+    user = getattr(update, "effective_user", None)
+    key = chat.id if chat is not None else user.id if user is not None else None
+    if key is None:
+        await telegram_app.process_update(update)
+        return
+    entry = _tg_chat_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            await telegram_app.process_update(update)
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _tg_chat_locks[key]
+
 
 def _run_telegram_app_bg() -> None:
-    print("🔄 Lancement du thread Telegram...")
+    tg_log.debug("Lancement du thread Telegram")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     try:
-        asyncio.run(_start_telegram_app())
+        loop.run_until_complete(_start_telegram_app())
+        # Garder la boucle active: les updates du webhook y sont soumis
+        loop.run_forever()
     except Exception as e:
-        print(f"❌ Erreur lors du démarrage Telegram: {e}")
+        tg_log.error("Erreur lors du démarrage Telegram: %s", redact(str(e)))
 
 def _ensure_tg_started() -> None:
     global _tg_started
     if _tg_started or not _tg_enabled:
         return
-    print("🎯 Démarrage du bot Telegram...")
     _tg_started = True
     threading.Thread(target=_run_telegram_app_bg, daemon=True).start()
 
 # Démarrer le bot automatiquement au démarrage de Flask
 if _tg_enabled:
-    print("🚀 Démarrage automatique du bot Telegram...")
+    tg_log.info("Démarrage automatique du bot Telegram")
     _ensure_tg_started()
 
 
@@ -263,56 +474,69 @@ def health_alt() -> Response:
     return ("ok", 200, {"Content-Type": "text/plain; charset=utf-8"})
 
 
+# Registre des assets construit au premier usage ou par le préchauffage (warm_caches)
+_pages = PageCache(None, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _send_asset(asset: Asset, cache_control: str, link_header: str | None = None) -> Response:
+    etag = f'"{asset.etag}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if link_header:
+        headers["Link"] = link_header
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    body = asset.content
+    if asset.gzipped is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = asset.gzipped
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=asset.mimetype, headers=headers)
+
+
+def _serve_page(filename: str) -> Response:
+    # Pages HTML: cache court + revalidation par ETag, assets préchargés via Link
+    page = _pages.get(filename)
+    return _send_asset(page.asset, HTML_CACHE_CONTROL, page.link_header)
+
+
+@app.get("/static/<path:filename>")
+def static_asset(filename: str) -> Response:
+    registry = get_registry()
+    asset = registry.get(filename)
+    if asset is None:
+        return jsonify({"status": "error", "message": "Fichier non trouvé"}), 404
+    # Nom versionné: contenu immuable; nom logique: cache court
+    cache_control = IMMUTABLE_CACHE_CONTROL if filename in registry.immutable else LOGICAL_CACHE_CONTROL
+    return _send_asset(asset, cache_control)
+
+
 @app.get("/carte")
 def carte() -> Response:
-    # Sert `carte_signalements.html`
-    return send_from_directory(".", "carte_signalements.html")
+    return _serve_page("carte_signalements.html")
 
 
 @app.get("/form")
 def form() -> Response:
-    # Sert `signalement.html`
-    return send_from_directory(".", "signalement.html")
+    return _serve_page("signalement.html")
 
 
 @app.get("/signalements.json")
 def get_signalements_json() -> Response:
-    # 1) Tenter de servir le fichier JSON configuré
-    try:
-        if os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0:
-            with open(JSON_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            print(f"/signalements.json servi depuis JSON_FILE: {JSON_FILE} (n={len(data)})")
-            resp = jsonify(data)
-            resp.headers["Cache-Control"] = "no-store, max-age=0"
-            return resp
-    except Exception as e:
-        print(f"Erreur lecture JSON_FILE ({JSON_FILE}): {e}")
-    
-    # 2) Compatibilité: tenter l'ancien fichier à la racine
-    legacy_path = os.path.join(".", "signalements.json")
-    try:
-        if os.path.exists(legacy_path) and os.path.getsize(legacy_path) > 0:
-            with open(legacy_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            print(f"/signalements.json servi depuis legacy: {legacy_path} (n={len(data)})")
-            resp = jsonify(data)
-            resp.headers["Cache-Control"] = "no-store, max-age=0"
-            return resp
-    except Exception as e:
-        print(f"Erreur lecture legacy JSON ({legacy_path}): {e}")
-
-    # 3) Repli: lire depuis la DB et réécrire le snapshot
-    signalements = read_signalements_from_db()
-    try:
-        write_json_snapshot(signalements)
-    except Exception as e:
-        print(f"Erreur écriture JSON: {e}")
-        pass
-    print(f"/signalements.json repli DB (n={len(signalements)}) et snapshot réécrit vers {JSON_FILE}")
-    resp = jsonify(signalements)
-    resp.headers["Cache-Control"] = "no-store, max-age=0"
-    return resp
+    """Liste servie depuis le cache du worker (reconstruite si un autre worker a écrit)"""
+    model = _read_model()
+    if not len(model):
+        # Compatibilité: ancien fichier à la racine, base encore vide
+        legacy_path = os.path.join(".", "signalements.json")
+        try:
+            if os.path.exists(legacy_path) and os.path.getsize(legacy_path) > 0:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                log.debug("/signalements.json servi depuis legacy", extra={"path": legacy_path, "count": len(data)})
+                resp = jsonify(data)
+                resp.headers["Cache-Control"] = "no-store, max-age=0"
+                return resp
+        except Exception as e:
+            log.error("Erreur lecture legacy JSON (%s): %s", legacy_path, e)
+    return _report_list_response()
 
 
 @app.get("/debug/json")
@@ -381,184 +605,174 @@ def refresh_json() -> Response:
 
 @app.delete("/api/signalements/<int:signalement_id>")
 def delete_signalement(signalement_id: int) -> Response:
-    """Supprime un signalement par ID et régénère le JSON"""
+    """Supprime un signalement par ID et met à jour le JSON"""
     if not require_admin():
         return jsonify({"status": "forbidden"}), 403
     try:
-        with get_db_connection() as conn:
-            cursor = conn.execute("SELECT id FROM signalements WHERE id = ?", (signalement_id,))
-            if not cursor.fetchone():
-                return jsonify({"status": "error", "message": "Signalement non trouvé"}), 404
-            conn.execute("DELETE FROM signalements WHERE id = ?", (signalement_id,))
-            conn.commit()
-            signalements = read_signalements_from_db()
-            write_json_snapshot(signalements)
-            return jsonify({"status": "ok", "message": "Signalement supprimé et JSON mis à jour"})
+        if not delete_signalements_by_ids([signalement_id]):
+            return jsonify({"status": "error", "message": "Signalement non trouvé"}), 404
+        return jsonify({"status": "ok", "message": "Signalement supprimé et JSON mis à jour", "deleted_ids": [signalement_id]})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def _criteria_where(criteria: Dict[str, Any]) -> tuple[str, List[Any]]:
+    # Colonnes autorisées uniquement (clés fixes), valeurs passées en paramètres
+    conditions = []
+    params = []
+    for column, value in criteria.items():
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    return " AND ".join(conditions), params
+
+
+def _delete_by_id_list(raw_ids: Any) -> Response:
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return jsonify({"status": "error", "message": "Liste d'ids attendue"}), 400
+    if len(raw_ids) > BATCH_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"Maximum {BATCH_MAX_ITEMS} ids par appel"}), 413
+    if any(isinstance(i, bool) or not isinstance(i, int) for i in raw_ids):
+        return jsonify({"status": "error", "message": "Les ids doivent être des entiers"}), 400
+    ids = list(dict.fromkeys(raw_ids))
+    deleted = delete_signalements_by_ids(ids)
+    not_found = sorted(set(ids) - set(deleted))
+    if not deleted:
+        return jsonify({"status": "error", "message": "Aucun signalement trouvé", "not_found": not_found}), 404
+    return jsonify({
+        "status": "ok",
+        "message": f"{len(deleted)} signalement(s) supprimé(s) et JSON mis à jour",
+        "deleted_count": len(deleted),
+        "deleted_ids": sorted(deleted),
+        "not_found": not_found,
+    })
+
+
 @app.post("/api/signalements/delete")
 def delete_signalement_by_criteria() -> Response:
-    """Supprime un signalement par critères (date, utilisateur, message) et régénère le JSON"""
+    """Supprime des signalements par liste d'ids ({"ids": [...]}, une transaction)
+    ou par critères (date, utilisateur, message, type), et met à jour le JSON"""
     if not require_admin():
         return jsonify({"status": "forbidden"}), 403
     
     payload = request.get_json(silent=True) or {}
-    date_heure = payload.get("date_heure")
-    utilisateur = payload.get("utilisateur")
-    message = payload.get("message")
-    type_signalement = payload.get("type")
-    
-    if not any([date_heure, utilisateur, message, type_signalement]):
-        return jsonify({"status": "error", "message": "Au moins un critère requis (date_heure, utilisateur, message, type)"}), 400
+    if "ids" in payload:
+        try:
+            return _delete_by_id_list(payload.get("ids"))
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+
+    criteria = {
+        "date_heure": payload.get("date_heure"),
+        "utilisateur": payload.get("utilisateur"),
+        "message": payload.get("message"),
+        "type": payload.get("type"),
+    }
+    if not any(criteria.values()):
+        return jsonify({"status": "error", "message": "Au moins un critère requis (ids, date_heure, utilisateur, message, type)"}), 400
     
     try:
-        # Construire la requête dynamiquement
-        conditions = []
-        params = []
-        
-        if date_heure:
-            conditions.append("date_heure = ?")
-            params.append(date_heure)
-        if utilisateur:
-            conditions.append("utilisateur = ?")
-            params.append(utilisateur)
-        if message:
-            conditions.append("message = ?")
-            params.append(message)
-        if type_signalement:
-            conditions.append("type = ?")
-            params.append(type_signalement)
-        
-        where_clause = " AND ".join(conditions)
-        
-        with get_db_connection() as conn:
-            # Vérifier si le signalement existe
-            cursor = conn.execute(f"SELECT id FROM signalements WHERE {where_clause}", params)
-            if not cursor.fetchone():
-                return jsonify({"status": "error", "message": "Signalement non trouvé"}), 404
-            
-            # Supprimer le signalement
-            conn.execute(f"DELETE FROM signalements WHERE {where_clause}", params)
-            conn.commit()
-            
-            # Régénérer le JSON
-            signalements = read_signalements_from_db()
-            write_json_snapshot(signalements)
-            
-            return jsonify({
-                "status": "ok", 
-                "message": "Signalement supprimé et JSON mis à jour",
-                "criteria": {
-                    "date_heure": date_heure,
-                    "utilisateur": utilisateur,
-                    "message": message,
-                    "type": type_signalement
-                }
-            })
+        deleted = delete_signalements(*_criteria_where(criteria))
+        if not deleted:
+            return jsonify({"status": "error", "message": "Signalement non trouvé"}), 404
+        return jsonify({
+            "status": "ok", 
+            "message": "Signalement supprimé et JSON mis à jour",
+            "deleted_ids": deleted,
+            "criteria": criteria,
+        })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @app.post("/api/signalements/delete-multiple")
 def delete_multiple_signalements() -> Response:
-    """Supprime plusieurs signalements par critères et régénère le JSON"""
+    """Supprime plusieurs signalements par critères et met à jour le JSON"""
     if not require_admin():
         return jsonify({"status": "forbidden"}), 403
     
     payload = request.get_json(silent=True) or {}
-    date_heure = payload.get("date_heure")
-    utilisateur = payload.get("utilisateur")
-    type_signalement = payload.get("type")
-    
-    if not any([date_heure, utilisateur, type_signalement]):
+    criteria = {
+        "date_heure": payload.get("date_heure"),
+        "utilisateur": payload.get("utilisateur"),
+        "type": payload.get("type"),
+    }
+    if not any(criteria.values()):
         return jsonify({"status": "error", "message": "Au moins un critère requis (date_heure, utilisateur, type)"}), 400
     
     try:
-        # Construire la requête dynamiquement
-        conditions = []
-        params = []
-        
-        if date_heure:
-            conditions.append("date_heure = ?")
-            params.append(date_heure)
-        if utilisateur:
-            conditions.append("utilisateur = ?")
-            params.append(utilisateur)
-        if type_signalement:
-            conditions.append("type = ?")
-            params.append(type_signalement)
-        
-        where_clause = " AND ".join(conditions)
-        
-        with get_db_connection() as conn:
-            # Compter les signalements à supprimer
-            cursor = conn.execute(f"SELECT COUNT(*) FROM signalements WHERE {where_clause}", params)
-            count = cursor.fetchone()[0]
-            
-            if count == 0:
-                return jsonify({"status": "error", "message": "Aucun signalement trouvé"}), 404
-            
-            # Supprimer les signalements
-            conn.execute(f"DELETE FROM signalements WHERE {where_clause}", params)
-            conn.commit()
-            
-            # Régénérer le JSON
-            signalements = read_signalements_from_db()
-            write_json_snapshot(signalements)
-            
-            return jsonify({
-                "status": "ok", 
-                "message": f"{count} signalement(s) supprimé(s) et JSON mis à jour",
-                "deleted_count": count,
-                "criteria": {
-                    "date_heure": date_heure,
-                    "utilisateur": utilisateur,
-                    "type": type_signalement
-                }
-            })
+        deleted = delete_signalements(*_criteria_where(criteria))
+        if not deleted:
+            return jsonify({"status": "error", "message": "Aucun signalement trouvé"}), 404
+        return jsonify({
+            "status": "ok", 
+            "message": f"{len(deleted)} signalement(s) supprimé(s) et JSON mis à jour",
+            "deleted_count": len(deleted),
+            "deleted_ids": deleted,
+            "criteria": criteria,
+        })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.get("/api/signalements/tombstones")
+def api_tombstones() -> Response:
+    """Suppressions depuis `since` (seq): les clients mettent à jour leur cache sans tout recharger"""
+    try:
+        since = int(request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "since doit être un entier"}), 400
+    tombstones = read_tombstones(since)
+    resp = jsonify({"tombstones": tombstones, "last_seq": tombstones[-1]["seq"] if tombstones else since})
+    resp.headers["Cache-Control"] = "no-store, max-age=0"
+    return resp
+
+
 # ==== Webhook Telegram → Transfert vers l'application PTB ====
 @app.post("/webhook")
 def telegram_webhook() -> Response:
-    print("🔔 Webhook appelé - Headers:", dict(request.headers))
-    print("🔔 Webhook payload:", request.get_json(silent=True))
-    
     # Vérification du secret (si configuré)
     provided = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
     if TG_WEBHOOK_SECRET and provided != TG_WEBHOOK_SECRET:
-        print("❌ Secret invalide - fourni:", provided, "attendu:", TG_WEBHOOK_SECRET)
+        webhook_log.warning("Secret webhook invalide", extra={"remote_addr": request.remote_addr})
         return jsonify({"status": "forbidden"}), 403
 
     payload = request.get_json(silent=True) or {}
+    if webhook_log.isEnabledFor(logging.DEBUG):
+        webhook_log.debug("Webhook Telegram reçu", extra={"payload": redact(payload)})
     try:
         # Import paresseux pour éviter dépendance Telegram à l'import
         if telegram_app is None or _tg_loop is None:
-            print("❌ Application Telegram non disponible ou boucle absente")
+            webhook_log.error("Application Telegram non disponible ou boucle absente")
             return jsonify({"status": "unavailable"}), 503
         from telegram import Update as TGUpdate
         update = TGUpdate.de_json(payload, telegram_app.bot)
-        print("✅ Update parsé:", update)
-        # Soumettre le traitement sur la boucle PTB
-        fut = asyncio.run_coroutine_threadsafe(telegram_app.process_update(update), _tg_loop)
+        # Soumettre le traitement sur la boucle PTB, dans l'ordre de réception pour un même chat
+        fut = asyncio.run_coroutine_threadsafe(process_update_in_order(update), _tg_loop)
+        WEBHOOK_QUEUE_DEPTH.inc()
+        fut.add_done_callback(lambda _: WEBHOOK_QUEUE_DEPTH.dec())
         # Optionnel: vérifier les exceptions rapidement
         try:
             fut.result(timeout=0)
         except Exception:
             pass
-        print("✅ Update soumis au processeur PTB")
     except Exception as e:
-        print("❌ Erreur traitement update:", str(e))
+        webhook_log.error("Erreur traitement update: %s", e, extra={"update_id": payload.get("update_id")})
         return jsonify({"status": "error", "message": str(e)}), 400
 
-    print("✅ Webhook traité avec succès")
+    webhook_log.debug("Update soumis au processeur PTB", extra={"update_id": payload.get("update_id")})
     return jsonify({"status": "ok"})
 
 
+@app.get("/debug/notifications")
+def debug_notifications() -> Response:
+    """Compteurs du dispatcher de notifications (envois directs, fallbacks, cache file_id)"""
+    dispatcher = telegram_app.bot_data.get("notification_dispatcher") if telegram_app is not None else None
+    if dispatcher is None:
+        return jsonify({"status": "inactive"})
+    return jsonify({"status": "ok", **dispatcher.stats()})
+
+
 @app.get("/webhook/whatsapp")
 def whatsapp_verify() -> Response:
     """Verification webhook pour Meta/WhatsApp (GET challenge)"""
@@ -566,41 +780,34 @@ def whatsapp_verify() -> Response:
     token = request.args.get("hub.verify_token")
     challenge = request.args.get("hub.challenge")
     
-    print(f"🔍 WhatsApp verification - mode: {mode}, token: {token}, expected: {WA_VERIFY_TOKEN}")
-    
     if mode == "subscribe" and token and WA_VERIFY_TOKEN and token == WA_VERIFY_TOKEN:
-        print(f"✅ WhatsApp verification successful - returning challenge: {challenge}")
+        wa_log.info("Vérification du webhook WhatsApp réussie")
         return Response(challenge, status=200, content_type="text/plain; charset=utf-8")
     
-    print(f"❌ WhatsApp verification failed - mode: {mode}, token match: {token == WA_VERIFY_TOKEN if token and WA_VERIFY_TOKEN else 'missing'}")
+    wa_log.warning("Vérification du webhook WhatsApp échouée", extra={"mode": mode, "token_present": bool(token)})
     return Response("forbidden", status=403, content_type="text/plain; charset=utf-8")
 
 
 @app.post("/webhook/whatsapp")
 def whatsapp_webhook() -> Response:
     """Réception des messages WhatsApp via Cloud API"""
-    print("🔔 WhatsApp webhook POST appelé")
-    print(f"🔔 Headers: {dict(request.headers)}")
-    
     try:
         payload = request.get_json(silent=True) or {}
-        print(f"🔔 Payload: {payload}")
-        
+        if wa_log.isEnabledFor(logging.DEBUG):
+            wa_log.debug("Webhook WhatsApp reçu", extra={"payload": redact(payload)})
+
         # Parcourir la structure typique de Meta
         entries = payload.get("entry") or []
-        print(f"🔔 Entries trouvées: {len(entries)}")
-        
+
         created_count = 0
         response_count = 0
         for entry in entries:
             changes = entry.get("changes") or []
-            print(f"🔔 Changes dans entry: {len(changes)}")
             for change in changes:
                 value = change.get("value") or {}
                 messages = value.get("messages") or []
                 contacts = value.get("contacts") or []
-                print(f"🔔 Messages trouvés: {len(messages)}, Contacts: {len(contacts)}")
-                
+
                 contact_name = None
                 if contacts:
                     profile = (contacts[0] or {}).get("profile") or {}
@@ -608,14 +815,12 @@ def whatsapp_webhook() -> Response:
                 for msg in messages:
                     from_wa = msg.get("from")  # numéro MSISDN
                     msg_type = msg.get("type")
-                    print(f"🔔 Message de {from_wa}, type: {msg_type}")
-                    
+
                     utilisateur = contact_name or from_wa or "WhatsApp"
                     # Conversation state machine
                     _wa_handle_incoming_message(from_wa, utilisateur, msg)
                     response_count += 1
-                    print(f"🔔 Réponse envoyée à {from_wa}")
-                    
+
                     # Data extraction for passive recording (optional)
                     type_signalement = "WhatsApp"
                     message_text = None
@@ -644,20 +849,22 @@ def whatsapp_webhook() -> Response:
                         latitude=latitude,
                         longitude=longitude,
                         photo_id=photo_id,
+                        photo_kind="wa_image" if photo_id else None,
                     )
                     created_count += 1
-        # Mettre à jour le JSON
-        try:
-            write_json_snapshot(read_signalements_from_db())
-        except Exception:
-            pass
-        print(f"🔔 Résumé: {created_count} créés, {response_count} réponses")
+        wa_log.debug("Webhook WhatsApp traité", extra={"created_count": created_count, "responded_count": response_count})
         return jsonify({"status": "ok", "created": created_count, "responded": response_count})
     except Exception as e:
-        print(f"❌ Erreur WhatsApp webhook: {e}")
+        wa_log.exception("Erreur WhatsApp webhook: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.get("/metrics")
+def metrics_endpoint() -> Response:
+    """Métriques Prometheus (agrégées entre workers si METRICS_DIR est défini)"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/debug/signalements")
 def debug_signalements() -> Response:
     """Endpoint de debug pour vérifier les données"""
@@ -675,18 +882,164 @@ def debug_signalements() -> Response:
 
 @app.get("/api/signalements")
 def api_list_signalements() -> Response:
-    signalements = read_signalements_from_db()
-    return jsonify(signalements)
+    """Tous les signalements, ou ceux d'un rectangle (?bbox=min_lon,min_lat,max_lon,max_lat) ou d'une zone (?zone=)"""
+    bbox_raw = request.args.get("bbox")
+    zone = request.args.get("zone") or None
+    if not bbox_raw and not zone:
+        return _report_list_response()
+    bbox = None
+    if bbox_raw:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox_raw.split(","))
+        except ValueError:
+            return jsonify({"status": "error", "message": "bbox: min_lon,min_lat,max_lon,max_lat attendu"}), 400
+        if min_lon > max_lon or min_lat > max_lat:
+            return jsonify({"status": "error", "message": "bbox: minimums supérieurs aux maximums"}), 400
+        bbox = (min_lon, min_lat, max_lon, max_lat)
+    if zone and zone not in get_zones().by_id:
+        return jsonify({"status": "error", "message": f"Zone inconnue: {zone}"}), 404
+    model = _read_model()
+    return jsonify(model.dicts(model.select(bbox=bbox, zone=zone)))
+
+
+@app.get("/api/zones")
+def api_zones() -> Response:
+    """Registre des zones (GeoJSON, cf. zones.py) avec le nombre de signalements par zone"""
+    by_zone = compute_stats_from_db()["by_zone"]
+    collection = get_zones().feature_collection()
+    for feature in collection["features"]:
+        feature["properties"]["count"] = by_zone.get(feature["id"], 0)
+    return jsonify(collection)
+
+
+def _date_params_error() -> Optional[str]:
+    """Message d'erreur si ?from= ou ?to= n'est pas au format AAAA-MM-JJ[ HH:MM:SS] (None sinon)."""
+    for name in ("from", "to"):
+        value = request.args.get(name)
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d %H:%M:%S" if len(value) > 10 else "%Y-%m-%d")
+            except ValueError:
+                return f"{name}: format AAAA-MM-JJ[ HH:MM:SS] attendu"
+    return None
+
+
+@app.get("/api/search")
+def api_search() -> Response:
+    """Recherche plein texte: ?q=&type=&from=&to=&page=&per_page= (pertinence, extraits)"""
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"status": "error", "message": "Paramètre q requis"}), 400
+    try:
+        page = int(request.args.get("page", 1))
+        per_page = int(request.args.get("per_page", 20))
+    except ValueError:
+        return jsonify({"status": "error", "message": "page et per_page doivent être des entiers"}), 400
+    date_error = _date_params_error()
+    if date_error:
+        return jsonify({"status": "error", "message": date_error}), 400
 
+    ensure_db_exists()
+    start = time.perf_counter()
+    with get_db_connection() as conn:
+        if not fts_available(conn):
+            return jsonify({"status": "error", "message": "Recherche plein texte indisponible (FTS5)"}), 503
+        result = search_signalements(
+            conn, q,
+            type_signalement=request.args.get("type") or None,
+            date_from=request.args.get("from") or None,
+            date_to=request.args.get("to") or None,
+            page=page, per_page=per_page,
+        )
+    result["took_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return jsonify({"status": "ok", "query": q, **result})
 
-@app.post("/api/signalements")
-def api_create_signalement() -> Response:
+
+@app.get("/api/editions")
+def api_editions() -> Response:
+    """Statistiques par édition (archives + édition courante), calculées en parallèle"""
+    editions = request.args.get("editions")
+    try:
+        stats = editions_stats(DB_FILE, editions.split(",") if editions else None)
+    except ArchiveError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    return jsonify({"status": "ok", "editions": stats})
+
+
+@app.post("/api/admin/rollover")
+def api_rollover() -> Response:
+    """Archive une édition close: {"edition": "gamou-2025", "until": "AAAA-MM-JJ HH:MM:SS"?, "vacuum": false}"""
+    if not require_admin():
+        return jsonify({"status": "forbidden"}), 403
     payload = request.get_json(silent=True) or {}
+    until = payload.get("until")
+    if until:
+        try:
+            datetime.strptime(until, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "until: format AAAA-MM-JJ HH:MM:SS attendu"}), 400
+    try:
+        result = rollover(DB_FILE, payload.get("edition") or "", until, bool(payload.get("vacuum")))
+    except ArchiveError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    # La base vive a changé en masse: snapshot reconstruit
+    write_json_snapshot(read_signalements_from_db())
+    return jsonify({"status": "ok", **result})
+
+
+@app.get("/api/export")
+def api_export() -> Response:
+    """Export en flux: ?format=csv|geojson|ndjson&type=&from=&to=&gzip=1&edition= (mémoire constante)"""
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in FORMATS:
+        return jsonify({"status": "error", "message": f"format: {', '.join(FORMATS)}"}), 400
+    date_error = _date_params_error()
+    if date_error:
+        return jsonify({"status": "error", "message": date_error}), 400
+    request_type, request_from, request_to = (request.args.get(k) or None for k in ("type", "from", "to"))
+    where, params = build_filters(request_type, request_from, request_to)
+    compress = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    edition = request.args.get("edition")
+    ensure_db_exists()
+    if edition and edition not in list_editions(DB_FILE):
+        return jsonify({"status": "error", "message": f"Édition inconnue: {edition}"}), 404
+
+    def generate():
+        # Connexion ouverte pendant toute la réponse, fermée même si le client abandonne
+        if edition:
+            # Édition archivée: attachée en lecture seule le temps de l'export
+            with attached_editions(DB_FILE, [edition]) as conn:
+                yield from STREAMS[fmt](iter_row_chunks(conn, where, params, schema="ed_0"))
+        else:
+            # Édition courante: modèle de lecture en mémoire, dicts jamais construits
+            model = _read_model()
+            indexes = model.select(request_type, request_from, request_to)
+            yield from STREAMS[fmt](iter_model_chunks(model, indexes))
+
+    mimetype, extension = FORMATS[fmt]
+    filename = f"signalements-{datetime.now():%Y%m%d-%H%M%S}.{extension}"
+    body = generate()
+    if compress:
+        body, mimetype, filename = gzip_stream(body), "application/gzip", filename + ".gz"
+    log.info("Export démarré", extra={"format": fmt, "gzip": compress})
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store, max-age=0",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# Valeurs de photo_kind comprises par le dispatcher et le stockage des photos (cf. db_schema.py)
+PHOTO_KINDS = ("photo", "document", "wa_image")
 
+
+def _validate_signalement_payload(payload: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, str]]:
+    """Valide un signalement (format API) et retourne (champs, erreurs)."""
     utilisateur = payload.get("Utilisateur")
     type_signalement = payload.get("Type")
     message = payload.get("Message")
     photo_id = payload.get("Photo")  # Nouveau champ pour la photo
+    photo_kind = payload.get("PhotoKind")  # 'photo' / 'document' / 'wa_image'
     latitude_raw = payload.get("Latitude")
     longitude_raw = payload.get("Longitude")
 
@@ -698,6 +1051,8 @@ def api_create_signalement() -> Response:
         errors["Type"] = "Champ requis"
     if not message:
         errors["Message"] = "Champ requis"
+    if photo_kind is not None and photo_kind not in PHOTO_KINDS:
+        errors["PhotoKind"] = f"Valeurs acceptées: {', '.join(PHOTO_KINDS)}"
 
     try:
         latitude = float(latitude_raw) if latitude_raw is not None else None
@@ -714,192 +1069,270 @@ def api_create_signalement() -> Response:
     if latitude is None or longitude is None:
         errors["location"] = "Latitude et Longitude sont requis"
 
+    fields = {
+        "utilisateur": utilisateur,
+        "type_signalement": type_signalement,
+        "message": message,
+        "latitude": latitude,
+        "longitude": longitude,
+        "photo_id": photo_id,
+        "photo_kind": photo_kind if photo_id else None,
+    }
+    return fields, errors
+
+
+@app.post("/api/signalements")
+def api_create_signalement() -> Response:
+    payload = request.get_json(silent=True) or {}
+
+    fields, errors = _validate_signalement_payload(payload)
     if errors:
         return jsonify({"status": "error", "errors": errors}), 400
 
-    created = append_signalement_to_db(
-        utilisateur=utilisateur,
-        type_signalement=type_signalement,
-        message=message,
-        latitude=latitude,
-        longitude=longitude,
-        photo_id=photo_id,
-    )
-
-    # Met à jour le snapshot JSON pour compatibilité avec la carte statique
-    try:
-        write_json_snapshot(read_signalements_from_db())
-    except Exception:
-        pass
+    # Le snapshot JSON (carte statique) est mis à jour par le pipeline d'écriture
+    created = append_signalement_to_db(**fields)
 
     return jsonify({"status": "ok", "signalement": created}), 201
 
 
+@app.post("/api/signalements/batch")
+def api_create_signalements_batch() -> Response:
+    """Ingestion groupée (équipes terrain hors ligne): une transaction, un seul snapshot.
+
+    Corps: liste de signalements au format de POST /api/signalements (ou
+    {"signalements": [...]}), avec un champ optionnel "Date/Heure"
+    (AAAA-MM-JJ HH:MM:SS) pour conserver l'heure de saisie hors ligne et un
+    champ optionnel "ClientId" (UUID généré par le client): un élément déjà
+    reçu (ou répété dans le lot) n'est pas réinséré, la ligne existante est
+    renvoyée ("duplicate"). Les éléments valides sont insérés même si
+    d'autres sont rejetés; chaque résultat porte son statut: "created",
+    "duplicate" ou "error" ("retry": true si l'écriture a échoué et que
+    l'élément peut être renvoyé tel quel).
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get("signalements")
+    if not isinstance(payload, list) or not payload:
+        return jsonify({"status": "error", "message": "Liste de signalements attendue"}), 400
+    if len(payload) > BATCH_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"Maximum {BATCH_MAX_ITEMS} signalements par lot"}), 413
+
+    results: List[Dict[str, Any]] = []
+    valid: List[Dict[str, Any]] = []
+    valid_indexes: List[int] = []
+    for index, item in enumerate(payload):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "error", "errors": {"item": "Objet attendu"}})
+            continue
+        fields, errors = _validate_signalement_payload(item)
+        date_heure = item.get("Date/Heure")
+        if date_heure:
+            try:
+                datetime.strptime(date_heure, "%Y-%m-%d %H:%M:%S")
+                fields["date_heure"] = date_heure
+            except (TypeError, ValueError):
+                errors["Date/Heure"] = "Format attendu AAAA-MM-JJ HH:MM:SS"
+        client_id = item.get("ClientId")
+        if client_id is not None:
+            if isinstance(client_id, str) and 0 < len(client_id) <= 64:
+                fields["client_id"] = client_id
+            else:
+                errors["ClientId"] = "Chaîne de 1 à 64 caractères attendue"
+        if errors:
+            results.append({"index": index, "status": "error", "errors": errors})
+            continue
+        # Statut fixé après l'écriture (created / duplicate / error)
+        results.append({"index": index})
+        valid.append(fields)
+        valid_indexes.append(index)
+
+    # Renvoi après une réponse perdue: les éléments déjà enregistrés ne sont pas réinsérés
+    existing = signalements_by_client_id([fields["client_id"] for fields in valid if fields.get("client_id")])
+    fresh: List[tuple[int, Dict[str, Any]]] = []
+    # ClientId répété dans le lot: index du premier élément portant cet identifiant
+    first_index: Dict[str, int] = {}
+    repeated: List[tuple[int, int]] = []
+    for index, fields in zip(valid_indexes, valid):
+        client_id = fields.get("client_id")
+        if client_id in existing:
+            results[index].update(status="duplicate", replayed=True, signalement=existing[client_id])
+        elif client_id in first_index:
+            repeated.append((index, first_index[client_id]))
+        else:
+            if client_id:
+                first_index[client_id] = index
+            fresh.append((index, fields))
+
+    if fresh:
+        # Une transaction et un snapshot pour tout le lot (pipeline d'écriture)
+        outcomes = append_signalements_batch([fields for _, fields in fresh])
+        for (index, _), outcome in zip(fresh, outcomes):
+            results[index].update(outcome)
+            if outcome["status"] == "duplicate":
+                results[index]["replayed"] = True
+    for index, first in repeated:
+        if results[first]["status"] == "error":
+            results[index].update(status="error", message=results[first]["message"], retry=True)
+        else:
+            results[index].update(status="duplicate", replayed=True, signalement=results[first]["signalement"])
+
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "duplicate")}
+    n_rejected = len(payload) - len(valid)
+    n_failed = sum(1 for r in results if r.get("retry"))
+    n_ok = counts["created"] + counts["duplicate"]
+    if not n_rejected and not n_failed:
+        status_code = 201
+    else:
+        status_code = 207 if n_ok else 503 if n_failed else 400
+    log.info("Lot de signalements traité", extra={"received": len(payload), "created_count": counts["created"],
+                                                  "replayed": counts["duplicate"], "rejected": n_rejected,
+                                                  "failed": n_failed})
+    return jsonify({
+        "status": "ok" if status_code == 201 else "partial" if n_ok else "error",
+        "created": counts["created"],
+        "replayed": counts["duplicate"],
+        "rejected": n_rejected,
+        "failed": n_failed,
+        "results": results,
+    }), status_code
+
+
 @app.get("/api/admin/signalements")
 def admin_list_signalements() -> Response:
     if not require_admin():
         return jsonify({"status": "forbidden"}), 403
-    # Lire depuis le JSON comme la carte/tableau de bord
-    try:
-        if os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0:
-            with open(JSON_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            resp = jsonify([
-                {"id": None, **item} for item in data
-            ])
-            resp.headers["Cache-Control"] = "no-store, max-age=0"
-            return resp
-    except Exception as e:
-        print(f"Erreur lecture JSON_FILE ({JSON_FILE}) pour admin: {e}")
-    # Fallback legacy
-    legacy_path = os.path.join(".", "signalements.json")
-    try:
-        if os.path.exists(legacy_path) and os.path.getsize(legacy_path) > 0:
-            with open(legacy_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            resp = jsonify([
-                {"id": None, **item} for item in data
-            ])
-            resp.headers["Cache-Control"] = "no-store, max-age=0"
-            return resp
-    except Exception as e:
-        print(f"Erreur lecture legacy JSON ({legacy_path}) pour admin: {e}")
-    # Repli DB si JSON absent
-    ensure_db_exists()
-    with get_db_connection() as conn:
-        cursor = conn.execute(
-            """
-            SELECT id, date_heure, utilisateur, type, message, photo_id, latitude, longitude
-            FROM signalements
-            ORDER BY date_heure DESC
-            """
-        )
-        data = [
-            {
-                "id": row["id"],
-                "Date/Heure": row["date_heure"],
-                "Utilisateur": row["utilisateur"],
-                "Type": row["type"],
-                "Message": row["message"],
-                "Photo": row["photo_id"] if row["photo_id"] else None,
-                "Latitude": row["latitude"],
-                "Longitude": row["longitude"],
-            }
-            for row in cursor.fetchall()
-        ]
-    resp = jsonify(data)
-    resp.headers["Cache-Control"] = "no-store, max-age=0"
-    return resp
+    # Même liste que la carte (avec ids), depuis le cache du worker
+    return _report_list_response()
 
 
-def read_signalements_for_display() -> List[Dict[str, Any]]:
-    """Lit les signalements comme la carte/admin: JSON d'abord, DB en repli."""
-    # 1) JSON principal
-    try:
-        if os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0:
-            with open(JSON_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Erreur lecture JSON_FILE ({JSON_FILE}) pour display: {e}")
-    # 2) JSON legacy
-    legacy_path = os.path.join(".", "signalements.json")
-    try:
-        if os.path.exists(legacy_path) and os.path.getsize(legacy_path) > 0:
-            with open(legacy_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Erreur lecture legacy JSON ({legacy_path}) pour display: {e}")
-    # 3) Repli DB
-    return read_signalements_from_db()
+def _read_cache() -> ReadCache:
+    """Cache des modèles de lecture de ce worker (invalidé par PRAGMA data_version)."""
+    if not os.path.exists(DB_FILE):
+        ensure_db_exists()
+    return get_read_cache(DB_FILE)
 
 
-def compute_stats_from_db() -> Dict[str, Any]:
-    entries = read_signalements_for_display()
-    total = len(entries)
-    by_type: Dict[str, int] = {}
-    by_day: Dict[str, int] = {}
+def _refresh_read_model(previous: ReportColumns | None) -> ReportColumns:
+    ensure_db_exists()
+    return get_read_model(DB_FILE)
 
-    for item in entries:
-        type_value = item.get("Type") or "Inconnu"
-        by_type[type_value] = by_type.get(type_value, 0) + 1
 
-        date_raw = item.get("Date/Heure") or ""
-        day_key = None
-        if date_raw:
-            try:
-                dt = datetime.strptime(date_raw, "%Y-%m-%d %H:%M:%S")
-                day_key = dt.strftime("%Y-%m-%d")
-            except Exception:
-                day_key = date_raw[:10]
-        else:
-            day_key = "inconnu"
-        by_day[day_key] = by_day.get(day_key, 0) + 1
+def _read_model() -> ReportColumns:
+    """Vue du modèle de lecture en colonnes, rafraîchi (incrémental) seulement si la base a changé."""
+    return _read_cache().get("read_model", _refresh_read_model).snapshot()
 
-    by_day_sorted = dict(sorted(by_day.items(), key=lambda kv: kv[0]))
 
-    def sort_key(item: Dict[str, Any]):
-        try:
-            return datetime.strptime(item.get("Date/Heure", ""), "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return datetime.min
+def _report_list_response() -> Response:
+    """Tous les signalements (plus récents d'abord), corps JSON mis en cache jusqu'à la prochaine écriture."""
+    def build(previous: bytes | None) -> bytes:
+        model = _read_model()
+        return jsonify(model.dicts(range(len(model)))).get_data()
 
-    latest_entries = sorted(entries, key=sort_key, reverse=True)[:20]
+    resp = Response(_read_cache().get("report_list", build), mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store, max-age=0"
+    return resp
 
-    return {
-        "total": total,
-        "by_type": by_type,
-        "by_day": by_day_sorted,
-        "latest": latest_entries,
-    }
+
+def compute_stats_from_db(zone: str | None = None) -> Dict[str, Any]:
+    if zone is None:
+        return _read_cache().get("stats", lambda previous: _read_model().stats())
+
+    def build(previous: Dict[str, Any] | None) -> Dict[str, Any]:
+        model = _read_model()
+        return model.stats(indexes=model.select(zone=zone))
+
+    # Une entrée par zone du registre (nombre borné)
+    return _read_cache().get(f"stats:{zone}", build)
 
 
 @app.get("/api/stats")
 def api_stats() -> Response:
-    stats = compute_stats_from_db()
+    """Statistiques globales, ou d'une zone: ?zone="""
+    zone = request.args.get("zone") or None
+    if zone and zone not in get_zones().by_id:
+        return jsonify({"status": "error", "message": f"Zone inconnue: {zone}"}), 404
+    stats = compute_stats_from_db(zone)
     resp = jsonify(stats)
     resp.headers["Cache-Control"] = "no-store, max-age=0"
     return resp
 
 
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Types servis tels quels; tout autre contenu (mime déclaré par la source) part en téléchargement brut
+MEDIA_SAFE_MIMES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+
+def _serve_media(sha256: str, thumb: bool) -> Response:
+    sha256 = sha256.lower()
+    if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+        return jsonify({"status": "error", "message": "Hash invalide"}), 400
+    store = get_media_store(DB_FILE)
+    info = store.lookup_hash(sha256)
+    if info is None:
+        return jsonify({"status": "error", "message": "Média non trouvé"}), 404
+    if thumb and info["has_thumb"]:
+        path, mime = store.path_for(sha256, thumb=True), "image/jpeg"
+    else:
+        path, mime = store.path_for(sha256), info["mime"]
+    if not os.path.exists(path):
+        return jsonify({"status": "error", "message": "Média non trouvé"}), 404
+    headers = {
+        "ETag": f'"{sha256}{"-thumb" if thumb else ""}"',
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+        "X-Content-Type-Options": "nosniff",
+    }
+    # Contenu adressé par hash: jamais modifié, un 304 suffit (média supprimé: 404 ci-dessus)
+    if request.headers.get("If-None-Match") == headers["ETag"]:
+        return Response(status=304, headers=headers)
+    if mime not in MEDIA_SAFE_MIMES:
+        mime = "application/octet-stream"
+    resp = send_file(os.path.abspath(path), mimetype=mime, conditional=False, etag=False)
+    resp.headers.update(headers)
+    return resp
+
+
+@app.get("/media/<sha256>")
+def media_original(sha256: str) -> Response:
+    return _serve_media(sha256, thumb=False)
+
+
+@app.get("/media/<sha256>/thumb")
+def media_thumbnail(sha256: str) -> Response:
+    return _serve_media(sha256, thumb=True)
+
+
 @app.get("/dashboard")
 def dashboard() -> Response:
-    return send_from_directory(".", "dashboard.html")
+    return _serve_page("dashboard.html")
 
 @app.get("/admin")
 def admin_page() -> Response:
-    return send_from_directory(".", "admin.html")
+    return _serve_page("admin.html")
 
 
 @app.get("/debug/db-vs-json")
 def debug_db_vs_json() -> Response:
-    """Compare la DB et le JSON pour voir les différences"""
+    """Cohérence DB ↔ snapshot JSON: en-têtes de version comparés en O(1) (?deep=1: empreinte du fichier), ids divergents par tranches"""
     try:
-        # Lire depuis la DB
-        db_signalements = read_signalements_from_db()
-        
-        # Lire depuis le JSON
-        json_signalements = []
-        if os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0:
-            with open(JSON_FILE, "r", encoding="utf-8") as f:
-                json_signalements = json.load(f)
-        
-        # Comparer
-        db_count = len(db_signalements)
-        json_count = len(json_signalements)
-        
-        # Trouver les signalements en DB mais pas en JSON
-        db_dates = {s["Date/Heure"] for s in db_signalements}
-        json_dates = {s["Date/Heure"] for s in json_signalements}
-        missing_in_json = db_dates - json_dates
-        
-        # Signalements manquants dans le JSON
-        missing_signalements = [s for s in db_signalements if s["Date/Heure"] in missing_in_json]
-        
+        ensure_db_exists()
+        # Écritures du snapshot en cours dans ce processus
+        _snapshot_writer().flush(5)
+        header = read_header(JSON_FILE)
+        snapshot_ids = None
+        if header is None:
+            # Snapshot antérieur aux en-têtes: version calculée une fois depuis le fichier
+            snapshot_ids = _snapshot_ids()
+            header = version_of(snapshot_ids)
+
+        with get_db_connection() as conn:
+            # En-tête lu à côté du fichier: vérifié par taille/mtime, ou SHA-256 avec ?deep=1 (périmé: recalculé)
+            result = compare(conn, header, lambda: snapshot_ids if snapshot_ids is not None else _snapshot_ids(),
+                             snapshot_file=JSON_FILE if snapshot_ids is None else None,
+                             deep=request.args.get("deep") == "1")
         return jsonify({
-            "db_count": db_count,
-            "json_count": json_count,
-            "missing_in_json_count": len(missing_in_json),
-            "missing_in_json": missing_signalements,
+            **result,
+            "db_count": result["db"]["count"],
+            "json_count": result["snapshot"]["count"],
             "db_file": DB_FILE,
             "json_file": JSON_FILE,
             "db_exists": os.path.exists(DB_FILE),
@@ -909,6 +1342,13 @@ def debug_db_vs_json() -> Response:
         return jsonify({"error": str(e)}), 500
 
 
+def _snapshot_ids() -> List[int]:
+    if not (os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0):
+        return []
+    with open(JSON_FILE, "r", encoding="utf-8") as f:
+        return [item["id"] for item in json.load(f) if item.get("id") is not None]
+
+
 @app.get("/debug/all-dbs")
 def debug_all_dbs() -> Response:
     """Vérifie tous les emplacements possibles de la base de données"""
@@ -946,6 +1386,31 @@ def debug_all_dbs() -> Response:
     })
 
 
+@app.get("/debug/backups")
+def debug_backups() -> Response:
+    """Base vive (chemin absolu) et sauvegardes vérifiées disponibles"""
+    return jsonify({
+        "live_db_file": os.path.abspath(DB_FILE),
+        "backup_dir": backup_dir(DB_FILE),
+        "interval_s": _backups.interval,
+        "last_success": _backups.last_success,
+        "last_error": _backups.last_error,
+        "backups": list_backups(DB_FILE),
+    })
+
+
+@app.get("/debug/read-cache")
+def debug_read_cache() -> Response:
+    """Taux de succès du cache des modèles de lecture de ce worker"""
+    return jsonify(_read_cache().summary())
+
+
+@app.get("/debug/boot")
+def debug_boot() -> Response:
+    """Durées des phases du démarrage (imports, bot, webhook, préchauffage)"""
+    return jsonify(BOOT.summary())
+
+
 #########################
 # WhatsApp Helpers/State #
 #########################
@@ -953,11 +1418,14 @@ def debug_all_dbs() -> Response:
 # Etat en mémoire: { wa_number: {state: str, type: str|None, text: str|None, photo_id: str|None} }
 WA_SESSIONS: Dict[str, Dict[str, Any]] = {}
 
+# Envoi non bloquant (asgi.py): hook(url, headers, data) remplace requests.post
+WA_SEND_HOOK: Callable[[str, Dict[str, str], Dict[str, Any]], None] | None = None
+
 def _wa_send_message(wa_to: str, text: str, buttons: list[dict] | None = None) -> None:
     if not (WA_ACCESS_TOKEN and WA_PHONE_NUMBER_ID):
-        print(f"❌ WhatsApp config manquante: ACCESS_TOKEN={bool(WA_ACCESS_TOKEN)}, PHONE_ID={bool(WA_PHONE_NUMBER_ID)}")
+        wa_log.error("WhatsApp config manquante", extra={"access_token_set": bool(WA_ACCESS_TOKEN), "phone_id_set": bool(WA_PHONE_NUMBER_ID)})
         return
-    url = f"https://graph.facebook.com/v20.0/{WA_PHONE_NUMBER_ID}/messages"
+    url = f"{WA_GRAPH_BASE}/{WA_GRAPH_VERSION}/{WA_PHONE_NUMBER_ID}/messages"
     headers = {"Authorization": f"Bearer {WA_ACCESS_TOKEN}", "Content-Type": "application/json"}
     data: Dict[str, Any] = {
         "messaging_product": "whatsapp",
@@ -977,12 +1445,29 @@ def _wa_send_message(wa_to: str, text: str, buttons: list[dict] | None = None) -
                 "action": {"buttons": buttons[:3]},
             },
         }
+    if WA_SEND_HOOK is not None:
+        WA_SEND_HOOK(url, headers, data)
+        return
     try:
-        print(f"📤 Envoi WhatsApp à {wa_to}: {text}")
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        print(f"📤 Réponse Meta: {response.status_code} - {response.text}")
+        import requests  # import paresseux: absent du chemin de démarrage
+
+        start = time.perf_counter()
+        try:
+            response = requests.post(url, headers=headers, json=data, timeout=10)
+        finally:
+            OUTBOUND_REQUEST_DURATION.observe(time.perf_counter() - start, service="whatsapp", endpoint="messages")
+        _wa_record_response(response.status_code, response.text, wa_to)
     except Exception as e:
-        print(f"❌ Erreur envoi WhatsApp: {e}")
+        OUTBOUND_ERRORS.inc(service="whatsapp", endpoint="messages")
+        wa_log.error("Erreur envoi WhatsApp: %s", e)
+
+def _wa_record_response(status_code: int, body: str, wa_to: str) -> None:
+    if status_code >= 400:
+        OUTBOUND_ERRORS.inc(service="whatsapp", endpoint="messages")
+        # Corps d'erreur Meta tronqué; les réponses 2xx ne sont pas journalisées
+        wa_log.warning("Réponse Meta en erreur", extra={"status": status_code, "body": redact(body)})
+    else:
+        wa_log.debug("Message WhatsApp envoyé", extra={"status": status_code, "to": redact(wa_to, "from")})
 
 def _wa_quick_button(title: str, payload: str) -> dict:
     return {"type": "reply", "reply": {"id": payload, "title": title[:20]}}
@@ -997,7 +1482,7 @@ def _wa_handle_incoming_message(wa_from: str, user_name: str, msg: Dict[str, Any
         button_reply_id = (interactive.get("button_reply") or {}).get("id")
 
     state = session.get("state")
-    print(f"🤖 WhatsApp session {wa_from}: state={state}, msg_type={msg_type}, text={text_body}, button={button_reply_id}")
+    wa_log.debug("Session WhatsApp", extra={"from": redact(wa_from, "from"), "state": state, "msg_type": msg_type, "button": button_reply_id})
 
     if state == "NEW":
         # Start: propose type
@@ -1100,18 +1585,53 @@ def _wa_finalize_report(wa_from: str, user_name: str, session: Dict[str, Any], l
         latitude=latitude,
         longitude=longitude,
         photo_id=session.get("photo_id"),
+        photo_kind="wa_image" if session.get("photo_id") else None,
     )
-    try:
-        write_json_snapshot(read_signalements_from_db())
-    except Exception:
-        pass
     WA_SESSIONS.pop(wa_from, None)
     _wa_send_message(wa_from, "✅ Signalement complet enregistré !")
 
 
+def warm_caches() -> None:
+    """Précharge ce que les premières requêtes paieraient: schéma, assets, pages, snapshot, liste et statistiques."""
+    with BOOT.phase("warm_schema"):
+        # Migrations et rattrapages une fois par processus (db_schema.py), hors des requêtes
+        ensure_db_exists()
+    with BOOT.phase("warm_assets"):
+        for page in ("carte_signalements.html", "signalement.html", "dashboard.html", "admin.html"):
+            try:
+                _pages.get(page)
+            except OSError as e:
+                log.warning("Page non préchargée (%s): %s", page, e)
+    with BOOT.phase("warm_snapshot"):
+        # Fichier JSON attendu par les consommateurs hors API (carte servie depuis le cache)
+        if not (os.path.exists(JSON_FILE) and os.path.getsize(JSON_FILE) > 0):
+            write_json_snapshot(read_signalements_from_db())
+    with BOOT.phase("warm_stats"):
+        compute_stats_from_db()
+        with app.app_context():
+            _report_list_response()
+
+
+def start_warmup() -> threading.Thread:
+    """Préchauffage en arrière-plan: /health répond pendant ce temps (appelé par wsgi.py / asgi.py)."""
+    def run() -> None:
+        try:
+            warm_caches()
+        except Exception as e:
+            log.error("Préchauffage interrompu: %s", e)
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+BOOT.record("app_module", _module_ready, time.perf_counter())
+
+
 if __name__ == "__main__":
+    start_warmup()
     ensure_db_exists()
     port = int(os.getenv("PORT", "5000"))
-    print(f"🚀 API Flask SONAGED active sur http://127.0.0.1:{port} …")
+    log.info("API Flask SONAGED active sur http://127.0.0.1:%s", port)
     app.run(host="0.0.0.0", port=port, debug=True)
 
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Archives par édition (Gamou): la table chaude ne contient que l'édition en cours.
+
+Une édition close est déplacée dans son propre fichier SQLite
+(ARCHIVE_DIR/signalements-<édition>.db, même schéma, mêmes ids). Les
+requêtes historiques attachent les archives en lecture seule (ATTACH, URI
+mode=ro), les statistiques inter-éditions lisent chaque partition dans un
+thread dédié. Le schéma d'une archive est mis à niveau par la bascule
+(journal DELETE: fichier autonome, lisible sans -wal/-shm); une archive
+créée par une version antérieure se migre avec `python archives.py migrate`.
+
+Le basculement copie d'abord les lignes dans l'archive (transaction validée)
+puis supprime de la base vive celles dont l'archive a une copie identique:
+rejouer une bascule interrompue est sans effet (INSERT OR IGNORE sur les
+ids); un id déjà archivé avec un autre contenu reste en base vive
+("conflicts"). Avec --until, les horodatages manquants sont rattrapés avant
+la sélection; les lignes à date illisible restent en base vive ("undated").
+
+Usage:
+    python archives.py rollover gamou-2025 [--until "2025-09-05 23:59:59"] [--vacuum]
+    python archives.py list
+    python archives.py migrate
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from db_schema import ensure_schema
+from log_config import get_logger
+from metrics import TimedConnection
+from report_time import backfill_timestamps, format_local, local_day, parse_bound
+
+log = get_logger("archives")
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")  # défaut: <dossier de DB_FILE>/archives
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", "4"))
+CURRENT_EDITION = "courante"
+
+_EDITION_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_COLUMNS = (
+    "id, date_heure, ts, utilisateur, type, type_id, message, photo_id, photo_kind, latitude, longitude, "
+    "duplicate_of, confirmations, zone_id"
+)
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def archive_dir(db_file: str) -> str:
+    return ARCHIVE_DIR or os.path.join(os.path.dirname(os.path.abspath(db_file)), "archives")
+
+
+def archive_path(db_file: str, edition: str) -> str:
+    if not _EDITION_RE.match(edition or "") or edition == CURRENT_EDITION:
+        raise ArchiveError(f"Nom d'édition invalide: {edition!r} (lettres, chiffres, - et _)")
+    return os.path.join(archive_dir(db_file), f"signalements-{edition}.db")
+
+
+def list_editions(db_file: str) -> List[str]:
+    directory = archive_dir(db_file)
+    if not os.path.isdir(directory):
+        return []
+    names = (re.match(r"^signalements-(.+)\.db$", f) for f in os.listdir(directory))
+    return sorted(m.group(1) for m in names if m and _EDITION_RE.match(m.group(1)))
+
+
+def _ro_uri(path: str) -> str:
+    # as_uri échappe les caractères réservés (?, #, %, espaces) du chemin
+    return Path(path).resolve().as_uri() + "?mode=ro"
+
+
+def _ro_connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(_ro_uri(path), uri=True, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def rollover(db_file: str, edition: str, until: Optional[str] = None, vacuum: bool = False) -> Dict[str, Any]:
+    """Déplace les signalements (jusqu'à `until` inclus, ou tous) vers l'archive de `edition`."""
+    path = archive_path(db_file, edition)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    until_ts = parse_bound(until, end_of_day=True) if until else None
+    if until and until_ts is None:
+        raise ArchiveError(f"Date invalide: {until!r} (AAAA-MM-JJ[ HH:MM:SS])")
+    where, params = ("WHERE ts <= ?", [until_ts]) if until else ("", [])
+
+    migrate_archive(path)
+
+    conn = sqlite3.connect(db_file, timeout=30, factory=TimedConnection, isolation_level=None)
+    try:
+        ensure_schema(conn)
+        undated = 0
+        if until:
+            # Écritures hors pipeline depuis le démarrage: ts rattrapé avant la sélection par date
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                backfill_timestamps(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # Date illisible: impossible de savoir si la ligne appartient à l'édition, elle reste en base vive
+            undated = conn.execute("SELECT COUNT(*) FROM signalements WHERE ts IS NULL").fetchone()[0]
+            if undated:
+                log.warning("Signalements sans horodatage non archivés", extra={"edition": edition, "rows": undated})
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        # 1) Copie (validée avant toute suppression)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            copied = conn.execute(
+                f"INSERT OR IGNORE INTO archive.signalements ({_COLUMNS}) SELECT {_COLUMNS} FROM main.signalements {where}",
+                params,
+            ).rowcount
+            # Mêmes ids de types que la base vive (filtres des exports résolus sur main.types)
+            conn.execute("INSERT OR IGNORE INTO archive.types SELECT * FROM main.types")
+            conn.execute(
+                f"""INSERT OR IGNORE INTO archive.media
+                    SELECT m.* FROM main.media m
+                    WHERE m.photo_id IN (SELECT photo_id FROM main.signalements {where})""",
+                params,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # 2) Suppression des lignes dont l'archive a une copie identique (les médias restent servis
+        #    par la base vive). Un id déjà archivé avec un autre contenu (INSERT OR IGNORE) n'est pas
+        #    supprimé: la ligne vive reste en place et est signalée.
+        same = " AND ".join(f"a.{column} IS s.{column}" for column in _COLUMNS.split(", "))
+        archived = f"""SELECT s.id FROM main.signalements s JOIN archive.signalements a ON a.id = s.id
+                       WHERE {'s.ts <= ? AND' if until else ''}"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            moved = conn.execute(
+                f"DELETE FROM main.signalements WHERE id IN ({archived} {same})", params
+            ).rowcount
+            conflicts = [row[0] for row in conn.execute(f"{archived} NOT ({same})", params)]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if conflicts:
+            log.warning("Ids déjà archivés avec un autre contenu, lignes laissées en base vive",
+                        extra={"edition": edition, "ids": conflicts[:20], "rows": len(conflicts)})
+        conn.execute("DETACH DATABASE archive")
+        if vacuum:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    log.info("Édition archivée", extra={"edition": edition, "copied": copied, "moved": moved, "path": path})
+    return {"edition": edition, "path": path, "copied": copied, "moved": moved,
+            "conflicts": len(conflicts), "undated": undated}
+
+
+def migrate_archive(path: str) -> None:
+    """Crée ou met l'archive au schéma courant (bascule, maintenance); les lectures ne l'ouvrent qu'en lecture seule."""
+    archive = sqlite3.connect(path, timeout=30, factory=TimedConnection)
+    try:
+        ensure_schema(archive)
+        # Archive lue en lecture seule ensuite: pas de WAL (hérité de ensure_schema)
+        archive.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        archive.close()
+
+
+@contextmanager
+def attached_editions(db_file: str, editions: List[str]) -> Iterator[sqlite3.Connection]:
+    """Connexion à la base vive avec les archives attachées en lecture seule (schémas ed_<n>)."""
+    conn = sqlite3.connect(Path(db_file).resolve().as_uri(), uri=True, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    try:
+        for index, edition in enumerate(editions):
+            path = archive_path(db_file, edition)
+            if not os.path.exists(path):
+                raise ArchiveError(f"Édition inconnue: {edition}")
+            conn.execute(f"ATTACH DATABASE ? AS ed_{index}", (_ro_uri(path),))
+        yield conn
+    finally:
+        conn.close()
+
+
+def _partition_stats(path: str, edition: str) -> Dict[str, Any]:
+    conn = _ro_connect(path)
+    try:
+        row = conn.execute("SELECT COUNT(*), MIN(ts), MAX(ts) FROM signalements").fetchone()
+        by_type = {
+            r["type"]: r["n"]
+            for r in conn.execute(
+                "SELECT t.label AS type, COUNT(*) AS n FROM signalements s JOIN types t ON t.id = s.type_id "
+                "GROUP BY s.type_id ORDER BY n DESC"
+            )
+        }
+        # Heures UTC puis jours locaux (mise en forme hors SQL)
+        by_day: Dict[str, int] = {}
+        for r in conn.execute("SELECT ts / 3600 AS heure, COUNT(*) AS n FROM signalements WHERE ts IS NOT NULL GROUP BY heure"):
+            day = local_day(r["heure"] * 3600)
+            by_day[day] = by_day.get(day, 0) + r["n"]
+    finally:
+        conn.close()
+    first, last = (format_local(ts) if ts is not None else None for ts in (row[1], row[2]))
+    return {"edition": edition, "total": row[0], "debut": first, "fin": last, "by_type": by_type,
+            "by_day": dict(sorted(by_day.items()))}
+
+
+def editions_stats(db_file: str, editions: Optional[List[str]] = None, include_current: bool = True) -> List[Dict[str, Any]]:
+    """Statistiques par édition, une partition par thread (SQLite relâche le GIL pendant les requêtes)."""
+    editions = list_editions(db_file) if editions is None else editions
+    partitions = [(archive_path(db_file, e), e) for e in editions]
+    for path, edition in partitions:
+        if not os.path.exists(path):
+            raise ArchiveError(f"Édition inconnue: {edition}")
+    if include_current and os.path.exists(db_file):
+        partitions.append((os.path.abspath(db_file), CURRENT_EDITION))
+    if not partitions:
+        return []
+    with ThreadPoolExecutor(max_workers=min(ARCHIVE_WORKERS, len(partitions))) as pool:
+        return list(pool.map(lambda p: _partition_stats(*p), partitions))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archives des signalements par édition")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "./signalements.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    roll = sub.add_parser("rollover", help="archiver une édition close")
+    roll.add_argument("edition")
+    roll.add_argument("--until", help="dernière date incluse (AAAA-MM-JJ HH:MM:SS), défaut: tout")
+    roll.add_argument("--vacuum", action="store_true", help="compacter la base vive ensuite")
+    sub.add_parser("list", help="éditions archivées et statistiques")
+    sub.add_parser("migrate", help="mettre les archives au schéma courant (après une mise à jour)")
+    args = parser.parse_args()
+
+    if args.command == "rollover":
+        result = rollover(args.db, args.edition, args.until, args.vacuum)
+        print(f"📦 {result['moved']} signalements archivés dans {result['path']}")
+        if result["conflicts"]:
+            print(f"⚠️ {result['conflicts']} ids déjà archivés avec un autre contenu, laissés en base vive")
+        if result["undated"]:
+            print(f"⚠️ {result['undated']} signalements sans date lisible, laissés en base vive")
+        print("ℹ️ Régénérer le snapshot JSON: POST /api/refresh-json")
+    elif args.command == "migrate":
+        for edition in list_editions(args.db):
+            migrate_archive(archive_path(args.db, edition))
+            print(f"🔧 {edition}: schéma à jour")
+    else:
+        for stats in editions_stats(args.db):
+            print(json.dumps({k: stats[k] for k in ("edition", "total", "debut", "fin")}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
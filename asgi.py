@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée ASGI: routes Flask et bot Telegram sur une seule boucle asyncio.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+L'application PTB (build_application) démarre sur la boucle du serveur ASGI
+au lifespan startup. POST /webhook est traité nativement: l'update est
+attendu (await process_update, dans l'ordre par chat) sur cette même boucle, sans thread
+intermédiaire ni run_coroutine_threadsafe. Les autres routes restent celles
+de Flask, exécutées dans un pool de ASGI_THREADS threads; les réponses en
+flux (/api/export) sont relayées paquet par paquet. Les envois WhatsApp
+partent sur la boucle via httpx (dépendance de python-telegram-bot): le
+webhook WhatsApp n'attend plus l'API Graph, l'ordre des messages vers un
+même destinataire est conservé.
+
+wsgi.py (gunicorn) reste le point d'entrée par défaut; uvicorn n'est requis
+que pour ce mode (requirements-dev.txt). Comparaison:
+benchmarks/load_simulator.py --server uvicorn
+
+Variables d'environnement:
+    ASGI_THREADS=16    threads pour les routes Flask
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Le bot vit sur la boucle ASGI: le thread Telegram de app.py ne doit pas démarrer
+_TG_ON_BOOT = os.getenv("START_TG_ON_BOOT", "1").lower() not in ("0", "false", "no")
+os.environ["START_TG_ON_BOOT"] = "0"
+
+import httpx  # noqa: E402
+
+import app as flask_module  # noqa: E402
+from log_config import get_logger, redact  # noqa: E402
+from metrics import (  # noqa: E402
+    HTTP_REQUEST_DURATION,
+    OUTBOUND_ERRORS,
+    OUTBOUND_REQUEST_DURATION,
+    WEBHOOK_QUEUE_DEPTH,
+    monitor_loop_lag,
+)
+
+log = get_logger("asgi")
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "16"))
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+
+def _wsgi_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        # PEP 3333: chemins en octets décodés latin-1
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_json(send: Send, status: int, payload: Dict[str, Any]) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class BotASGI:
+    """Application ASGI: /webhook natif, reste des routes délégué à Flask (WSGI) dans un pool de threads."""
+
+    def __init__(self, wsgi_app: Callable = flask_module.app, threads: int = ASGI_THREADS,
+                 warmup: bool = True) -> None:
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.warmup = warmup
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self._background: set = set()
+        self._lag_monitor: Optional[asyncio.Task] = None
+        # Dernier envoi WhatsApp en cours par destinataire (ordre conservé)
+        self._wa_tails: Dict[str, asyncio.Task] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        # Serveurs sans lifespan: démarrage à la première requête
+        await self.startup()
+        if scope["method"] == "POST" and scope["path"] == "/webhook":
+            await self._telegram_webhook(scope, receive, send)
+        else:
+            await self._call_wsgi(scope, receive, send)
+
+    # ==== Cycle de vie ====
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self) -> None:
+        async with self._start_lock:
+            if self._started:
+                return
+            self._loop = asyncio.get_running_loop()
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi-wsgi")
+            self._http = httpx.AsyncClient(timeout=10)
+            flask_module.WA_SEND_HOOK = self._submit_wa_send
+            self._started = True
+            if self.warmup:
+                flask_module.start_warmup()
+            if _TG_ON_BOOT:
+                flask_module._tg_started = True
+                try:
+                    # Même démarrage que le thread WSGI, mais sur la boucle du serveur
+                    await flask_module._start_telegram_app()
+                except Exception as e:
+                    flask_module.tg_log.error("Erreur lors du démarrage Telegram: %s", redact(str(e)))
+            else:
+                self._lag_monitor = asyncio.ensure_future(monitor_loop_lag())
+            log.info("Application ASGI démarrée", extra={"threads": self.threads, "telegram": _TG_ON_BOOT})
+
+    async def shutdown(self) -> None:
+        if not self._started:
+            return
+        if self._lag_monitor is not None:
+            self._lag_monitor.cancel()
+        # Envois WhatsApp encore en vol
+        if self._background:
+            await asyncio.wait(list(self._background), timeout=10)
+        telegram_app = flask_module.telegram_app
+        if telegram_app is not None and flask_module._tg_loop is self._loop:
+            await telegram_app.stop()
+            await telegram_app.shutdown()
+        if flask_module.WA_SEND_HOOK == self._submit_wa_send:
+            flask_module.WA_SEND_HOOK = None
+        await self._http.aclose()
+        self._executor.shutdown(wait=False)
+        self._started = False
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    # ==== Webhook Telegram natif ====
+
+    async def _telegram_webhook(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start = time.perf_counter()
+        status = await self._process_telegram_update(scope, await _read_body(receive), send)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, route="/webhook", method="POST", status=str(status))
+
+    async def _process_telegram_update(self, scope: Scope, body: bytes, send: Send) -> int:
+        headers = dict(scope.get("headers", []))
+        secret = flask_module.TG_WEBHOOK_SECRET
+        if secret and headers.get(b"x-telegram-bot-api-secret-token", b"").decode("latin-1") != secret:
+            flask_module.webhook_log.warning("Secret webhook invalide", extra={"remote_addr": (scope.get("client") or ("",))[0]})
+            await _send_json(send, 403, {"status": "forbidden"})
+            return 403
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        telegram_app = flask_module.telegram_app
+        if telegram_app is None:
+            flask_module.webhook_log.error("Application Telegram non disponible")
+            await _send_json(send, 503, {"status": "unavailable"})
+            return 503
+        try:
+            from telegram import Update as TGUpdate
+            update = TGUpdate.de_json(payload, telegram_app.bot)
+        except Exception as e:
+            flask_module.webhook_log.error("Erreur traitement update: %s", e, extra={"update_id": payload.get("update_id")})
+            await _send_json(send, 400, {"status": "error", "message": str(e)})
+            return 400
+        WEBHOOK_QUEUE_DEPTH.inc()
+        try:
+            # Même ordre par chat que le webhook WSGI (app.process_update_in_order)
+            await flask_module.process_update_in_order(update)
+        except Exception as e:
+            # Comme en WSGI: pas d'erreur HTTP, Telegram renverrait l'update
+            flask_module.webhook_log.error("Erreur traitement update: %s", e, extra={"update_id": payload.get("update_id")})
+        finally:
+            WEBHOOK_QUEUE_DEPTH.dec()
+        await _send_json(send, 200, {"status": "ok"})
+        return 200
+
+    # ==== Routes Flask (WSGI dans le pool de threads) ====
+
+    async def _call_wsgi(self, scope: Scope, receive: Receive, send: Send) -> None:
+        environ = _wsgi_environ(scope, await _read_body(receive))
+        response: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> Callable:
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+            return lambda data: None  # write() hérité: non utilisé par Flask
+
+        def first_chunk() -> Tuple[Any, Any, Optional[bytes]]:
+            result = self.wsgi_app(environ, start_response)
+            iterator = iter(result)
+            return result, iterator, next(iterator, None)
+
+        result, iterator, chunk = await self._loop.run_in_executor(self._executor, first_chunk)
+        try:
+            await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            while chunk is not None:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await self._loop.run_in_executor(self._executor, next, iterator, None)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await self._loop.run_in_executor(self._executor, close)
+
+    # ==== Envois WhatsApp non bloquants ====
+
+    def _submit_wa_send(self, url: str, headers: Dict[str, str], data: Dict[str, Any]) -> None:
+        """Hook de app._wa_send_message: appelé depuis un thread du pool, l'envoi part sur la boucle."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._spawn(self._wa_post(url, headers, data))
+        else:
+            self._loop.call_soon_threadsafe(self._spawn, self._wa_post(url, headers, data))
+
+    async def _wa_post(self, url: str, headers: Dict[str, str], data: Dict[str, Any]) -> None:
+        wa_to = str(data.get("to", ""))
+        task = asyncio.current_task()
+        previous = self._wa_tails.get(wa_to)
+        self._wa_tails[wa_to] = task
+        try:
+            if previous is not None and not previous.done():
+                await asyncio.wait([previous])
+            start = time.perf_counter()
+            try:
+                response = await self._http.post(url, headers=headers, json=data)
+            finally:
+                OUTBOUND_REQUEST_DURATION.observe(time.perf_counter() - start, service="whatsapp", endpoint="messages")
+            flask_module._wa_record_response(response.status_code, response.text, wa_to)
+        except Exception as e:
+            OUTBOUND_ERRORS.inc(service="whatsapp", endpoint="messages")
+            flask_module.wa_log.error("Erreur envoi WhatsApp: %s", e)
+        finally:
+            if self._wa_tails.get(wa_to) is task:
+                del self._wa_tails[wa_to]
+
+
+app = BotASGI()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Sauvegardes en ligne de la base SQLite (API backup de sqlite3).
+
+La copie avance par pas de BACKUP_PAGES pages avec une pause entre deux pas:
+le verrou de lecture n'est tenu que le temps d'un pas, les écritures des
+webhooks passent entre deux. Chaque copie est écrite dans un fichier
+temporaire, vérifiée par PRAGMA integrity_check, puis renommée
+(signalements-AAAAMMJJ-HHMMSS.db); seules les BACKUP_RETENTION plus récentes
+sont conservées. Avec plusieurs workers gunicorn, un verrou fichier désigne
+le seul processus qui sauvegarde.
+
+La base est en mode WAL (cf. db_schema.py): la copie lit un instantané
+(transaction de lecture ouverte pendant toute la copie) sans bloquer les
+écrivains ni recommencer. En mode journal classique, SQLite recommence la
+copie quand une autre connexion écrit entre deux pas: après
+BACKUP_MAX_RESTARTS reprises, la sauvegarde est abandonnée (BackupBusy,
+comptée dans sqlite_backup_failures_total{reason="busy"}) et retentée plus tard,
+avec un délai doublé à chaque échec (BACKUP_RETRY_S, au plus
+BACKUP_INTERVAL_S). Aucune copie ne tient le verrou de lecture plus d'un pas.
+
+Variables d'environnement:
+    BACKUP_INTERVAL_S=3600   période (0 désactive la tâche de fond)
+    BACKUP_DIR               défaut: <dossier de DB_FILE>/backups
+    BACKUP_RETENTION=24      copies conservées
+    BACKUP_PAGES=256         pages copiées par pas
+    BACKUP_SLEEP_MS=5        pause entre deux pas
+    BACKUP_MAX_RESTARTS=3    reprises tolérées avant abandon (mode journal classique)
+    BACKUP_RETRY_S=60        premier délai avant nouvelle tentative après abandon
+
+Usage:
+    python backups.py [--db signalements.db]   # une sauvegarde immédiate
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-processus
+    fcntl = None
+
+from log_config import get_logger
+from metrics import (
+    BACKUP_AGE,
+    BACKUP_DURATION,
+    BACKUP_FAILURES,
+    BACKUP_LAST_SUCCESS,
+    BACKUP_SIZE_BYTES,
+)
+
+log = get_logger("backup")
+
+BACKUP_INTERVAL_S = float(os.getenv("BACKUP_INTERVAL_S", "3600"))
+BACKUP_DIR = os.getenv("BACKUP_DIR")
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "24"))
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+BACKUP_SLEEP_MS = float(os.getenv("BACKUP_SLEEP_MS", "5"))
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+BACKUP_RETRY_S = float(os.getenv("BACKUP_RETRY_S", "60"))
+
+# Rafraîchissement de la jauge d'âge entre deux sauvegardes
+_AGE_REFRESH_S = 30
+
+
+def backup_dir(db_file: str) -> str:
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(db_file)), "backups")
+
+
+def list_backups(db_file: str) -> List[Dict[str, Any]]:
+    paths = sorted(glob.glob(os.path.join(backup_dir(db_file), "signalements-*.db")), reverse=True)
+    return [{"path": p, "size": os.path.getsize(p), "mtime": os.path.getmtime(p)} for p in paths]
+
+
+def _rotate(directory: str, retention: int) -> List[str]:
+    paths = sorted(glob.glob(os.path.join(directory, "signalements-*.db")), reverse=True)
+    removed = paths[retention:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+class BackupBusy(Exception):
+    """Copie recommencée trop souvent (écritures continues, mode journal classique): à retenter plus tard."""
+
+
+def _copy(db_file: str, tmp_path: str, pages: int, sleep_ms: float) -> Dict[str, int]:
+    """Copie vers `tmp_path` par pas de `pages` pages; retourne pas et reprises."""
+    stats = {"steps": 0, "restarts": 0}
+    previous = None
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal previous
+        stats["steps"] += 1
+        # Reste à copier en hausse: la source a changé, SQLite a recommencé
+        if previous is not None and remaining > previous:
+            stats["restarts"] += 1
+            if stats["restarts"] > BACKUP_MAX_RESTARTS:
+                raise BackupBusy(f"{stats['restarts']} reprises")
+        previous = remaining
+
+    src = sqlite3.connect(f"file:{os.path.abspath(db_file)}?mode=ro", uri=True, timeout=30, isolation_level=None)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Instantané figé pour toute la copie: les écritures (WAL) ne la font pas recommencer
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep_ms / 1000)
+    finally:
+        dst.close()
+        src.close()
+    return stats
+
+
+def backup_once(db_file: str, directory: Optional[str] = None, retention: int = BACKUP_RETENTION,
+                pages: int = BACKUP_PAGES, sleep_ms: float = BACKUP_SLEEP_MS) -> str:
+    """Copie `db_file` pas à pas, vérifie la copie, la publie et applique la rétention."""
+    directory = directory or backup_dir(db_file)
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(directory, f"signalements-{datetime.now():%Y%m%d-%H%M%S}.db")
+    tmp_path = final_path + ".tmp"
+    start = time.perf_counter()
+
+    try:
+        try:
+            stats = _copy(db_file, tmp_path, pages, sleep_ms)
+        except BackupBusy:
+            BACKUP_FAILURES.inc(reason="busy")
+            os.remove(tmp_path)
+            raise
+        check = sqlite3.connect(tmp_path)
+        try:
+            result = check.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            check.close()
+    except BackupBusy:
+        raise
+    except Exception:
+        BACKUP_FAILURES.inc(reason="backup")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if result != "ok":
+        # Copie conservée pour analyse, hors rotation
+        BACKUP_FAILURES.inc(reason="integrity")
+        os.replace(tmp_path, final_path + ".corrupt")
+        raise sqlite3.DatabaseError(f"integrity_check: {result}")
+    os.replace(tmp_path, final_path)
+
+    duration = time.perf_counter() - start
+    BACKUP_DURATION.set(duration)
+    BACKUP_LAST_SUCCESS.set(time.time())
+    BACKUP_AGE.set(0)
+    BACKUP_SIZE_BYTES.set(os.path.getsize(final_path))
+    removed = _rotate(directory, retention)
+    log.info("Sauvegarde terminée", extra={
+        "path": final_path, "duration_s": round(duration, 3), "rotated": len(removed), **stats,
+    })
+    return final_path
+
+
+class BackupScheduler:
+    """Tâche de fond: une sauvegarde toutes les `interval` secondes (processus titulaire du verrou)."""
+
+    def __init__(self, db_file: str, interval: float = BACKUP_INTERVAL_S) -> None:
+        self.db_file = db_file
+        self.interval = interval
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock_file = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _acquire_leadership(self) -> bool:
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            directory = backup_dir(self.db_file)
+            os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(os.path.join(directory, ".lock"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="sqlite-backup", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        existing = list_backups(self.db_file)
+        if existing:
+            # Âge calculé depuis la dernière copie existante (redémarrage)
+            self.last_success = existing[0]["mtime"]
+        next_run = time.time() + self.interval
+        retry_delay = BACKUP_RETRY_S
+        while True:
+            time.sleep(min(_AGE_REFRESH_S, max(0.0, next_run - time.time())))
+            if self.last_success is not None:
+                BACKUP_AGE.set(time.time() - self.last_success)
+            if time.time() < next_run:
+                continue
+            next_run += self.interval
+            if not os.path.exists(self.db_file) or not self._acquire_leadership():
+                continue
+            try:
+                backup_once(self.db_file)
+                self.last_success = time.time()
+                self.last_error = None
+                retry_delay = BACKUP_RETRY_S
+            except BackupBusy as e:
+                # Nouvelle tentative pas à pas plus tard, sans attendre la période complète
+                self.last_error = f"sauvegarde reportée: {e}"
+                next_run = time.time() + min(retry_delay, self.interval)
+                log.warning("Écritures continues pendant la sauvegarde, nouvelle tentative dans %.0f s",
+                            min(retry_delay, self.interval))
+                retry_delay *= 2
+            except Exception as e:
+                self.last_error = str(e)
+                log.error("Échec de la sauvegarde de %s: %s", self.db_file, e)
+
+
+_schedulers: Dict[str, BackupScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def start_backup_scheduler(db_file: str) -> BackupScheduler:
+    key = os.path.abspath(db_file)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = BackupScheduler(db_file)
+            _schedulers[key] = scheduler
+    scheduler.start()
+    return scheduler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sauvegarde en ligne de la base des signalements")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "./signalements.db"))
+    parser.add_argument("--dir", default=None, help="dossier des copies (défaut: BACKUP_DIR)")
+    args = parser.parse_args()
+    path = backup_once(args.db, args.dir)
+    print(f"💾 Sauvegarde vérifiée: {path}")
+
+
+if __name__ == "__main__":
+    main()
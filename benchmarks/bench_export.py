@@ -0,0 +1,60 @@
+"""
+Mémoire de l'export en flux (/api/export) comparée à /api/signalements.
+
+Chaque mesure tourne dans un processus séparé: le pic RSS (ru_maxrss) après
+la réponse, moins le pic après l'import de l'application, donne la mémoire
+consommée par la requête. L'export doit rester plat de 10k à 1M lignes.
+Le modèle de lecture en colonnes (read_model, résident dans un worker
+chaud et partagé avec /api/stats) est chargé avant la mesure de référence.
+
+    BENCH_SIZES=10000,100000,1000000 python -m pytest benchmarks/bench_export.py -q -s
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BENCH_SIZES, ROOT
+
+CHILD = r"""
+import json, os, resource, sys
+os.environ["START_TG_ON_BOOT"] = "0"
+os.environ["LOG_LEVEL"] = "WARNING"
+import app
+app.DB_FILE = sys.argv[1]
+app.JSON_FILE = sys.argv[1] + ".json"
+client = app.app.test_client()
+client.get("/health")
+app._read_model()
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+response = client.get(sys.argv[2], buffered=False)
+size = sum(len(chunk) for chunk in response.response)
+response.close()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"delta_kb": peak - base, "bytes": size}))
+"""
+
+URLS = {
+    "export_csv": "/api/export?format=csv",
+    "export_geojson_gzip": "/api/export?format=geojson&gzip=1",
+    "api_signalements": "/api/signalements",
+}
+
+
+def _measure(db_file: str, url: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD, db_file, url], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("size", BENCH_SIZES, ids=lambda size: f"{size}")
+@pytest.mark.parametrize("name", list(URLS))
+def test_peak_rss(seeded_dbs, name, size):
+    if name == "api_signalements" and size > 200_000 and not os.getenv("BENCH_MATERIALIZE"):
+        pytest.skip("liste complète en mémoire: BENCH_MATERIALIZE=1 pour la mesurer")
+    result = _measure(seeded_dbs(size), URLS[name])
+    print(f"\n{name} {size} lignes: +{result['delta_kb'] / 1024:.1f} Mo RSS, {result['bytes'] / 1e6:.1f} Mo émis")
+    if name.startswith("export"):
+        assert result["delta_kb"] < 64 * 1024, "l'export en flux ne doit pas dépendre de la taille de la base"
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks des chemins critiques: stockage, snapshot, stats, webhooks.
+
+Voir benchmarks/conftest.py pour l'usage (tailles, baseline, seuil).
+"""
+
+import asyncio
+import json
+import shutil
+import threading
+
+import pytest
+
+from conftest import BENCH_SIZES
+
+
+def _rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 5 if size <= 200_000 else 3
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    """Copie de la base pré-remplie + snapshot JSON, branchés sur app et le bot."""
+    import app as app_module
+    import gamousonagedbot
+
+    size = request.param
+    db_file = str(tmp_path / "signalements.db")
+    json_file = str(tmp_path / "signalements.json")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    for module in (app_module, gamousonagedbot):
+        monkeypatch.setattr(module, "DB_FILE", db_file)
+        monkeypatch.setattr(module, "JSON_FILE", json_file)
+    app_module.write_json_snapshot(app_module.read_signalements_from_db())
+    return {"size": size, "app": app_module, "bot": gamousonagedbot, "client": app_module.app.test_client()}
+
+
+def test_read_signalements_from_db(env, bench):
+    bench(env["app"].read_signalements_from_db, rounds=_rounds(env["size"]))
+
+
+def test_append_signalement_to_db(env, bench):
+    bench(lambda: env["app"].append_signalement_to_db("bench", "🗑 Bac plein", "bench", 14.14, -16.07),
+          rounds=50)
+
+
+def test_write_json_snapshot(env, bench):
+    data = env["app"].read_signalements_from_db()
+    bench(lambda: env["app"].write_json_snapshot(data), rounds=_rounds(env["size"]))
+
+
+def test_mise_a_jour_json(env, bench):
+    bench(env["bot"].mise_a_jour_json, rounds=_rounds(env["size"]))
+
+
+def test_compute_stats_from_db(env, bench):
+    bench(env["app"].compute_stats_from_db, rounds=_rounds(env["size"]))
+
+
+def test_get_signalements_json(env, bench):
+    client = env["client"]
+    bench(lambda: client.get("/signalements.json"), rounds=_rounds(env["size"]))
+
+
+def test_api_stats(env, bench):
+    client = env["client"]
+    bench(lambda: client.get("/api/stats"), rounds=_rounds(env["size"]))
+
+
+WA_TEXT_PAYLOAD = json.dumps({
+    "entry": [{"changes": [{"value": {
+        "contacts": [{"profile": {"name": "Bench"}}],
+        "messages": [{"from": "221770000000", "type": "text", "text": {"body": "Bac plein"}}],
+    }}]}],
+})
+
+
+def test_whatsapp_webhook_message(env, bench):
+    """Message texte: insertion + réécriture du snapshot (chemin complet)"""
+    client = env["client"]
+    bench(lambda: client.post("/webhook/whatsapp", data=WA_TEXT_PAYLOAD, content_type="application/json"),
+          rounds=_rounds(env["size"]))
+
+
+class _NoopTelegramApp:
+    """Application PTB minimale: mesure le pont Flask → boucle asyncio"""
+
+    bot = None
+
+    async def process_update(self, update):
+        return None
+
+
+def test_telegram_webhook(env, bench, monkeypatch):
+    app_module = env["app"]
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(app_module, "telegram_app", _NoopTelegramApp())
+    monkeypatch.setattr(app_module, "_tg_loop", loop)
+    monkeypatch.setattr(app_module, "TG_WEBHOOK_SECRET", None)
+    payload = json.dumps({"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "/start"}})
+    client = env["client"]
+    try:
+        bench(lambda: client.post("/webhook", data=payload, content_type="application/json"), rounds=200)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+BATCH_50 = [
+    {"Utilisateur": "bench", "Type": "🗑 Bac plein", "Message": f"lot {i}", "Latitude": 14.14, "Longitude": -16.07}
+    for i in range(50)
+]
+
+
+def test_api_batch_50(env, bench):
+    """50 signalements: une transaction et un snapshot (à comparer à 50 × POST /api/signalements)"""
+    client = env["client"]
+    bench(lambda: client.post("/api/signalements/batch", json=BATCH_50), rounds=_rounds(env["size"]))
+
+
+@pytest.mark.parametrize("query", ["caniveau", "bac plein", "bac plein&from=2025-08-30&to=2025-08-30"])
+def test_api_search(env, bench, query):
+    """Recherche plein texte: mot courant, deux mots, avec filtre de dates"""
+    client = env["client"]
+    assert client.get(f"/api/search?q={query}").status_code == 200
+    bench(lambda: client.get(f"/api/search?q={query}"), rounds=_rounds(env["size"]))
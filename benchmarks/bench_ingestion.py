@@ -0,0 +1,103 @@
+"""
+Débit d'ingestion: commit par insertion (ancien chemin) vs pipeline group commit.
+
+200 signalements par mesure, répartis entre 1, 10 ou 100 producteurs
+concurrents; chaque insertion est suivie de la mise à jour du snapshot JSON
+(par insertion pour l'ancien chemin, relecture complète par lot ou écrivain
+du snapshot par différence hors du thread d'écriture pour le pipeline).
+
+    python -m pytest benchmarks/bench_ingestion.py -q
+"""
+
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from ingestion import IngestionService
+
+TOTAL_REPORTS = 200
+
+
+@pytest.fixture
+def app_env(seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(1000), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    return app_module
+
+
+def _record(i):
+    return {
+        "date_heure": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "utilisateur": f"bench{i}",
+        "type": "🗑 Bac plein", "message": "bench", "photo_id": None, "photo_kind": None,
+        "latitude": 14.14, "longitude": -16.07,
+    }
+
+
+def _run_producers(producers, insert_one):
+    per_producer = TOTAL_REPORTS // producers
+
+    def work(p):
+        for i in range(per_producer):
+            insert_one(p * per_producer + i)
+
+    threads = [threading.Thread(target=work, args=(p,)) for p in range(producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+@pytest.mark.parametrize("producers", [1, 10, 100])
+def test_commit_par_insertion(app_env, bench, producers):
+    lock = threading.Lock()  # un seul écrivain SQLite à la fois, comme en production
+
+    def insert_one(i):
+        with lock:
+            conn = sqlite3.connect(app_env.DB_FILE, timeout=30)
+            record = _record(i)
+            conn.execute(
+                "INSERT INTO signalements (date_heure, utilisateur, type, message, photo_id, photo_kind, latitude, longitude) "
+                "VALUES (:date_heure, :utilisateur, :type, :message, :photo_id, :photo_kind, :latitude, :longitude)",
+                record,
+            )
+            conn.commit()
+            conn.close()
+            app_env.write_json_snapshot(app_env.read_signalements_from_db())
+
+    median = bench(lambda: _run_producers(producers, insert_one), rounds=3)
+    print(f"\n{producers} producteur(s), commit par insertion: {TOTAL_REPORTS / median:.0f} signalements/s")
+
+
+@pytest.mark.parametrize("producers", [1, 10, 100])
+def test_group_commit(app_env, bench, producers):
+    service = IngestionService(app_env.DB_FILE)
+    service.add_listener("snapshot", lambda records: app_env.write_json_snapshot(app_env.read_signalements_from_db()))
+    try:
+        median = bench(lambda: _run_producers(producers, lambda i: service.insert(_record(i))), rounds=3)
+    finally:
+        service.close()
+    print(f"\n{producers} producteur(s), group commit: {TOTAL_REPORTS / median:.0f} signalements/s "
+          f"({service.stats['committed'] / max(1, service.stats['batches']):.1f} par lot)")
+
+
+@pytest.mark.parametrize("producers", [1, 10, 100])
+def test_group_commit_snapshot_par_difference(app_env, bench, producers):
+    service = IngestionService(app_env.DB_FILE)
+    writer = app_env._snapshot_writer()
+    service.add_listener("snapshot", writer.add)
+    try:
+        def run():
+            _run_producers(producers, lambda i: service.insert(_record(i)))
+            writer.flush()
+        median = bench(run, rounds=3)
+    finally:
+        service.close()
+    print(f"\n{producers} producteur(s), snapshot par différence: {TOTAL_REPORTS / median:.0f} signalements/s "
+          f"({writer.stats['writes']} écritures du fichier)")
@@ -0,0 +1,110 @@
+"""
+Cache des modèles de lecture (read_cache) sous charge mixte lecture/écriture.
+
+Des lecteurs enchaînent /signalements.json, /api/stats et
+/api/admin/signalements pendant qu'un « autre worker » (connexion SQLite
+indépendante) insère BENCH_WRITE_RATE signalements par seconde. Comparaison
+cache actif / reconstruction à chaque requête (READ_CACHE=0): débit, latence
+médiane et taux de succès du cache.
+
+    BENCH_SIZES=10000,100000 python -m pytest benchmarks/bench_read_cache.py -q -s
+"""
+
+import os
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+
+import pytest
+
+from conftest import BENCH_SIZES
+
+BENCH_DURATION = float(os.getenv("BENCH_DURATION", "3"))
+BENCH_WRITE_RATE = float(os.getenv("BENCH_WRITE_RATE", "5"))
+BENCH_READERS = int(os.getenv("BENCH_READERS", "4"))
+
+ROUTES = ("/signalements.json", "/api/stats", "/api/admin/signalements")
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+    import read_cache
+
+    size = request.param
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    return {"size": size, "app": app_module, "cache": read_cache.get_read_cache(db_file), "db_file": db_file}
+
+
+def _writer(db_file: str, stop: threading.Event, written: list) -> None:
+    conn = sqlite3.connect(db_file)
+    try:
+        while not stop.wait(1 / BENCH_WRITE_RATE):
+            with conn:
+                conn.execute(
+                    "INSERT INTO signalements (date_heure, utilisateur, type, message, latitude, longitude) "
+                    "VALUES (datetime('now'), 'Bench', '🗑 Bac plein', 'Charge mixte', 14.135, -16.075)"
+                )
+            written.append(1)
+    finally:
+        conn.close()
+
+
+def _mixed_load(env) -> dict:
+    app_module = env["app"]
+    latencies: list = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    written: list = []
+
+    def reader() -> None:
+        client = app_module.app.test_client()
+        local = []
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            assert client.get(ROUTES[i % len(ROUTES)]).status_code == 200
+            local.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=_writer, args=(env["db_file"], stop, written))]
+    threads += [threading.Thread(target=reader) for _ in range(BENCH_READERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(BENCH_DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "rps": len(latencies) / BENCH_DURATION,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "writes": len(written),
+    }
+
+
+def test_charge_mixte(env):
+    cache = env["cache"]
+    env["app"].compute_stats_from_db()  # modèle chargé hors mesure
+
+    cache.enabled = False
+    uncached = _mixed_load(env)
+    cache.enabled = True
+    cache.invalidate()
+    cached = _mixed_load(env)
+
+    summary = cache.summary()
+    hits = sum(entry["hits"] for entry in summary.values())
+    misses = sum(entry["misses"] for entry in summary.values())
+    hit_rate = hits / (hits + misses) if hits + misses else 0.0
+    print(f"\n{env['size']} signalements, {BENCH_WRITE_RATE:g} écritures/s, {BENCH_READERS} lecteurs:"
+          f"\n  sans cache {uncached['rps']:.0f} req/s (p50 {uncached['p50_ms']:.1f} ms)"
+          f"\n  avec cache {cached['rps']:.0f} req/s (p50 {cached['p50_ms']:.1f} ms), succès {hit_rate:.0%}")
+    assert cached["rps"] >= uncached["rps"]
@@ -0,0 +1,103 @@
+"""
+Modèle de lecture en colonnes (read_model) comparé aux listes de dicts.
+
+Mémoire: octets par signalement (tracemalloc) de la liste de dicts de
+read_signalements_from_db et du modèle en colonnes. Temps: statistiques
+(ancien calcul sur dicts / modèle chaud) et requête bbox.
+
+    BENCH_SIZES=10000,100000,1000000 python -m pytest benchmarks/bench_read_model.py -q -s
+"""
+
+import gc
+import shutil
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from conftest import BENCH_SIZES
+
+# Centre de Medina Baye, ~1 km de côté
+BBOX = (-16.08, 14.13, -16.07, 14.14)
+
+
+def _rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 5 if size <= 200_000 else 3
+
+
+def legacy_stats(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcul de /api/stats avant le modèle en colonnes (strptime deux fois par ligne)."""
+    by_type: Dict[str, int] = {}
+    by_day: Dict[str, int] = {}
+    for item in entries:
+        type_value = item.get("Type") or "Inconnu"
+        by_type[type_value] = by_type.get(type_value, 0) + 1
+        date_raw = item.get("Date/Heure") or ""
+        try:
+            day_key = datetime.strptime(date_raw, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d")
+        except Exception:
+            day_key = date_raw[:10] or "inconnu"
+        by_day[day_key] = by_day.get(day_key, 0) + 1
+
+    def sort_key(item: Dict[str, Any]):
+        try:
+            return datetime.strptime(item.get("Date/Heure", ""), "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return datetime.min
+
+    return {"total": len(entries), "by_type": by_type, "by_day": dict(sorted(by_day.items())),
+            "latest": sorted(entries, key=sort_key, reverse=True)[:20]}
+
+
+def _allocated(build: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+    import read_model
+
+    size = request.param
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    return {"size": size, "app": app_module, "read_model": read_model, "db_file": db_file}
+
+
+def test_memoire_par_signalement(env):
+    app_module, read_model = env["app"], env["read_model"]
+    dict_bytes = _allocated(app_module.read_signalements_from_db)
+    column_bytes = _allocated(
+        lambda: read_model.ReportColumns(env["db_file"]).refresh()
+    )
+    size = env["size"]
+    print(f"\n{size} signalements: dicts {dict_bytes / size:.0f} o/signalement, "
+          f"colonnes {column_bytes / size:.0f} o/signalement (×{dict_bytes / column_bytes:.1f})")
+    assert column_bytes < dict_bytes
+
+
+def test_stats_dicts(env, bench):
+    app_module = env["app"]
+    bench(lambda: legacy_stats(app_module.read_signalements_from_db()), rounds=_rounds(env["size"]))
+
+
+def test_stats_colonnes(env, bench):
+    # Calcul lui-même: compute_stats_from_db sert le cache tant que la base ne change pas
+    model = env["app"]._read_model()  # chargement initial hors mesure
+    bench(model.stats, rounds=_rounds(env["size"]))
+
+
+def test_bbox_colonnes(env, bench):
+    model = env["app"]._read_model()
+    bench(lambda: model.dicts(model.select(bbox=BBOX)), rounds=_rounds(env["size"]))
@@ -0,0 +1,56 @@
+"""
+Cohérence base ↔ snapshot JSON: ancien diff complet (toutes les lignes des
+deux côtés, clé Date/Heure) comparé à l'en-tête de version (O(1)) et au diff
+par tranches après une écriture hors pipeline.
+
+    BENCH_SIZES=10000,100000 python -m pytest benchmarks/bench_snapshot_version.py -q
+"""
+
+import json
+import shutil
+import sqlite3
+
+import pytest
+
+from conftest import BENCH_SIZES
+
+
+def _rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 5 if size <= 200_000 else 3
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+
+    size = request.param
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    app_module.ensure_db_exists()
+    app_module.write_json_snapshot(app_module.read_signalements_from_db())
+    yield {"size": size, "app": app_module, "db_file": db_file, "client": app_module.app.test_client()}
+
+
+def _legacy_diff(app_module):
+    db_rows = app_module.read_signalements_from_db()
+    with open(app_module.JSON_FILE, "r", encoding="utf-8") as f:
+        json_rows = json.load(f)
+    db_keys = {row["Date/Heure"] for row in db_rows}
+    json_keys = {row["Date/Heure"] for row in json_rows}
+    return db_keys - json_keys, json_keys - db_keys
+
+
+def test_diff_complet(env, bench):
+    bench(lambda: _legacy_diff(env["app"]), rounds=_rounds(env["size"]))
+
+
+def test_entete_coherent(env, bench):
+    bench(lambda: env["client"].get("/debug/db-vs-json"), rounds=_rounds(env["size"]))
+
+
+def test_entete_ecart(env, bench):
+    with sqlite3.connect(env["db_file"]) as conn:
+        conn.execute("DELETE FROM signalements WHERE id = (SELECT MIN(id) FROM signalements)")
+    bench(lambda: env["client"].get("/debug/db-vs-json"), rounds=_rounds(env["size"]))
@@ -0,0 +1,90 @@
+"""
+Horodatages: texte date_heure (strptime, comparaisons de chaînes) comparé à
+l'epoch UTC entier indexé (colonne ts).
+
+Statistiques complètes (ancien calcul Python sur dicts / SQL sur date_heure /
+SQL sur ts), filtre de plage d'une journée et « 20 derniers ».
+
+    BENCH_SIZES=10000,100000 python -m pytest benchmarks/bench_timestamps.py -q
+"""
+
+import shutil
+import sqlite3
+
+import pytest
+
+from bench_read_model import legacy_stats
+from conftest import BENCH_SIZES
+
+DAY = ("2025-08-30 00:00:00", "2025-08-30 23:59:59")
+
+
+def _rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 5 if size <= 200_000 else 3
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+    from report_time import local_day, parse_local
+
+    size = request.param
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    app_module.ensure_db_exists()
+    conn = sqlite3.connect(db_file)
+    yield {"size": size, "app": app_module, "conn": conn, "local_day": local_day,
+           "day_ts": tuple(parse_local(d) for d in DAY)}
+    conn.close()
+
+
+def _sql_stats_text(conn):
+    by_type = conn.execute("SELECT type, COUNT(*) FROM signalements GROUP BY type").fetchall()
+    by_day = conn.execute("SELECT substr(date_heure, 1, 10), COUNT(*) FROM signalements GROUP BY 1").fetchall()
+    latest = conn.execute("SELECT * FROM signalements ORDER BY date_heure DESC LIMIT 20").fetchall()
+    return by_type, by_day, latest
+
+
+def _sql_stats_epoch(conn, local_day):
+    by_type = conn.execute("SELECT type_id, COUNT(*) FROM signalements GROUP BY type_id").fetchall()
+    by_day = {}
+    for hour, count in conn.execute("SELECT ts / 3600, COUNT(*) FROM signalements WHERE ts IS NOT NULL GROUP BY 1"):
+        day = local_day(hour * 3600)
+        by_day[day] = by_day.get(day, 0) + count
+    latest = conn.execute("SELECT * FROM signalements ORDER BY ts DESC LIMIT 20").fetchall()
+    return by_type, by_day, latest
+
+
+def test_stats_python_strptime(env, bench):
+    app_module = env["app"]
+    bench(lambda: legacy_stats(app_module.read_signalements_from_db()), rounds=_rounds(env["size"]))
+
+
+def test_stats_sql_date_heure(env, bench):
+    bench(lambda: _sql_stats_text(env["conn"]), rounds=_rounds(env["size"]))
+
+
+def test_stats_sql_epoch(env, bench):
+    bench(lambda: _sql_stats_epoch(env["conn"], env["local_day"]), rounds=_rounds(env["size"]))
+
+
+def test_plage_date_heure(env, bench):
+    sql = "SELECT COUNT(*) FROM signalements WHERE date_heure BETWEEN ? AND ?"
+    bench(lambda: env["conn"].execute(sql, DAY).fetchone(), rounds=_rounds(env["size"]))
+
+
+def test_plage_epoch(env, bench):
+    sql = "SELECT COUNT(*) FROM signalements WHERE ts BETWEEN ? AND ?"
+    bench(lambda: env["conn"].execute(sql, env["day_ts"]).fetchone(), rounds=_rounds(env["size"]))
+
+
+def test_derniers_date_heure(env, bench):
+    sql = "SELECT id FROM signalements ORDER BY date_heure DESC LIMIT 20"
+    bench(lambda: env["conn"].execute(sql).fetchall(), rounds=_rounds(env["size"]))
+
+
+def test_derniers_epoch(env, bench):
+    sql = "SELECT id FROM signalements ORDER BY ts DESC LIMIT 20"
+    bench(lambda: env["conn"].execute(sql).fetchall(), rounds=_rounds(env["size"]))
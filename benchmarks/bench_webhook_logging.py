@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coût de la journalisation sur le webhook WhatsApp
+
+Compare l'ancien comportement (print() synchrone des headers et du payload à
+chaque requête) à la journalisation en file (QueueHandler + thread d'écriture),
+en INFO et en DEBUG (payload masqué).
+
+Usage: python benchmarks/bench_webhook_logging.py [--requests 2000]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import log_config  # noqa: E402
+
+PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [{
+        "id": "1234567890",
+        "changes": [{
+            "field": "messages",
+            "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"display_phone_number": "221770000000", "phone_number_id": "1234"},
+                "statuses": [{"id": f"wamid.{i}", "status": "delivered", "recipient_id": "221770000000"}
+                             for i in range(20)],
+            },
+        }],
+    }],
+}
+
+
+def legacy_print_hook():
+    """Reproduit les print() supprimés de whatsapp_webhook"""
+    from flask import request
+    payload = request.get_json(silent=True) or {}
+    print("🔔 WhatsApp webhook POST appelé")
+    print(f"🔔 Headers: {dict(request.headers)}")
+    print(f"🔔 Payload: {payload}")
+    for entry in payload.get("entry") or []:
+        print(f"🔔 Changes dans entry: {len(entry.get('changes') or [])}")
+
+
+def slow_pipe_sink(bytes_per_ms):
+    """Pipe vidé à débit limité, comme un collecteur de logs sous charge"""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, "rb", buffering=0) as reader:
+            while reader.read(bytes_per_ms):
+                time.sleep(0.001)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1, encoding="utf-8")
+
+
+def run(client, n):
+    body = json.dumps(PAYLOAD)
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client.post("/webhook/whatsapp", data=body, content_type="application/json")
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sink-kb-per-ms", type=int, default=1, help="débit du collecteur de logs simulé")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DB_FILE"] = os.path.join(tmpdir, "bench.db")
+    os.environ["JSON_FILE"] = os.path.join(tmpdir, "bench.json")
+    import app as app_module
+
+    client = app_module.app.test_client()
+    run(client, 50)  # chauffe
+
+    sinks = {
+        "stdout rapide": lambda: open(os.devnull, "w", encoding="utf-8"),
+        # stdout sur Railway: un pipe vers le collecteur, bloquant quand il est plein
+        "collecteur lent": lambda: slow_pipe_sink(args.sink_kb_per_ms * 1024),
+    }
+    results = {}
+    for sink_name, make_sink in sinks.items():
+        sink = make_sink()
+        os.environ["LOG_LEVEL"] = "WARNING"
+        log_config.setup_logging(stream=sink, force=True)
+        app_module.app.before_request_funcs.setdefault(None, []).append(legacy_print_hook)
+        with contextlib.redirect_stdout(sink):
+            results[f"{sink_name}: print (ancien)"] = run(client, args.requests)
+        app_module.app.before_request_funcs[None].remove(legacy_print_hook)
+
+        for level in ("INFO", "DEBUG"):
+            os.environ["LOG_LEVEL"] = level
+            log_config.setup_logging(stream=sink, force=True)
+            results[f"{sink_name}: file de logs {level}"] = run(client, args.requests)
+        log_config.stop_logging()
+
+    print(f"{'Mode':<38} {'p50 (ms)':>10} {'p95 (ms)':>10} {'moy. (ms)':>10}")
+    for name, r in results.items():
+        print(f"{name:<38} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['mean_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Zones: recherche point dans polygone par grille comparée au parcours de
+toutes les zones, et statistiques par zone (colonne zone_id indexée, modèle
+de lecture) comparées au test des polygones à chaque lecture.
+
+Registre synthétique: ZONES_SIDE² quartiers hexagonaux sur l'emprise de
+Medina Baye.
+
+    BENCH_SIZES=10000,100000 python -m pytest benchmarks/bench_zones.py -q
+"""
+
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+
+import pytest
+
+from conftest import BENCH_SIZES
+
+ZONES_SIDE = int(os.getenv("ZONES_SIDE", "12"))
+EXTENT = (-16.12, 14.10, -16.02, 14.19)
+
+
+def _rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 5 if size <= 200_000 else 3
+
+
+def _registry(path: str) -> None:
+    min_lon, min_lat, max_lon, max_lat = EXTENT
+    w, h = (max_lon - min_lon) / ZONES_SIDE, (max_lat - min_lat) / ZONES_SIDE
+    features = []
+    for x in range(ZONES_SIDE):
+        for y in range(ZONES_SIDE):
+            cx, cy = min_lon + (x + 0.5) * w, min_lat + (y + 0.5) * h
+            ring = [[cx + w / 2 * math.cos(a * math.pi / 3), cy + h / 2 * math.sin(a * math.pi / 3)] for a in range(7)]
+            features.append({"type": "Feature", "properties": {"id": f"z{x}-{y}"},
+                             "geometry": {"type": "Polygon", "coordinates": [ring]}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f"{size}")
+def env(request, seeded_dbs, tmp_path, monkeypatch):
+    import app as app_module
+    import zones
+
+    size = request.param
+    zones_file = str(tmp_path / "zones.geojson")
+    _registry(zones_file)
+    monkeypatch.setattr(zones, "ZONES_FILE", zones_file)
+    db_file = str(tmp_path / "signalements.db")
+    shutil.copyfile(seeded_dbs(size), db_file)
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    app_module.ensure_db_exists()
+    conn = sqlite3.connect(db_file)
+    points = conn.execute("SELECT latitude, longitude FROM signalements").fetchall()
+    yield {"size": size, "app": app_module, "conn": conn, "zones": zones.get_zones(), "points": points,
+           "contains": zones._contains}
+    conn.close()
+
+
+def test_locate_parcours(env, bench):
+    index, contains = env["zones"], env["contains"]
+    points = random.Random(1).sample(env["points"], min(10_000, len(env["points"])))
+    bench(lambda: [next((z.id for z in index.zones if contains(z, lon, lat)), None) for lat, lon in points], rounds=5)
+
+
+def test_locate_grille(env, bench):
+    index = env["zones"]
+    points = random.Random(1).sample(env["points"], min(10_000, len(env["points"])))
+    bench(lambda: [index.locate(lat, lon) for lat, lon in points], rounds=5)
+
+
+def test_stats_polygones_a_la_lecture(env, bench):
+    index, conn = env["zones"], env["conn"]
+
+    def run():
+        counts = {}
+        for lat, lon in conn.execute("SELECT latitude, longitude FROM signalements"):
+            zone_id = index.locate(lat, lon)
+            counts[zone_id] = counts.get(zone_id, 0) + 1
+        return counts
+    bench(run, rounds=_rounds(env["size"]))
+
+
+def test_stats_sql_zone_id(env, bench):
+    sql = "SELECT zone_id, COUNT(*) FROM signalements GROUP BY zone_id"
+    bench(lambda: env["conn"].execute(sql).fetchall(), rounds=_rounds(env["size"]))
+
+
+def test_stats_zone_modele(env, bench):
+    model = env["app"]._read_model()
+    by_zone = model.stats()["by_zone"]
+    zone_id = max(by_zone, key=by_zone.get)
+    bench(lambda: model.stats(indexes=model.select(zone=zone_id)), rounds=_rounds(env["size"]))
@@ -0,0 +1,124 @@
+"""
+Infrastructure des micro-benchmarks (style pytest-benchmark, sans dépendance).
+
+Usage:
+    python -m pytest benchmarks/bench_hot_paths.py -q
+    BENCH_SIZES=1000,100000,1000000 python -m pytest benchmarks/bench_hot_paths.py -q
+    python -m pytest benchmarks/bench_hot_paths.py --bench-save   # enregistre la baseline
+
+Chaque mesure est comparée à benchmarks/baseline.json (si présent): le test
+échoue si la médiane dépasse la baseline de plus de BENCH_THRESHOLD (25 % par
+défaut). Les résultats de la dernière exécution sont écrits dans
+benchmarks/results.json.
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), "results.json")
+BENCH_SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "1000").split(",") if x.strip()]
+BENCH_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+
+_results: Dict[str, Dict[str, float]] = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--bench-save", action="store_true", help="enregistrer les résultats comme baseline")
+
+
+def _load_baseline() -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def seed_database(db_file: str, size: int) -> None:
+    """Remplit une base avec `size` signalements synthétiques réalistes (insertion en masse)."""
+    from generate_signalements import generate_reports, write_to_db
+
+    write_to_db(db_file, generate_reports(size, seed=size))
+
+
+@pytest.fixture(scope="session")
+def seeded_dbs(tmp_path_factory):
+    """Bases pré-remplies par taille, créées une seule fois par session."""
+    cache: Dict[int, str] = {}
+
+    def get(size: int) -> str:
+        if size not in cache:
+            path = str(tmp_path_factory.mktemp(f"seed{size}") / "signalements.db")
+            seed_database(path, size)
+            cache[size] = path
+        return cache[size]
+
+    return get
+
+
+@pytest.fixture
+def bench(request):
+    """Mesure une fonction et la compare à la baseline.
+
+    bench(fn, rounds=None) -> médiane en secondes. Le nombre de tours est
+    adapté à la taille des données si non précisé.
+    """
+    baseline = _load_baseline()
+    name = request.node.name
+
+    def run(fn: Callable[[], object], rounds: int = 5, warmup: int = 1) -> float:
+        for _ in range(warmup):
+            fn()
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        result = {
+            "median_s": statistics.median(timings),
+            "min_s": min(timings),
+            "rounds": rounds,
+        }
+        _results[name] = result
+        reference = baseline.get(name)
+        if reference and not request.config.getoption("--bench-save"):
+            limit = reference["median_s"] * (1 + BENCH_THRESHOLD)
+            assert result["median_s"] <= limit, (
+                f"Régression {name}: {result['median_s'] * 1000:.2f} ms "
+                f"> baseline {reference['median_s'] * 1000:.2f} ms (+{BENCH_THRESHOLD:.0%})"
+            )
+        return result["median_s"]
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+        json.dump(_results, f, indent=2, sort_keys=True)
+    if session.config.getoption("--bench-save"):
+        baseline = _load_baseline()
+        baseline.update(_results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.write_sep("-", "benchmarks (médiane)")
+    for name in sorted(_results):
+        r = _results[name]
+        terminalreporter.write_line(f"{name:<60} {r['median_s'] * 1000:>10.2f} ms  (min {r['min_s'] * 1000:.2f} ms, {r['rounds']} tours)")
@@ -0,0 +1,264 @@
+"""
+Serveurs factices locaux pour api.telegram.org et graph.facebook.com.
+
+Chaque serveur répond comme l'API réelle pour les méthodes utilisées par le
+bot et le webhook WhatsApp, avec latence et erreurs injectables. Les messages
+sortants (sendMessage, /messages) sont signalés via un callback
+`on_message(service, destinataire, payload)` pour que le simulateur puisse
+attendre la réponse du bot à chaque étape.
+"""
+
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow optionnel: octets JPEG minimaux
+    Image = None
+
+OnMessage = Callable[[str, str, Dict[str, Any]], None]
+
+_TG_METHOD_RE = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+_TG_FILE_RE = re.compile(r"^/file/bot[^/]+/(?P<path>.+)$")
+_WA_MESSAGES_RE = re.compile(r"^/v[\d.]+/(?P<phone_id>[^/]+)/messages$")
+_WA_MEDIA_RE = re.compile(r"^/v[\d.]+/(?P<media_id>\d+)$")
+
+
+def _jpeg_bytes() -> bytes:
+    if Image is None:
+        return b"\xff\xd8\xff\xe0" + b"\x00" * 64 + b"\xff\xd9"
+    out = io.BytesIO()
+    Image.new("RGB", (640, 480), (34, 139, 34)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+@dataclass
+class FaultConfig:
+    """Latence (ms, moyenne ± gigue) et taux d'erreurs injectées."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0       # réponses 500
+    rate_limit_rate: float = 0.0  # réponses 429 (retry_after)
+    retry_after: int = 1
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_FakeServer"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_params(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        params: Dict[str, Any] = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        content_type = self.headers.get("Content-Type", "")
+        if raw and "json" in content_type:
+            params.update(json.loads(raw))
+        elif raw and "x-www-form-urlencoded" in content_type:
+            params.update({k: v[0] for k, v in parse_qs(raw.decode()).items()})
+        return params
+
+    def _inject(self) -> Optional[str]:
+        """Applique la latence; retourne 'error' ou 'rate_limit' si une faute est injectée."""
+        faults = self.server.faults
+        delay = max(0.0, random.gauss(faults.latency_ms, faults.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        draw = random.random()
+        if draw < faults.error_rate:
+            return "error"
+        if draw < faults.error_rate + faults.rate_limit_rate:
+            return "rate_limit"
+        return None
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, verb: str) -> None:
+        params = self._read_params()
+        path = urlsplit(self.path).path
+        self.server.route(self, verb, path, params)
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, faults: FaultConfig, on_message: Optional[OnMessage], port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), _FakeHandler)
+        self.faults = faults
+        self.on_message = on_message
+        self.calls: Counter = Counter()
+        self.faults_injected: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, name: str, fault: Optional[str] = None) -> None:
+        with self._lock:
+            self.calls[name] += 1
+            if fault:
+                self.faults_injected[f"{name}:{fault}"] += 1
+
+    def start(self) -> "_FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self.calls), "faults": dict(self.faults_injected)}
+
+    def route(self, handler: _FakeHandler, verb: str, path: str, params: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class FakeTelegramAPI(_FakeServer):
+    """Imite la Bot API: getMe, setWebhook, sendMessage, sendPhoto, getFile, …"""
+
+    BOT_USER = {"id": 999000111, "is_bot": True, "first_name": "Sonaged", "username": "sonaged_fake_bot"}
+
+    def __init__(self, faults: Optional[FaultConfig] = None, on_message: Optional[OnMessage] = None,
+                 port: int = 0) -> None:
+        super().__init__(faults or FaultConfig(), on_message, port)
+        self._message_id = 0
+        self.photo = _jpeg_bytes()
+
+    def _next_message_id(self) -> int:
+        with self._lock:
+            self._message_id += 1
+            return self._message_id
+
+    def _message(self, params: Dict[str, Any], **content: Any) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": self._next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+            "from": self.BOT_USER,
+            **content,
+        }
+
+    def route(self, handler: _FakeHandler, verb: str, path: str, params: Dict[str, Any]) -> None:
+        file_match = _TG_FILE_RE.match(path)
+        if file_match:
+            self.count("file")
+            handler._send(200, self.photo, "image/jpeg")
+            return
+        match = _TG_METHOD_RE.match(path)
+        if not match:
+            handler._send_json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+        method = match.group("method")
+        fault = handler._inject()
+        self.count(method, fault)
+        if fault == "error":
+            handler._send_json(500, {"ok": False, "error_code": 500, "description": "Internal Server Error"})
+            return
+        if fault == "rate_limit":
+            retry_after = self.faults.retry_after
+            handler._send_json(429, {
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            })
+            return
+
+        if method == "getMe":
+            result: Any = self.BOT_USER
+        elif method in ("setWebhook", "deleteWebhook", "setMyCommands", "answerCallbackQuery"):
+            result = True
+        elif method == "getWebhookInfo":
+            result = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        elif method == "getFile":
+            file_id = str(params.get("file_id", ""))
+            result = {"file_id": file_id, "file_unique_id": file_id[-16:], "file_size": len(self.photo),
+                      "file_path": f"photos/{file_id[-16:]}.jpg"}
+        elif method == "sendMessage":
+            result = self._message(params, text=params.get("text", ""))
+        elif method in ("sendPhoto", "sendDocument"):
+            file_id = str(params.get("photo") or params.get("document") or "")
+            if method == "sendPhoto":
+                media = {"photo": [{"file_id": file_id, "file_unique_id": file_id[-16:], "width": 640, "height": 480}]}
+            else:
+                media = {"document": {"file_id": file_id, "file_unique_id": file_id[-16:]}}
+            result = self._message(params, caption=params.get("caption"), **media)
+        else:
+            result = True
+        handler._send_json(200, {"ok": True, "result": result})
+        if method.startswith("send") and self.on_message:
+            self.on_message("telegram", str(params.get("chat_id")), params)
+
+
+class FakeGraphAPI(_FakeServer):
+    """Imite Graph API WhatsApp: POST /<phone_id>/messages, GET /<media_id> et le CDN média."""
+
+    def __init__(self, faults: Optional[FaultConfig] = None, on_message: Optional[OnMessage] = None,
+                 port: int = 0) -> None:
+        super().__init__(faults or FaultConfig(), on_message, port)
+        self.photo = _jpeg_bytes()
+
+    def route(self, handler: _FakeHandler, verb: str, path: str, params: Dict[str, Any]) -> None:
+        if path.startswith("/wa-cdn/"):
+            self.count("media_download")
+            handler._send(200, self.photo, "image/jpeg")
+            return
+        messages = _WA_MESSAGES_RE.match(path)
+        media = _WA_MEDIA_RE.match(path)
+        if not (messages and verb == "POST") and not media:
+            handler._send_json(404, {"error": {"message": "Unknown path", "code": 100}})
+            return
+        name = "messages" if messages else "media"
+        fault = handler._inject()
+        self.count(name, fault)
+        if fault == "error":
+            handler._send_json(500, {"error": {"message": "Internal error", "code": 1}})
+            return
+        if fault == "rate_limit":
+            handler._send_json(429, {"error": {"message": "Rate limit hit", "code": 130429}})
+            return
+        if media:
+            media_id = media.group("media_id")
+            handler._send_json(200, {"url": f"{self.base_url}/wa-cdn/{media_id}", "mime_type": "image/jpeg",
+                                     "file_size": len(self.photo), "id": media_id})
+            return
+        to = str(params.get("to", ""))
+        handler._send_json(200, {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": f"wamid.FAKE{random.getrandbits(48):x}"}],
+        })
+        if self.on_message:
+            self.on_message("whatsapp", to, params)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Simulateur de charge de bout en bout (dimensionnement du déploiement Railway).
+
+Démarre des serveurs factices pour api.telegram.org et graph.facebook.com
+(latence et erreurs injectables), lance `wsgi:app` sous gunicorn (ou
+`asgi:app` sous uvicorn avec --server uvicorn) configuré pour les utiliser, puis fait dérouler des milliers de conversations complètes:
+    Telegram: /start → type → texte → [photo] → localisation  (POST /webhook)
+    WhatsApp: salut → bouton type → texte → [image] → localisation  (POST /webhook/whatsapp)
+    Web: POST /api/signalements
+Chaque étape est chronométrée de l'envoi jusqu'à la réponse du bot reçue par
+l'API factice. Rapport: débit, p50/p95/p99 par étape, taux d'erreurs.
+
+Exemples:
+    python benchmarks/load_simulator.py --reporters 2000 --concurrency 500
+    python benchmarks/load_simulator.py --reporters 500 --api-latency-ms 300 --api-error-rate 0.02 --threads 16
+    python benchmarks/load_simulator.py --reporters 2000 --concurrency 500 --server uvicorn   # comparaison ASGI
+    python benchmarks/load_simulator.py --target http://127.0.0.1:5000 --telegram-port 8081 --graph-port 8082
+
+Avec --target, le serveur doit déjà pointer vers les API factices
+(TELEGRAM_API_BASE, WA_GRAPH_BASE, WEBHOOK_SECRET=loadtest-secret).
+
+Note: l'état des conversations (ConversationHandler PTB, WA_SESSIONS) est en
+mémoire par processus; avec plusieurs workers gunicorn, les étapes d'une même
+conversation peuvent arriver sur des workers différents et rester sans réponse.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from fake_apis import FakeGraphAPI, FakeTelegramAPI, FaultConfig
+from generate_signalements import generate_reports, telegram_updates, whatsapp_webhooks, write_to_db
+
+BOT_TOKEN = "123456789:LOADTEST" + "x" * 32
+WEBHOOK_SECRET = "loadtest-secret"
+WA_PHONE_NUMBER_ID = "100000000000001"
+GROUP_CHAT_ID = "-1001000000001"
+
+Step = Tuple[str, str, Dict[str, Any]]  # (nom d'étape, clé destinataire, payload)
+
+
+class Inbox:
+    """Réponses attendues du bot, par destinataire (alimentées par les API factices)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.waiting: Dict[str, Deque[asyncio.Future]] = defaultdict(deque)
+        self.unsolicited = 0
+
+    def expect(self, key: str) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.waiting[key].append(future)
+        return future
+
+    def notify(self, service: str, to: str, payload: Dict[str, Any]) -> None:
+        # Appelé depuis les threads des serveurs factices
+        self.loop.call_soon_threadsafe(self._deliver, f"{service}:{to}")
+
+    def _deliver(self, key: str) -> None:
+        queue = self.waiting.get(key)
+        while queue:
+            future = queue.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.waiting.pop(key, None)
+        # Notifications de groupe, second message après la localisation, …
+        self.unsolicited += 1
+
+
+class StepStats:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.requests = 0
+        self.conversations: Counter = Counter()
+
+    def observe(self, step: str, seconds: float) -> None:
+        self.latencies[step].append(seconds)
+
+    def error(self, step: str, kind: str) -> None:
+        self.errors[step][kind] += 1
+
+    @staticmethod
+    def percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return float("nan")
+        ordered = sorted(values)
+        return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        steps = {}
+        for step in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(step, [])
+            errors = sum(self.errors[step].values())
+            total = len(values) + errors
+            steps[step] = {
+                "ok": len(values),
+                "errors": dict(self.errors[step]),
+                "error_rate": errors / total if total else 0.0,
+                "p50_ms": self.percentile(values, 50) * 1000,
+                "p95_ms": self.percentile(values, 95) * 1000,
+                "p99_ms": self.percentile(values, 99) * 1000,
+            }
+        return steps
+
+
+# ==== Conversations ====
+def _telegram_steps(report: Dict[str, Any], conv_id: int, next_update_id) -> List[Step]:
+    chat_id = 5_000_000 + conv_id
+    updates = [u for _, u in telegram_updates(report, 0)]
+    names = ["start", "type", "text"] + (["photo"] if len(updates) == 5 else []) + ["location"]
+    steps = []
+    for name, update in zip(names, updates):
+        update["update_id"] = next_update_id()
+        update["message"]["chat"]["id"] = update["message"]["from"]["id"] = chat_id
+        steps.append((f"telegram.{name}", f"telegram:{chat_id}", update))
+    return steps
+
+
+def _whatsapp_steps(report: Dict[str, Any], conv_id: int) -> List[Step]:
+    wa_from = f"22170{conv_id:07d}"
+    webhooks = [p for _, p in whatsapp_webhooks(report)]
+    names = ["hello", "type", "text"] + (["image"] if len(webhooks) == 5 else []) + ["location"]
+    steps = []
+    for name, payload in zip(names, webhooks):
+        value = payload["entry"][0]["changes"][0]["value"]
+        value["messages"][0]["from"] = value["contacts"][0]["wa_id"] = wa_from
+        steps.append((f"whatsapp.{name}", f"whatsapp:{wa_from}", payload))
+    return steps
+
+
+def _web_steps(report: Dict[str, Any]) -> List[Step]:
+    payload = {
+        "Utilisateur": report["utilisateur"], "Type": report["type"], "Message": report["message"],
+        "Latitude": report["latitude"], "Longitude": report["longitude"],
+    }
+    return [("web.create", "", payload)]
+
+
+def build_conversations(count: int, seed: int) -> List[Tuple[str, List[Step]]]:
+    counter = iter(range(1, 10 ** 9))
+    conversations = []
+    for conv_id, report in enumerate(generate_reports(count, seed=seed, photo_ratio=0.35)):
+        channel = report["channel"]
+        if channel == "telegram":
+            steps = _telegram_steps(report, conv_id, lambda: next(counter))
+        elif channel == "whatsapp":
+            steps = _whatsapp_steps(report, conv_id)
+        else:
+            steps = _web_steps(report)
+        conversations.append((channel, steps))
+    return conversations
+
+
+async def run_conversation(client: httpx.AsyncClient, target: str, channel: str, steps: List[Step],
+                           inbox: Inbox, stats: StepStats, args: argparse.Namespace) -> None:
+    for step, key, payload in steps:
+        waiter = inbox.expect(key) if key else None
+        start = time.perf_counter()
+        try:
+            stats.requests += 1
+            if channel == "telegram":
+                response = await client.post(f"{target}/webhook", json=payload,
+                                             headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET})
+            elif channel == "whatsapp":
+                response = await client.post(f"{target}/webhook/whatsapp", json=payload)
+            else:
+                response = await client.post(f"{target}/api/signalements", json=payload)
+        except httpx.HTTPError as e:
+            stats.error(step, type(e).__name__)
+            stats.conversations["failed"] += 1
+            return
+        if response.status_code >= 400:
+            stats.error(step, f"http_{response.status_code}")
+            stats.conversations["failed"] += 1
+            return
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter, args.reply_timeout)
+            except asyncio.TimeoutError:
+                stats.error(step, "no_reply")
+                stats.conversations["failed"] += 1
+                return
+        stats.observe(step, time.perf_counter() - start)
+        if args.think_ms:
+            await asyncio.sleep(random.expovariate(1000 / args.think_ms))
+    stats.conversations["completed"] += 1
+
+
+async def drive(target: str, conversations: List[Tuple[str, List[Step]]], inbox: Inbox,
+                args: argparse.Namespace) -> Tuple[StepStats, float]:
+    stats = StepStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.request_timeout) as client:
+        async def one(index: int, channel: str, steps: List[Step]) -> None:
+            if args.ramp:
+                await asyncio.sleep(args.ramp * index / len(conversations))
+            async with semaphore:
+                await run_conversation(client, target, channel, steps, inbox, stats, args)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, channel, steps) for i, (channel, steps) in enumerate(conversations)))
+        return stats, time.perf_counter() - start
+
+
+# ==== Serveur sous test ====
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, workdir: str, telegram_base: str, graph_base: str
+                   ) -> Tuple[subprocess.Popen, str, str]:
+    port = _free_port()
+    target = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "START_TG_ON_BOOT": "1",
+        "WEBHOOK_URL": target,
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "TELEGRAM_API_BASE": telegram_base,
+        "WA_GRAPH_BASE": graph_base,
+        "WA_ACCESS_TOKEN": "loadtest-wa-token",
+        "WA_PHONE_NUMBER_ID": WA_PHONE_NUMBER_ID,
+        "GROUP_CHAT_ID": GROUP_CHAT_ID,
+        "DB_FILE": os.path.join(workdir, "signalements.db"),
+        "JSON_FILE": os.path.join(workdir, "signalements.json"),
+        "MEDIA_DIR": os.path.join(workdir, "media"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    log_path = os.path.join(workdir, f"{args.server}.log")
+    if args.server == "uvicorn":
+        # Bot et routes sur la boucle uvicorn, routes Flask dans ASGI_THREADS threads
+        env["ASGI_THREADS"] = str(args.threads)
+        cmd = [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers),
+            "--backlog", "2048",
+            "--no-access-log",
+        ]
+    else:
+        cmd = [
+            sys.executable, "-m", "gunicorn", "wsgi:app",
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(args.workers),
+            "--threads", str(args.threads),
+            "--worker-class", "gthread",
+            "--backlog", "2048",
+        ]
+    with open(log_path, "ab") as log_file:
+        process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    return process, target, log_path
+
+
+def wait_ready(target: str, telegram: FakeTelegramAPI, workers: int, timeout: float = 60) -> None:
+    """Attend /health puis l'enregistrement du webhook par chaque worker (boucle PTB prête)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            healthy = httpx.get(f"{target}/health", timeout=2).status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        if healthy and telegram.stats()["calls"].get("setWebhook", 0) >= workers:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("Le serveur n'est pas prêt (voir le log du serveur)")
+
+
+# ==== Rapport ====
+def print_report(stats: StepStats, elapsed: float, inbox: Inbox, telegram: FakeTelegramAPI,
+                 graph: FakeGraphAPI) -> Dict[str, Any]:
+    steps = stats.summary()
+    completed = stats.conversations["completed"]
+    failed = stats.conversations["failed"]
+    print()
+    print(f"Durée: {elapsed:.1f} s — conversations: {completed} terminées, {failed} en échec")
+    print(f"Débit: {completed / elapsed:.1f} conversations/s, {stats.requests / elapsed:.1f} requêtes/s")
+    print()
+    print(f"{'étape':<22}{'ok':>8}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  erreurs")
+    for name, s in steps.items():
+        errors = ", ".join(f"{k}={v}" for k, v in s["errors"].items())
+        print(f"{name:<22}{s['ok']:>8}{s['error_rate'] * 100:>8.2f}{s['p50_ms']:>10.1f}"
+              f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}  {errors}")
+    print()
+    print(f"API Telegram factice: {telegram.stats()}")
+    print(f"Graph API factice:    {graph.stats()}")
+    print(f"Messages sans attente (notifications de groupe, relances): {inbox.unsolicited}")
+    return {
+        "elapsed_s": elapsed,
+        "conversations": dict(stats.conversations),
+        "requests": stats.requests,
+        "throughput_conversations_s": completed / elapsed,
+        "throughput_requests_s": stats.requests / elapsed,
+        "steps": steps,
+        "telegram_api": telegram.stats(),
+        "graph_api": graph.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge de bout en bout avec API Telegram/WhatsApp factices")
+    parser.add_argument("--reporters", type=int, default=1000, help="nombre de conversations simulées")
+    parser.add_argument("--concurrency", type=int, default=200, help="conversations simultanées max")
+    parser.add_argument("--ramp", type=float, default=5.0, help="montée en charge (s)")
+    parser.add_argument("--think-ms", type=float, default=0, help="temps de réflexion moyen entre étapes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--preload", type=int, default=0, help="signalements existants avant le test")
+    parser.add_argument("--api-latency-ms", type=float, default=50)
+    parser.add_argument("--api-jitter-ms", type=float, default=20)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--api-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--reply-timeout", type=float, default=30)
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn",
+                        help="serveur lancé: gunicorn wsgi:app ou uvicorn asgi:app")
+    parser.add_argument("--target", help="serveur déjà démarré (sinon --server est lancé)")
+    parser.add_argument("--telegram-port", type=int, default=0)
+    parser.add_argument("--graph-port", type=int, default=0)
+    parser.add_argument("--json-out", help="écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--keep", action="store_true", help="conserver le dossier de travail (base, logs)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    inbox = Inbox(loop)
+    faults = FaultConfig(args.api_latency_ms, args.api_jitter_ms, args.api_error_rate, args.api_rate_limit_rate)
+    telegram = FakeTelegramAPI(faults, inbox.notify, port=args.telegram_port).start()
+    graph = FakeGraphAPI(faults, inbox.notify, port=args.graph_port).start()
+    print(f"API factices: Telegram {telegram.base_url}, Graph {graph.base_url}")
+
+    workdir = tempfile.mkdtemp(prefix="sonaged-load-")
+    process = None
+    try:
+        if args.target:
+            target = args.target.rstrip("/")
+        else:
+            if args.preload:
+                write_to_db(os.path.join(workdir, "signalements.db"),
+                            generate_reports(args.preload, seed=args.seed + 1))
+            process, target, log_path = start_server(args, workdir, telegram.base_url, graph.base_url)
+            entry = "asgi:app" if args.server == "uvicorn" else "wsgi:app"
+            print(f"{args.server} {entry} sur {target} ({args.workers} worker(s) × {args.threads} threads), logs: {log_path}")
+            wait_ready(target, telegram, args.workers)
+
+        conversations = build_conversations(args.reporters, args.seed)
+        print(f"{len(conversations)} conversations, concurrence {args.concurrency}, montée {args.ramp:.0f} s")
+        stats, elapsed = loop.run_until_complete(drive(target, conversations, inbox, args))
+        report = print_report(stats, elapsed, inbox, telegram, graph)
+        if args.json_out:
+            with open(args.json_out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        telegram.stop()
+        graph.stop()
+        loop.close()
+        if args.keep:
+            print(f"Dossier de travail conservé: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Profil du démarrage à froid (healthcheck Railway: 15 s).
+
+Les phases du démarrage (imports, application Flask, bot Telegram, webhook,
+préchauffage des caches) sont chronométrées dans BOOT et exposées par
+/debug/boot; avec BOOT_PROFILE=1 chaque phase est aussi journalisée.
+
+En ligne de commande, mesure le coût des imports (python -X importtime) dans
+un processus neuf et affiche les modules les plus coûteux.
+
+Variables d'environnement:
+    BOOT_PROFILE=0   journaliser les phases du démarrage
+
+Usage:
+    python boot_profile.py [--top 25] [--telegram]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from log_config import get_logger
+
+log = get_logger("boot")
+
+BOOT_PROFILE = os.getenv("BOOT_PROFILE", "0").lower() in ("1", "true", "yes")
+
+
+class BootTimer:
+    """Durées des phases du démarrage, en ms depuis l'import de ce module."""
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self._phases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, started: float, ended: float) -> None:
+        phase = {
+            "start_ms": round((started - self.origin) * 1000, 1),
+            "duration_ms": round((ended - started) * 1000, 1),
+        }
+        with self._lock:
+            self._phases[name] = phase
+        if BOOT_PROFILE:
+            log.info("Phase de démarrage", extra={"phase": name, **phase})
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, time.perf_counter())
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return dict(sorted(self._phases.items(), key=lambda kv: kv[1]["start_ms"]))
+
+
+BOOT = BootTimer()
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Lignes `import time: self | cumulé | module` → [(module, self_us, cumulé_us, profondeur)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Imbrication: deux espaces par niveau après le séparateur
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Coût des imports au démarrage à froid")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--telegram", action="store_true", help="inclure le bot (gamousonagedbot, telegram)")
+    args = parser.parse_args()
+
+    code = "import app" + ("; import gamousonagedbot" if args.telegram else "")
+    env = dict(os.environ, START_TG_ON_BOOT="0", LOG_LEVEL="WARNING")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        sys.exit(result.returncode)
+
+    modules = parse_importtime(result.stderr)
+    imports_us = sum(m[2] for m in modules if m[3] == 0)
+    print(f"⏱️ Processus complet: {elapsed * 1000:.0f} ms, imports: {imports_us / 1000:.0f} ms")
+    print(f"{'module':<40} {'cumulé ms':>10} {'propre ms':>10}")
+    for name, self_us, cumulative_us, _ in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"{name[:40]:<40} {cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,12 +16,12 @@ if not os.getenv('BOT_TOKEN'):
     sys.exit(1)
 
 # Importer la factory et lancer le bot
-from gamousonagedbot import build_application, GROUP_CHAT_ID
+from gamousonagedbot import build_application, NOTIFY_CHAT_IDS
 
 if __name__ == "__main__":
     print("🤖 Démarrage du bot Telegram SONAGED...")
-    if GROUP_CHAT_ID:
-        print(f"📢 Notifications activées pour le groupe: {GROUP_CHAT_ID}")
+    if NOTIFY_CHAT_IDS:
+        print(f"📢 Notifications activées pour les groupes: {NOTIFY_CHAT_IDS}")
     else:
         print("⚠️ Notifications groupe désactivées (GROUP_CHAT_ID = None)")
     application = build_application()
@@ -0,0 +1,201 @@
+"""
+Schéma SQLite partagé par l'API Flask et le bot Telegram.
+
+Les colonnes ajoutées après la création initiale de la table sont migrées
+automatiquement (ALTER TABLE) à la première ouverture de la base par le
+processus, de même que les types des lignes sans type_id (cf.
+report_types.py), les horodatages des lignes sans ts (cf. report_time.py) et
+les zones des lignes non rattachées (cf. zones.py). Les ouvertures suivantes
+du même fichier (même chemin, même inode: une base restaurée est migrée à
+nouveau) ne font rien: les requêtes ne paient ni migration ni rattrapage.
+Les écritures hors pipeline faites pendant la vie du processus sont
+rattrapées par `run_backfills` (python zones.py backfill) ou au redémarrage.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from log_config import get_logger
+from report_time import backfill_timestamps
+from report_types import backfill_type_ids, ensure_types_table
+from snapshot_version import ensure_version_tables
+from zones import backfill_zone_ids
+
+log = get_logger("db")
+
+# Bases déjà migrées par ce processus: (chemin, périphérique, inode)
+_migrated: set = set()
+_migrated_lock = threading.Lock()
+
+# Colonnes ajoutées au fil des versions: nom -> définition SQL
+EXTRA_COLUMNS = {
+    "photo_id": "TEXT",
+    # 'photo' / 'document' (file_id Telegram) ou 'wa_image' (media id WhatsApp)
+    "photo_kind": "TEXT",
+    # Doublons spatio-temporels (cf. dedup.py): id de l'original, confirmations reçues par l'original
+    "duplicate_of": "INTEGER",
+    "confirmations": "INTEGER NOT NULL DEFAULT 0",
+    # Type normalisé (cf. report_types.py), le libellé canonique reste dans `type`
+    "type_id": "INTEGER REFERENCES types(id)",
+    # Instant UTC en secondes (cf. report_time.py), date_heure reste le texte local
+    "ts": "INTEGER",
+    # Quartier / secteur (cf. zones.py), rattaché par point dans polygone
+    "zone_id": "TEXT",
+    # Identifiant généré par le client (file d'attente hors ligne): un renvoi ne crée pas de doublon
+    "client_id": "TEXT",
+}
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _backfill_photo_kind(conn: sqlite3.Connection) -> None:
+    # Préfixes des file_id Telegram: Ag... pour les photos, BQ... pour les documents (AgAC, AgAD, BQAC...);
+    # les autres ids restent NULL et le dispatcher essaie photo puis document (notifications.py)
+    conn.execute("""
+        UPDATE signalements SET photo_kind = CASE
+            WHEN photo_id GLOB 'Ag*' THEN 'photo'
+            WHEN photo_id GLOB 'BQ*' THEN 'document'
+            WHEN photo_id GLOB '[0-9]*' THEN 'wa_image'
+        END
+        WHERE photo_id IS NOT NULL AND photo_kind IS NULL
+    """)
+
+
+def _ensure_fts(conn: sqlite3.Connection) -> None:
+    """Index plein texte (FTS5) des messages et auteurs, synchronisé par triggers.
+
+    Tokenisation unicode61 sans diacritiques: « depot » trouve « Dépôt ».
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'signalements_fts'").fetchone():
+        return
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE signalements_fts USING fts5(
+                message, utilisateur,
+                content='signalements', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        log.warning("FTS5 indisponible, recherche plein texte désactivée: %s", e)
+        return
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS signalements_fts_ai AFTER INSERT ON signalements BEGIN
+            INSERT INTO signalements_fts(rowid, message, utilisateur) VALUES (new.id, new.message, new.utilisateur);
+        END;
+        CREATE TRIGGER IF NOT EXISTS signalements_fts_ad AFTER DELETE ON signalements BEGIN
+            INSERT INTO signalements_fts(signalements_fts, rowid, message, utilisateur)
+            VALUES ('delete', old.id, old.message, old.utilisateur);
+        END;
+        CREATE TRIGGER IF NOT EXISTS signalements_fts_au AFTER UPDATE OF message, utilisateur ON signalements BEGIN
+            INSERT INTO signalements_fts(signalements_fts, rowid, message, utilisateur)
+            VALUES ('delete', old.id, old.message, old.utilisateur);
+            INSERT INTO signalements_fts(rowid, message, utilisateur) VALUES (new.id, new.message, new.utilisateur);
+        END;
+    """)
+    log.info("Migration: indexation plein texte des signalements existants")
+    conn.execute("INSERT INTO signalements_fts(signalements_fts) VALUES ('rebuild')")
+
+
+def _db_key(conn: sqlite3.Connection) -> Optional[Tuple[str, int, int]]:
+    path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+    if not path:
+        return None  # base en mémoire: toujours migrée
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.realpath(path), stat.st_dev, stat.st_ino
+
+
+def run_backfills(conn: sqlite3.Connection) -> None:
+    """Normalise les lignes anciennes ou écrites hors pipeline (types, horodatages, zones).
+
+    Les dates illisibles gardent ts NULL et sont réexaminées à chaque appel:
+    à réserver au démarrage et à la maintenance.
+    """
+    if conn.execute("SELECT 1 FROM signalements WHERE type_id IS NULL LIMIT 1").fetchone():
+        log.info("Migration: normalisation des types", extra={"rows": backfill_type_ids(conn)})
+    if conn.execute("SELECT 1 FROM signalements WHERE ts IS NULL LIMIT 1").fetchone():
+        filled = backfill_timestamps(conn)
+        if filled:
+            log.info("Migration: horodatages UTC renseignés", extra={"rows": filled})
+    tagged = backfill_zone_ids(conn)
+    if tagged:
+        log.info("Migration: signalements rattachés aux zones", extra={"rows": tagged})
+    conn.commit()
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Crée / migre la base une fois par processus et par fichier (sans effet ensuite)."""
+    if _db_key(conn) in _migrated:
+        return
+    with _migrated_lock:
+        if _db_key(conn) in _migrated:
+            return
+        _migrate(conn)
+        key = _db_key(conn)
+        if key is not None:
+            _migrated.add(key)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # WAL (persistant dans le fichier): lecteurs et sauvegardes ne bloquent pas les écrivains
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS signalements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_heure TEXT NOT NULL,
+            utilisateur TEXT NOT NULL,
+            type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            photo_id TEXT,
+            photo_kind TEXT,
+            latitude REAL,
+            longitude REAL,
+            duplicate_of INTEGER,
+            confirmations INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Photos téléchargées localement (stockage adressé par contenu, cf. media_store.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media (
+            photo_id TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            mime TEXT,
+            size INTEGER,
+            has_thumb INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_media_sha256 ON media(sha256)")
+    # Suppressions journalisées: snapshots et caches se mettent à jour sans relecture complète
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tombstones (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            signalement_id INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+    """)
+    ensure_types_table(conn)
+    columns = _table_columns(conn, "signalements")
+    for name, definition in EXTRA_COLUMNS.items():
+        if name not in columns:
+            log.info("Migration: ajout de la colonne %s", name)
+            conn.execute(f"ALTER TABLE signalements ADD COLUMN {name} {definition}")
+            if name == "photo_kind":
+                _backfill_photo_kind(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_signalements_type_id ON signalements(type_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_signalements_ts ON signalements(ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_signalements_zone_id ON signalements(zone_id)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_signalements_client_id ON signalements(client_id)")
+    # Lignes anciennes ou écrites hors pipeline (imports, scripts)
+    run_backfills(conn)
+    _ensure_fts(conn)
+    conn.commit()
+    # Version des ids (cohérence base ↔ snapshot JSON), entretenue par triggers
+    ensure_version_tables(conn)
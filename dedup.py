@@ -0,0 +1,145 @@
+"""
+Détection des doublons spatio-temporels à l'ingestion.
+
+Pendant les pics d'affluence, plusieurs personnes signalent le même bac dans
+les mêmes minutes. Un index en mémoire (grille de cellules de la taille du
+rayon, fenêtre glissante) retrouve un signalement d'origine du même type à
+moins de DEDUP_RADIUS_M mètres et DEDUP_WINDOW_S secondes. Une recherche
+examine au plus les 9 cellules voisines: coût constant par insertion tant
+que la densité par cellule reste bornée par la fenêtre.
+
+Variables d'environnement:
+    DEDUP_RADIUS_M=50     rayon de regroupement (0 désactive la détection)
+    DEDUP_WINDOW_S=900    fenêtre temporelle
+"""
+
+import math
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from report_time import parse_local
+
+DEDUP_RADIUS_M = float(os.getenv("DEDUP_RADIUS_M", "50"))
+DEDUP_WINDOW_S = float(os.getenv("DEDUP_WINDOW_S", "900"))
+
+_METERS_PER_DEGREE = 111_320.0
+
+Cell = Tuple[int, int]
+
+
+class _Entry(NamedTuple):
+    ts: float
+    id: int
+    type: str
+    latitude: float
+    longitude: float
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Approximation équirectangulaire: suffisante à l'échelle de quelques centaines de mètres
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6_371_000
+
+
+class DuplicateIndex:
+    """Grille spatiale avec fenêtre glissante; non thread-safe (appelée par le thread d'écriture)."""
+
+    def __init__(self, radius_m: float = DEDUP_RADIUS_M, window_s: float = DEDUP_WINDOW_S) -> None:
+        self.radius_m = radius_m
+        self.window_s = window_s
+        self._cell_deg = radius_m / _METERS_PER_DEGREE if radius_m > 0 else 0
+        self._cells: Dict[Cell, Deque[_Entry]] = {}
+        # Ordre d'arrivée des entrées pour l'expiration globale
+        self._expiry: Deque[Tuple[_Entry, Cell]] = deque()
+        self._latest = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.radius_m > 0 and self.window_s > 0
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _col(self, row: int, longitude: float) -> int:
+        # Largeur en longitude corrigée par la latitude du centre de la ligne:
+        # chaque cellule fait au moins `radius_m` de côté
+        lon_deg = self._cell_deg / max(math.cos(math.radians((row + 0.5) * self._cell_deg)), 0.01)
+        return int(longitude // lon_deg)
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        row = int(latitude // self._cell_deg)
+        return row, self._col(row, longitude)
+
+    def _expire(self) -> None:
+        horizon = self._latest - self.window_s
+        while self._expiry and self._expiry[0][0].ts < horizon:
+            entry, cell = self._expiry.popleft()
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.remove(entry)
+                if not bucket:
+                    del self._cells[cell]
+
+    def _usable(self, record: Dict[str, Any]) -> Optional[Tuple[float, float, float]]:
+        if not self.enabled or record.get("latitude") is None or record.get("longitude") is None:
+            return None
+        # ts: epoch UTC écrit par le pipeline, sinon déduit de date_heure (même fuseau)
+        ts = record.get("ts")
+        if ts is None:
+            ts = parse_local(record.get("date_heure"))
+        if ts is None:
+            return None
+        return ts, float(record["latitude"]), float(record["longitude"])
+
+    def find(self, record: Dict[str, Any]) -> Optional[int]:
+        """Id du signalement d'origine dont `record` est un doublon, sinon None."""
+        usable = self._usable(record)
+        if usable is None:
+            return None
+        ts, lat, lon = usable
+        row = int(lat // self._cell_deg)
+        best: Optional[_Entry] = None
+        for r in (row - 1, row, row + 1):
+            col = self._col(r, lon)
+            for c in (col - 1, col, col + 1):
+                for entry in self._cells.get((r, c), ()):
+                    if (entry.type == record.get("type") and abs(entry.ts - ts) <= self.window_s
+                            and _distance_m(lat, lon, entry.latitude, entry.longitude) <= self.radius_m
+                            and (best is None or entry.ts > best.ts)):
+                        best = entry
+        return best.id if best is not None else None
+
+    def add(self, record: Dict[str, Any], row_id: int) -> Optional[Cell]:
+        """Indexe un signalement d'origine; retourne sa cellule (None si non indexable)."""
+        usable = self._usable(record)
+        if usable is None:
+            return None
+        ts, lat, lon = usable
+        if ts < self._latest - self.window_s:
+            return None  # saisie hors ligne trop ancienne: hors fenêtre
+        cell = self._cell(lat, lon)
+        entry = _Entry(ts, row_id, record.get("type"), lat, lon)
+        self._cells.setdefault(cell, deque()).append(entry)
+        self._expiry.append((entry, cell))
+        if ts > self._latest:
+            self._latest = ts
+            self._expire()
+        return cell
+
+    def discard(self, row_ids: List[int]) -> None:
+        """Retire des entrées (transaction annulée)."""
+        removed = set(row_ids)
+        if not removed:
+            return
+        kept: Deque[Tuple[_Entry, Cell]] = deque()
+        for entry, cell in self._expiry:
+            if entry.id not in removed:
+                kept.append((entry, cell))
+                continue
+            bucket = self._cells[cell]
+            bucket.remove(entry)
+            if not bucket:
+                del self._cells[cell]
+        self._expiry = kept
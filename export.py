@@ -0,0 +1,133 @@
+"""
+Export en flux des signalements (CSV, GeoJSON, NDJSON).
+
+Les lignes sont lues par paquets de EXPORT_CHUNK_ROWS (fetchmany sur un
+curseur ouvert pendant toute la réponse, ou modèle de lecture en colonnes
+pour l'édition courante) et chaque paquet est sérialisé puis émis aussitôt:
+la mémoire reste constante quelle que soit la taille de la base. La compression gzip est elle aussi faite au fil de l'eau.
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from report_time import parse_bound
+from report_types import canonical_type
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+FIELDS = (
+    "id", "date_heure", "utilisateur", "type", "message", "photo_id", "media_sha256",
+    "latitude", "longitude", "confirmations", "duplicate_of",
+)
+
+# format -> (type MIME, extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def build_filters(type_signalement: Optional[str] = None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None) -> Tuple[str, List[Any]]:
+    conditions, params = [], []
+    if type_signalement:
+        # Entier indexé; types de la base vive (copiés tels quels dans les archives)
+        conditions.append("s.type_id = (SELECT id FROM main.types WHERE code = ?)")
+        params.append(canonical_type(type_signalement)[0])
+    # Bornes converties une fois en epoch UTC: comparaisons entières sur l'index de ts
+    if date_from:
+        conditions.append("s.ts >= ?")
+        params.append(parse_bound(date_from))
+    if date_to:
+        conditions.append("s.ts <= ?")
+        # Date seule: journée incluse
+        params.append(parse_bound(date_to, end_of_day=True))
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def iter_row_chunks(conn: sqlite3.Connection, where: str = "", params: Iterable[Any] = (),
+                    chunk_rows: Optional[int] = None, schema: str = "main") -> Iterator[List[Tuple]]:
+    """Paquets de lignes (tuples dans l'ordre de FIELDS), par id croissant.
+
+    `schema`: base attachée à lire (archive d'une édition, cf. archives.attached_editions).
+    """
+    cursor = conn.execute(
+        f"""
+        SELECT s.id, s.date_heure, s.utilisateur, COALESCE(t.label, s.type), s.message, s.photo_id, m.sha256,
+               s.latitude, s.longitude, s.confirmations, s.duplicate_of
+        FROM {schema}.signalements s
+        LEFT JOIN {schema}.media m ON m.photo_id = s.photo_id
+        LEFT JOIN main.types t ON t.id = s.type_id
+        {where}
+        ORDER BY s.id
+        """,
+        list(params),
+    )
+    chunk_rows = chunk_rows or EXPORT_CHUNK_ROWS
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield rows
+
+
+def iter_model_chunks(model: Any, indexes: Iterable[int], chunk_rows: Optional[int] = None) -> Iterator[List[Tuple]]:
+    """Paquets depuis le modèle de lecture en colonnes (read_model.ReportColumns)."""
+    return model.iter_row_chunks(indexes, chunk_rows or EXPORT_CHUNK_ROWS)
+
+
+def csv_stream(chunks: Iterable[List[Tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_stream(chunks: Iterable[List[Tuple]]) -> Iterator[str]:
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+def _feature(row: Tuple) -> Dict[str, Any]:
+    properties = dict(zip(FIELDS, row))
+    lat, lon = properties.pop("latitude"), properties.pop("longitude")
+    geometry = {"type": "Point", "coordinates": [lon, lat]} if lat is not None and lon is not None else None
+    return {"type": "Feature", "id": properties["id"], "geometry": geometry, "properties": properties}
+
+
+def geojson_stream(chunks: Iterable[List[Tuple]]) -> Iterator[str]:
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = "\n"
+    for rows in chunks:
+        yield separator + ",\n".join(json.dumps(_feature(row), ensure_ascii=False) for row in rows)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+STREAMS: Dict[str, Callable[[Iterable[List[Tuple]]], Iterator[str]]] = {
+    "csv": csv_stream,
+    "geojson": geojson_stream,
+    "ndjson": ndjson_stream,
+}
+
+
+def gzip_stream(parts: Iterable[str]) -> Iterator[bytes]:
+    """Compression gzip au fil de l'eau (un paquet compressé par paquet source)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
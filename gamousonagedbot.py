@@ -1,28 +1,47 @@
+import asyncio
 import csv
 import os
-import json
 import sqlite3
-from datetime import datetime
+import time
 from contextlib import contextmanager
 from telegram import Update, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.request import HTTPXRequest
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
+from telegram.ext import ApplicationBuilder, AIORateLimiter, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
 from dotenv import load_dotenv
 
+from db_schema import ensure_schema
+from ingestion import IngestionService, get_ingestion_service
+from log_config import get_logger
+from report_time import now_local
+from snapshot_writer import get_snapshot_writer
+from metrics import (
+    OUTBOUND_ERRORS,
+    OUTBOUND_REQUEST_DURATION,
+    TimedConnection,
+)
+from media_store import TELEGRAM_API_BASE, get_media_store
+from notifications import get_dispatcher, parse_chat_ids
+
 # Charger les variables d'environnement
 load_dotenv('config.env')
 load_dotenv()  # Charge aussi depuis les variables d'environnement système
 
+log = get_logger("bot")
+
 # ==== CONSTANTES ====
 # Rendre le chemin DB configurable pour pointer vers un stockage persistant en production
 DB_FILE = os.getenv("DB_FILE", "./signalements.db")  # Retour au chemin local
 JSON_FILE = os.getenv("JSON_FILE", "./signalements.json")  # Retour au chemin local
 BOT_TOKEN = os.getenv('BOT_TOKEN') or os.environ.get('BOT_TOKEN')
 GROUP_CHAT_ID = int(os.getenv('GROUP_CHAT_ID', 0)) if os.getenv('GROUP_CHAT_ID') else None
+# Chats supplémentaires à notifier (séparés par des virgules), en plus de GROUP_CHAT_ID
+NOTIFY_CHAT_IDS = parse_chat_ids(os.getenv('GROUP_CHAT_IDS'), GROUP_CHAT_ID)
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # ex: https://your-domain.tld/bot
 WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
 WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # optionnel mais recommandé
 PORT = int(os.getenv('PORT', '8080'))
+# Connexions HTTP simultanées vers la Bot API (PTB n'en ouvre qu'une par défaut)
+TG_CONNECTION_POOL_SIZE = int(os.getenv('TG_CONNECTION_POOL_SIZE', '16'))
 
 # États de la conversation
 CHOIX, TEXTE, LOCALISATION = range(3)
@@ -30,7 +49,7 @@ CHOIX, TEXTE, LOCALISATION = range(3)
 # ==== Connexion base de données ====
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     try:
         yield conn
@@ -40,60 +59,77 @@ def get_db_connection():
 # ==== Crée DB s'il n'existe pas ====
 def ensure_db_exists():
     with get_db_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS signalements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date_heure TEXT NOT NULL,
-                utilisateur TEXT NOT NULL,
-                type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                photo_id TEXT,
-                latitude REAL,
-                longitude REAL
-            )
-        """)
-
-        conn.commit()
+        ensure_schema(conn)
 
 
 
 # ==== Fonction mise à jour JSON ====
-def mise_a_jour_json():
-    print(f"🔄 Mise à jour JSON - DB_FILE: {DB_FILE}, JSON_FILE: {JSON_FILE}")
+def _snapshot_entries():
     ensure_db_exists()
     df = []
     with get_db_connection() as conn:
         cursor = conn.execute("""
-            SELECT date_heure, utilisateur, type, message, photo_id, latitude, longitude
-            FROM signalements
-            ORDER BY date_heure DESC
+            SELECT s.id, s.date_heure, s.utilisateur, COALESCE(t.label, s.type) AS type, s.message, s.photo_id, s.latitude, s.longitude,
+                   s.confirmations, s.duplicate_of, m.sha256 AS media_sha256
+            FROM signalements s
+            LEFT JOIN media m ON m.photo_id = s.photo_id
+            LEFT JOIN types t ON t.id = s.type_id
+            ORDER BY s.ts DESC, s.id DESC
         """)
         rows = cursor.fetchall()
-        print(f"📊 Signalements trouvés en DB: {len(rows)}")
         for row in rows:
             df.append({
+                "id": row["id"],
                 "Date/Heure": row["date_heure"],
                 "Utilisateur": row["utilisateur"],
                 "Type": row["type"],
                 "Message": row["message"],
                 "Photo": row["photo_id"] if row["photo_id"] else None,
+                "Media": row["media_sha256"],
                 "Latitude": row["latitude"],
-                "Longitude": row["longitude"]
+                "Longitude": row["longitude"],
+                "Confirmations": row["confirmations"],
+                "DoublonDe": row["duplicate_of"],
             })
+    return df
+
+
+def _snapshot_writer():
+    # Même écrivain que l'API quand le bot tourne dans son processus (un seul snapshot par fichier)
+    return get_snapshot_writer(DB_FILE, JSON_FILE, _snapshot_entries)
+
+
+def mise_a_jour_json():
+    """Réécrit tout le snapshot JSON depuis la base."""
     try:
-        _ensure_parent_dir(JSON_FILE)
-        with open(JSON_FILE, "w", encoding="utf-8") as f:
-            json.dump(df, f, ensure_ascii=False, indent=4)
-        print(f"✅ JSON mis à jour avec {len(df)} signalements vers {JSON_FILE}")
+        count = _snapshot_writer().rebuild()
+        log.debug("JSON mis à jour", extra={"count": count, "path": JSON_FILE})
     except Exception as e:
-        print(f"❌ Erreur écriture JSON vers {JSON_FILE}: {e}")
-        # Fallback vers l'ancien chemin
-        try:
-            with open("signalements.json", "w", encoding="utf-8") as f:
-                json.dump(df, f, ensure_ascii=False, indent=4)
-            print(f"✅ JSON fallback vers signalements.json avec {len(df)} signalements")
-        except Exception as e2:
-            print(f"❌ Erreur fallback JSON: {e2}")
+        log.error("Erreur écriture JSON vers %s: %s", JSON_FILE, e)
+
+def _ingestion() -> IngestionService:
+    service = get_ingestion_service(DB_FILE)
+    service.add_listener("snapshot", _snapshot_writer().add)
+    service.add_listener("media", get_media_store(DB_FILE).enqueue_records)
+    return service
+
+
+def _register_notifications(service: IngestionService, application) -> None:
+    """Notifie les groupes une fois par lot, pour les signalements venus de Telegram (hors doublons)."""
+    # Écouteur créé une fois par application: le réenregistrer à chaque signalement est sans effet
+    notify = application.bot_data.get("ingestion_notify")
+    if notify is None:
+        loop = asyncio.get_running_loop()
+        dispatcher = get_dispatcher(application, NOTIFY_CHAT_IDS)
+
+        def notify(records):
+            reports = [r for r in records if r.get("source") == "telegram" and r.get("duplicate_of") is None]
+            if reports:
+                loop.call_soon_threadsafe(lambda: [dispatcher.submit(r) for r in reports])
+
+        application.bot_data["ingestion_notify"] = notify
+    service.add_listener("telegram_notifications", notify)
+
 
 # ==== /start ====
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -139,82 +175,28 @@ async def localisation_signalement(update: Update, context: ContextTypes.DEFAULT
     
     # Vérifier s'il y a une photo dans le contexte (optionnel)
     photo_id = context.user_data.get("photo_id")
-
-    # Enregistre dans DB
-    ensure_db_exists()
-    with get_db_connection() as conn:
-        conn.execute("""
-            INSERT INTO signalements (date_heure, utilisateur, type, message, photo_id, latitude, longitude)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            user,
-            type_signalement,
-            texte,
-            photo_id,
-            location.latitude,
-            location.longitude
-        ))
-        conn.commit()
-
-    # Mise à jour JSON
-    mise_a_jour_json()
-
-    # Notification au groupe (si configuré)
-    if GROUP_CHAT_ID:
-        print(f"📢 Tentative envoi notification groupe: {GROUP_CHAT_ID}")
-        try:
-            notification = f"""🚨 NOUVEAU SIGNALEMENT
-
-📍 Type: {type_signalement}
-👤 Utilisateur: {user}
-📝 Message: {texte}
-🌍 Localisation: {location.latitude}, {location.longitude}
-🕐 Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-Voir sur la carte: https://gamousonagedbot-production.up.railway.app/carte"""
-            
-            if photo_id:
-                print(f"📸 Envoi avec photo: {photo_id}")
-                # Envoyer la photo (ou document image) avec la notification
-                try:
-                    await context.bot.send_photo(
-                        chat_id=GROUP_CHAT_ID,
-                        photo=photo_id,
-                        caption=notification
-                    )
-                    print("✅ Photo envoyée au groupe")
-                except Exception as e:
-                    print(f"⚠️ Erreur envoi photo: {e}")
-                    # Si échec (ex: c'est un document image), fallback en document
-                    try:
-                        await context.bot.send_document(
-                            chat_id=GROUP_CHAT_ID,
-                            document=photo_id,
-                            caption=notification
-                        )
-                        print("✅ Document envoyé au groupe")
-                    except Exception as e2:
-                        print(f"❌ Erreur envoi document: {e2}")
-                        await context.bot.send_message(
-                            chat_id=GROUP_CHAT_ID,
-                            text=notification,
-                            disable_web_page_preview=True
-                        )
-                        print("✅ Message texte envoyé au groupe")
-            else:
-                print("📝 Envoi sans photo")
-                # Envoyer seulement le texte
-                await context.bot.send_message(
-                    chat_id=GROUP_CHAT_ID,
-                    text=notification,
-                    disable_web_page_preview=True
-                )
-                print("✅ Message texte envoyé au groupe")
-        except Exception as e:
-            print(f"❌ Erreur notification groupe: {e}")
+    photo_kind = None
+    if photo_id:
+        photo_kind = "document" if context.user_data.get("photo_is_document") else "photo"
+
+    # Enregistre dans DB via le pipeline d'écriture (snapshot, photo et notification traités par lot)
+    record = {
+        "date_heure": now_local(),
+        "utilisateur": user,
+        "type": type_signalement,
+        "message": texte,
+        "photo_id": photo_id,
+        "photo_kind": photo_kind,
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "source": "telegram",
+    }
+    service = _ingestion()
+    if NOTIFY_CHAT_IDS:
+        _register_notifications(service, context.application)
     else:
-        print("⚠️ GROUP_CHAT_ID non défini, pas de notification groupe")
+        log.debug("GROUP_CHAT_ID non défini, pas de notification groupe")
+    await asyncio.wrap_future(service.submit(record))
 
     await update.message.reply_text("✅ Signalement complet enregistré !")
     context.user_data.clear()
@@ -289,13 +271,21 @@ async def demander_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return TEXTE
 
-def _ensure_parent_dir(path: str) -> None:
-    try:
-        parent = os.path.dirname(path or "")
-        if parent:
-            os.makedirs(parent, exist_ok=True)
-    except Exception as e:
-        print(f"Erreur création dossier parent pour {path}: {e}")
+class TimedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest qui mesure la latence de chaque appel à la Bot API."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        # Le nom de méthode est le dernier segment de l'URL (l'URL contient le token)
+        endpoint = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            OUTBOUND_ERRORS.inc(service="telegram", endpoint=endpoint)
+            raise
+        finally:
+            OUTBOUND_REQUEST_DURATION.observe(time.perf_counter() - start, service="telegram", endpoint=endpoint)
+
 
 def build_application():
     """Construit et retourne l'application Telegram (python-telegram-bot Application)."""
@@ -303,13 +293,28 @@ def build_application():
         raise RuntimeError("BOT_TOKEN non défini dans les variables d'environnement")
 
     # Configurer des timeouts HTTP explicites pour éviter les erreurs ReadError intermittentes
-    request = HTTPXRequest(
+    request = TimedHTTPXRequest(
+        connection_pool_size=TG_CONNECTION_POOL_SIZE,
         connect_timeout=15,
         read_timeout=60,
         write_timeout=15,
         pool_timeout=15,
     )
-    application = ApplicationBuilder().token(BOT_TOKEN).request(request).build()
+    # TELEGRAM_API_BASE permet de pointer vers un serveur Bot API local (ou factice en test de charge)
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(f"{TELEGRAM_API_BASE}/bot")
+        .base_file_url(f"{TELEGRAM_API_BASE}/file/bot")
+        .request(request)
+    )
+    # Limiteur de débit PTB (30 msg/s global, 20 msg/min par groupe) si aiolimiter est installé.
+    # Sans nouvel essai: les RetryAfter sont rejoués par le dispatcher (NOTIFY_MAX_RETRIES), une seule couche
+    try:
+        builder = builder.rate_limiter(AIORateLimiter(max_retries=0))
+    except RuntimeError as e:
+        log.warning("AIORateLimiter indisponible, limitation gérée par le dispatcher: %s", e)
+    application = builder.build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Générateur déterministe de signalements synthétiques (charge type Gamou)
+
+Produit N signalements regroupés autour de points chauds de Médina Baye /
+Kaolack, avec répartition réaliste des types, des heures (pics autour des
+prières et des veillées) et des photos. Écrit directement dans le schéma
+SQLite et peut émettre les flux d'updates Telegram et de webhooks WhatsApp
+correspondants (NDJSON) pour les rejouer.
+
+Exemples:
+    python generate_signalements.py -n 100000 --db /tmp/gamou.db
+    python generate_signalements.py -n 2000 --db /tmp/gamou.db \\
+        --telegram-out /tmp/tg_updates.ndjson --whatsapp-out /tmp/wa_webhooks.ndjson
+"""
+
+import argparse
+import json
+import math
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from db_schema import ensure_schema
+from report_time import parse_local
+from report_types import TypeTable
+
+# Centre par défaut de la carte (carte_signalements.html)
+CENTER = (14.1445, -16.0726)
+
+# Points chauds: (nom, latitude, longitude, poids, écart-type en mètres)
+HOTSPOTS = [
+    ("Grande Mosquée Médina Baye", 14.1512, -16.0765, 0.30, 250),
+    ("Esplanade / Mausolée", 14.1498, -16.0741, 0.18, 200),
+    ("Marché central Kaolack", 14.1405, -16.0748, 0.14, 300),
+    ("Gare routière", 14.1372, -16.0812, 0.10, 250),
+    ("Axe Médina Baye – Kaolack", 14.1445, -16.0726, 0.13, 500),
+    ("Quartiers d'hébergement", 14.1560, -16.0690, 0.10, 450),
+]
+# Part de signalements dispersés hors des points chauds
+BACKGROUND_RATIO = 0.05
+BACKGROUND_RADIUS_M = 3000
+
+TYPES = [("🗑 Bac plein", 0.46), ("📍 Dépôt", 0.38), ("🔹 Autres", 0.16)]
+CHANNELS = [("telegram", 0.70), ("whatsapp", 0.22), ("web", 0.08)]
+
+# Poids horaires (0h..23h): pics après Fajr, à la mi-journée et lors des veillées
+HOUR_WEIGHTS = [
+    2, 1, 1, 1, 1, 3, 6, 8, 9, 8, 7, 7,
+    8, 9, 8, 7, 8, 10, 11, 12, 12, 11, 8, 4,
+]
+
+FIRST_NAMES = [
+    "Mamadou", "Ibrahima", "Cheikh", "Moustapha", "Abdoulaye", "Ousmane", "Modou", "Serigne",
+    "Fatou", "Aminata", "Awa", "Mariama", "Khady", "Ndeye", "Coumba", "Astou", "Aissatou", "Sokhna",
+]
+LAST_NAMES = [
+    "Niass", "Diop", "Ndiaye", "Fall", "Sow", "Ba", "Sy", "Cissé", "Gueye", "Faye", "Sarr", "Thiam",
+    "Mbaye", "Diouf", "Kane", "Seck",
+]
+MESSAGES = {
+    "🗑 Bac plein": ["Bac plein près de l'entrée", "Bac qui déborde", "Poubelle pleine depuis ce matin",
+                     "Bac renversé", "Conteneur saturé"],
+    "📍 Dépôt": ["Dépôt sauvage au coin de la rue", "Tas d'ordures sur la chaussée", "Déchets de repas abandonnés",
+                "Sachets plastiques accumulés", "Dépôt à côté du marché"],
+    "🔹 Autres": ["Caniveau bouché", "Eaux usées sur la route", "Odeur forte", "Besoin de balayage",
+                 "Mauvaise odeur près des toilettes"],
+}
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def _weighted(rng: random.Random, choices: List[Tuple[Any, float]]) -> Any:
+    values = [c[0] for c in choices]
+    weights = [c[1] for c in choices]
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _offset(lat: float, lon: float, dx_m: float, dy_m: float) -> Tuple[float, float]:
+    meters_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+    return lat + dy_m / METERS_PER_DEG_LAT, lon + dx_m / meters_per_deg_lon
+
+
+def _position(rng: random.Random) -> Tuple[float, float]:
+    if rng.random() < BACKGROUND_RATIO:
+        angle = rng.uniform(0, 2 * math.pi)
+        radius = BACKGROUND_RADIUS_M * math.sqrt(rng.random())
+        return _offset(CENTER[0], CENTER[1], radius * math.cos(angle), radius * math.sin(angle))
+    _, lat, lon, _, sigma = _weighted(rng, [(h, h[3]) for h in HOTSPOTS])
+    return _offset(lat, lon, rng.gauss(0, sigma), rng.gauss(0, sigma))
+
+
+def _day_weights(days: int) -> List[float]:
+    # Montée en charge vers la nuit du Gamou (avant-dernier jour), puis reflux
+    peak = max(0, days - 2)
+    return [1.0 + 4.0 * math.exp(-((d - peak) ** 2) / 2.0) for d in range(days)]
+
+
+def _fake_file_id(rng: random.Random, kind: str) -> str:
+    if kind == "wa_image":
+        return str(rng.randrange(10 ** 14, 10 ** 15))
+    prefix = "AgACAgQAAxkBAAI" if kind == "photo" else "BQACAgQAAxkBAAI"
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+    return prefix + "".join(rng.choice(alphabet) for _ in range(56))
+
+
+def generate_reports(
+    n: int,
+    seed: int = 42,
+    start: datetime = datetime(2025, 8, 29),
+    days: int = 5,
+    photo_ratio: float = 0.35,
+    users: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    """Génère `n` signalements triés par date (même seed → mêmes données)."""
+    rng = random.Random(seed)
+    users = users or max(20, n // 8)
+    day_weights = _day_weights(days)
+    day_choices = list(range(days))
+    hour_choices = list(range(24))
+
+    timestamps = []
+    for _ in range(n):
+        day = rng.choices(day_choices, weights=day_weights, k=1)[0]
+        hour = rng.choices(hour_choices, weights=HOUR_WEIGHTS, k=1)[0]
+        timestamps.append(start + timedelta(days=day, hours=hour, seconds=rng.randrange(3600)))
+    timestamps.sort()
+
+    for index, ts in enumerate(timestamps):
+        channel = _weighted(rng, CHANNELS)
+        type_signalement = _weighted(rng, TYPES)
+        user_index = int(rng.paretovariate(1.2)) % users  # quelques signaleurs très actifs
+        name = f"{FIRST_NAMES[user_index % len(FIRST_NAMES)]} {LAST_NAMES[(user_index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        latitude, longitude = _position(rng)
+        photo_id = photo_kind = None
+        if channel != "web" and rng.random() < photo_ratio:
+            if channel == "whatsapp":
+                photo_kind = "wa_image"
+            else:
+                photo_kind = "photo" if rng.random() < 0.85 else "document"
+            photo_id = _fake_file_id(rng, photo_kind)
+        yield {
+            "index": index,
+            "channel": channel,
+            "user_index": user_index,
+            "date_heure": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "utilisateur": name,
+            "type": type_signalement,
+            "message": rng.choice(MESSAGES[type_signalement]),
+            "photo_id": photo_id,
+            "photo_kind": photo_kind,
+            "latitude": round(latitude, 6),
+            "longitude": round(longitude, 6),
+        }
+
+
+def write_to_db(db_file: str, reports: Iterable[Dict[str, Any]], batch_size: int = 10_000) -> int:
+    """Insère les signalements en masse (une transaction, executemany par lots)."""
+    conn = sqlite3.connect(db_file)
+    try:
+        ensure_schema(conn)
+        conn.execute("PRAGMA synchronous = OFF")
+        total = 0
+        batch = []
+        types = TypeTable()
+        sql = """
+            INSERT INTO signalements (date_heure, ts, utilisateur, type, type_id, message, photo_id, photo_kind, latitude, longitude)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        with conn:
+            for r in reports:
+                type_id, type_label = types.resolve(conn, r["type"])
+                batch.append((r["date_heure"], parse_local(r["date_heure"]), r["utilisateur"], type_label, type_id, r["message"],
+                              r["photo_id"], r["photo_kind"], r["latitude"], r["longitude"]))
+                if len(batch) >= batch_size:
+                    conn.executemany(sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(sql, batch)
+                total += len(batch)
+        return total
+    finally:
+        conn.close()
+
+
+# ==== Flux de rejeu ====
+def _epoch(date_heure: str) -> int:
+    # Sénégal: UTC+0 toute l'année
+    return int(datetime.strptime(date_heure, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+
+
+def telegram_updates(report: Dict[str, Any], first_update_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+    """Updates Telegram d'une conversation complète (/start → type → texte → [photo] → localisation)."""
+    user_id = 100_000 + report["user_index"]
+    first_name, _, last_name = report["utilisateur"].partition(" ")
+    sender = {"id": user_id, "is_bot": False, "first_name": first_name, "last_name": last_name}
+    chat = {"id": user_id, "type": "private", "first_name": first_name}
+    end = _epoch(report["date_heure"])
+    steps: List[Dict[str, Any]] = [
+        {"text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}]},
+        {"text": report["type"]},
+        {"text": report["message"]},
+    ]
+    if report["photo_kind"] == "photo":
+        steps.append({"photo": [{"file_id": report["photo_id"], "file_unique_id": report["photo_id"][-16:],
+                                 "width": 1280, "height": 960}]})
+    elif report["photo_kind"] == "document":
+        steps.append({"document": {"file_id": report["photo_id"], "file_unique_id": report["photo_id"][-16:],
+                                   "mime_type": "image/jpeg", "file_name": "photo.jpg"}})
+    steps.append({"location": {"latitude": report["latitude"], "longitude": report["longitude"]}})
+
+    updates = []
+    for i, content in enumerate(steps):
+        ts = end - 15 * (len(steps) - 1 - i)
+        message = {"message_id": report["index"] * 10 + i, "date": ts, "chat": chat, "from": sender, **content}
+        updates.append((ts, {"update_id": first_update_id + i, "message": message}))
+    return updates
+
+
+def _wa_envelope(report: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "SYNTHETIC",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"profile": {"name": report["utilisateur"]}, "wa_id": message["from"]}],
+                    "messages": [message],
+                },
+            }],
+        }],
+    }
+
+
+WA_TYPE_BUTTONS = {"📍 Dépôt": "TYPE_DEPOT", "🗑 Bac plein": "TYPE_BAC", "🔹 Autres": "TYPE_AUTRES"}
+
+
+def whatsapp_webhooks(report: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Webhooks WhatsApp d'une conversation complète (salut → bouton type → texte → [image] → localisation)."""
+    wa_from = f"22177{report['user_index']:07d}"
+    end = _epoch(report["date_heure"])
+    steps: List[Dict[str, Any]] = [
+        {"type": "text", "text": {"body": "Bonjour"}},
+        {"type": "interactive", "interactive": {"type": "button_reply", "button_reply": {
+            "id": WA_TYPE_BUTTONS[report["type"]], "title": report["type"]}}},
+        {"type": "text", "text": {"body": report["message"]}},
+    ]
+    if report["photo_id"]:
+        steps.append({"type": "image", "image": {"id": report["photo_id"], "mime_type": "image/jpeg"}})
+    steps.append({"type": "location", "location": {"latitude": report["latitude"], "longitude": report["longitude"]}})
+
+    webhooks = []
+    for i, content in enumerate(steps):
+        ts = end - 15 * (len(steps) - 1 - i)
+        message = {"from": wa_from, "id": f"wamid.SYN{report['index']}_{i}", "timestamp": str(ts), **content}
+        webhooks.append((ts, _wa_envelope(report, message)))
+    return webhooks
+
+
+def replay_streams(reports: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Flux Telegram et WhatsApp entrelacés par horodatage (conversations concurrentes)."""
+    tg_events: List[Tuple[int, int, Dict[str, Any]]] = []
+    wa_events: List[Tuple[int, int, Dict[str, Any]]] = []
+    next_update_id = 1
+    for report in reports:
+        if report["channel"] == "telegram":
+            for ts, update in telegram_updates(report, next_update_id):
+                tg_events.append((ts, update["update_id"], update))
+            next_update_id += 10
+        elif report["channel"] == "whatsapp":
+            for ts, payload in whatsapp_webhooks(report):
+                wa_events.append((ts, len(wa_events), payload))
+    tg_events.sort(key=lambda e: (e[0], e[1]))
+    wa_events.sort(key=lambda e: (e[0], e[1]))
+    # update_id croissant dans l'ordre de livraison, comme côté Telegram
+    tg_stream = []
+    for update_id, (_, _, update) in enumerate(tg_events, start=1):
+        tg_stream.append({**update, "update_id": update_id})
+    return tg_stream, [payload for _, _, payload in wa_events]
+
+
+def _write_ndjson(path: str, items: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Génère des signalements synthétiques réalistes (Gamou)")
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2025-08-29", help="premier jour (AAAA-MM-JJ)")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--photo-ratio", type=float, default=0.35)
+    parser.add_argument("--db", help="base SQLite à remplir")
+    parser.add_argument("--telegram-out", help="fichier NDJSON des updates Telegram")
+    parser.add_argument("--whatsapp-out", help="fichier NDJSON des payloads webhook WhatsApp")
+    args = parser.parse_args()
+
+    def reports() -> Iterator[Dict[str, Any]]:
+        return generate_reports(args.count, seed=args.seed, start=datetime.strptime(args.start, "%Y-%m-%d"),
+                                days=args.days, photo_ratio=args.photo_ratio)
+
+    if args.db:
+        total = write_to_db(args.db, reports())
+        print(f"✅ {total} signalements insérés dans {args.db}")
+    if args.telegram_out or args.whatsapp_out:
+        tg_stream, wa_stream = replay_streams(reports())
+        if args.telegram_out:
+            print(f"✅ {_write_ndjson(args.telegram_out, tg_stream)} updates Telegram → {args.telegram_out}")
+        if args.whatsapp_out:
+            print(f"✅ {_write_ndjson(args.whatsapp_out, wa_stream)} webhooks WhatsApp → {args.whatsapp_out}")
+    if not (args.db or args.telegram_out or args.whatsapp_out):
+        parser.error("indiquer au moins --db, --telegram-out ou --whatsapp-out")
+
+
+if __name__ == "__main__":
+    main()
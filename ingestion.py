@@ -0,0 +1,297 @@
+"""
+Pipeline d'écriture unique des signalements (group commit).
+
+Telegram, WhatsApp et le web soumettent leurs signalements au même service:
+un thread d'écriture regroupe les insertions concurrentes arrivées en
+quelques millisecondes et les valide en une seule transaction (un seul fsync).
+Le type est normalisé à l'insertion (report_types.py: type_id et libellé
+canonique), l'instant UTC écrit dans ts (report_time.py) et la zone
+rattachée par point dans polygone (zones.py: zone_id).
+Chaque insertion consulte l'index des doublons (dedup.py): un doublon est
+enregistré avec duplicate_of et incrémente les confirmations de l'original.
+Un signalement dont le client_id (clé d'idempotence de la file hors ligne)
+existe déjà n'est pas inséré: son Future reçoit l'id de la ligne existante.
+Chaque appelant reçoit un Future résolu avec l'id de sa ligne. Les actions
+consécutives (snapshot JSON, téléchargement des photos, notifications) sont
+déclenchées une fois par lot via des écouteurs.
+
+Variables d'environnement:
+    INGEST_WINDOW_MS=5     fenêtre de regroupement après la première insertion
+    INGEST_MAX_BATCH=256   taille maximale d'un lot
+    INGEST_TIMEOUT=30      attente maximale (s) d'un appelant synchrone
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db_schema import ensure_schema
+from dedup import DuplicateIndex
+from log_config import get_logger
+from metrics import INGEST_BATCH_SIZE, INGEST_DUPLICATES, TimedConnection
+from report_time import parse_local
+from report_types import TypeTable
+from zones import get_zones
+
+log = get_logger("ingest")
+
+INGEST_WINDOW_MS = float(os.getenv("INGEST_WINDOW_MS", "5"))
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "256"))
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "30"))
+
+# Colonnes écrites par le pipeline (les autres clés d'un signalement sont ignorées)
+COLUMNS = ("date_heure", "ts", "utilisateur", "type", "type_id", "message", "photo_id", "photo_kind", "latitude",
+           "longitude", "zone_id", "duplicate_of", "client_id")
+
+Listener = Callable[[List[Dict[str, Any]]], None]
+
+
+class IngestionService:
+    """Thread d'écriture unique avec validation groupée des insertions."""
+
+    def __init__(self, db_file: str, window_ms: float = INGEST_WINDOW_MS, max_batch: int = INGEST_MAX_BATCH,
+                 dedup: Optional[DuplicateIndex] = None) -> None:
+        self.db_file = db_file
+        self.dedup = dedup if dedup is not None else DuplicateIndex()
+        self.types = TypeTable()
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        # Chaque élément de la file est un groupe indivisible de (signalement, future)
+        self._queue: "queue.Queue[Optional[List[Tuple[Dict[str, Any], Future]]]]" = queue.Queue()
+        self._listeners: Dict[str, Listener] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_batch = 0
+        self.stats = {"submitted": 0, "committed": 0, "batches": 0, "failed": 0, "duplicates": 0, "replayed": 0}
+
+    # ---- API ----
+    def add_listener(self, name: str, listener: Listener) -> None:
+        """Enregistre une action à exécuter après chaque lot validé.
+
+        Réenregistrer le même écouteur sous le même nom est sans effet; un autre
+        écouteur sous un nom déjà pris lève ValueError.
+        """
+        with self._lock:
+            existing = self._listeners.get(name)
+            if existing is not None and existing != listener:
+                raise ValueError(f"Écouteur d'ingestion déjà enregistré: {name}")
+            self._listeners[name] = listener
+
+    def submit(self, record: Dict[str, Any]) -> "Future[int]":
+        """Soumet un signalement (clés de COLUMNS); le Future est résolu avec son id."""
+        return self.submit_many([record])[0]
+
+    def submit_many(self, records: List[Dict[str, Any]]) -> List["Future[int]"]:
+        """Soumet un groupe de signalements, validés dans la même transaction."""
+        group = [(dict(record), Future()) for record in records]
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ingestion-writer", daemon=True)
+                self._thread.start()
+            self.stats["submitted"] += len(group)
+        self._queue.put(group)
+        return [future for _, future in group]
+
+    def insert(self, record: Dict[str, Any], timeout: Optional[float] = INGEST_TIMEOUT) -> int:
+        """Soumission synchrone: attend la validation du lot et retourne l'id."""
+        return self.submit(record).result(timeout)
+
+    def close(self, timeout: float = 5) -> None:
+        """Traite les insertions en attente puis arrête le thread d'écriture."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    # ---- Thread d'écriture ----
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, factory=TimedConnection, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            ensure_schema(conn)
+            self._warm_dedup(conn)
+            self._conn = conn
+        return self._conn
+
+    def _warm_dedup(self, conn: sqlite3.Connection) -> None:
+        # Originaux récents (fenêtre glissante) pour détecter les doublons dès le redémarrage
+        if not self.dedup.enabled or len(self.dedup):
+            return
+        rows = conn.execute(
+            "SELECT s.id, s.date_heure, s.ts, COALESCE(t.label, s.type) AS type, s.latitude, s.longitude "
+            "FROM signalements s LEFT JOIN types t ON t.id = s.type_id "
+            "WHERE s.duplicate_of IS NULL AND s.ts >= ? ORDER BY s.ts",
+            (int(time.time() - self.dedup.window_s),),
+        ).fetchall()
+        for row in rows:
+            self.dedup.add(dict(row), row["id"])
+
+    def _collect(self, first: List[Tuple[Dict[str, Any], Future]]) -> Tuple[List[Tuple[Dict[str, Any], Future]], bool]:
+        batch = list(first)
+        # Attendre d'autres insertions seulement sous charge (dernier lot > 1):
+        # un producteur isolé ne paie pas la fenêtre de regroupement
+        window = self.window if self._last_batch > 1 else 0
+        deadline = time.monotonic() + window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.extend(item)
+        return batch, False
+
+    def _insert_rows(self, conn: sqlite3.Connection, records: List[Dict[str, Any]]) -> List[int]:
+        sql = f"INSERT INTO signalements ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+        indexed: List[int] = []
+        zones = get_zones()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = []
+            for record in records:
+                if record.get("client_id"):
+                    existing = conn.execute("SELECT id FROM signalements WHERE client_id = ?",
+                                            (record["client_id"],)).fetchone()
+                    if existing is not None:
+                        # Renvoi d'un signalement déjà enregistré (index unique sur client_id)
+                        record["replayed"] = True
+                        ids.append(existing[0])
+                        continue
+                # Type, instant UTC et zone normalisés une fois pour toutes (dédoublonnage, écouteurs et lectures)
+                record["type_id"], record["type"] = self.types.resolve(conn, record.get("type"))
+                record["ts"] = parse_local(record.get("date_heure"))
+                record["zone_id"] = zones.locate(record.get("latitude"), record.get("longitude"))
+                # Consulté ligne par ligne: un doublon d'un original du même lot est détecté
+                record["duplicate_of"] = self.dedup.find(record)
+                row_id = conn.execute(sql, tuple(record.get(c) for c in COLUMNS)).lastrowid
+                if record["duplicate_of"] is not None:
+                    conn.execute(
+                        "UPDATE signalements SET confirmations = confirmations + 1 WHERE id = ?",
+                        (record["duplicate_of"],),
+                    )
+                elif self.dedup.add(record, row_id) is not None:
+                    indexed.append(row_id)
+                ids.append(row_id)
+            inserted = [row_id for record, row_id in zip(records, ids) if not record.get("replayed")]
+            if inserted:
+                # Lot contigu au dernier id rattaché: l'ouverture suivante n'a rien à reprendre
+                conn.execute(
+                    "UPDATE zone_state SET tagged_max_id = ? WHERE id = 1 AND fingerprint = ? AND tagged_max_id = ?",
+                    (max(inserted), zones.fingerprint, min(inserted) - 1),
+                )
+            conn.execute("COMMIT")
+            return ids
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self.dedup.discard(indexed)
+            self.types.clear()
+            raise
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], Future]]) -> List[Dict[str, Any]]:
+        records = [record for record, _ in batch]
+        conn = self._connect()
+        try:
+            ids: List[Optional[int]] = list(self._insert_rows(conn, records))
+            errors: List[Optional[BaseException]] = [None] * len(batch)
+        except sqlite3.IntegrityError:
+            # Une ligne invalide ne doit pas faire échouer tout le lot: repli ligne par ligne
+            ids, errors = [], []
+            for record in records:
+                try:
+                    ids.append(self._insert_rows(conn, [record])[0])
+                    errors.append(None)
+                except sqlite3.Error as e:
+                    ids.append(None)
+                    errors.append(e)
+
+        committed = []
+        replayed = 0
+        for (record, _), row_id in zip(batch, ids):
+            if row_id is None:
+                continue
+            record["id"] = row_id
+            if record.get("replayed"):
+                replayed += 1
+            else:
+                committed.append(record)
+        duplicates = sum(1 for record in committed if record.get("duplicate_of") is not None)
+        INGEST_BATCH_SIZE.observe(len(committed))
+        if duplicates:
+            INGEST_DUPLICATES.inc(duplicates)
+            self.stats["duplicates"] += duplicates
+        self.stats["batches"] += 1
+        self.stats["committed"] += len(committed)
+        self.stats["replayed"] += replayed
+        self.stats["failed"] += len(batch) - len(committed) - replayed
+
+        # Actions consécutives avant de rendre la main (rapides: le snapshot est écrit sur son propre thread)
+        if committed:
+            with self._lock:
+                listeners = list(self._listeners.items())
+            for name, listener in listeners:
+                try:
+                    listener(committed)
+                except Exception as e:
+                    log.error("Écouteur d'ingestion %s en erreur: %s", name, e)
+
+        for (_, future), row_id, error in zip(batch, ids, errors):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(row_id)
+        return committed
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            self._last_batch = len(batch)
+            try:
+                self._write(batch)
+            except Exception as e:
+                log.error("Échec du lot de %d signalements: %s", len(batch), e)
+                self.stats["failed"] += len(batch)
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_services: Dict[str, IngestionService] = {}
+_services_lock = threading.Lock()
+
+
+def get_ingestion_service(db_file: str) -> IngestionService:
+    """Retourne le service d'ingestion partagé pour cette base (un par processus)."""
+    key = os.path.abspath(db_file)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = IngestionService(db_file)
+            _services[key] = service
+        return service
+
+
+@atexit.register
+def close_all() -> None:
+    with _services_lock:
+        services = list(_services.values())
+    for service in services:
+        service.close()
@@ -0,0 +1,155 @@
+"""
+Journalisation structurée et asynchrone.
+
+Les handlers de l'application n'écrivent que dans une file mémoire
+(QueueHandler); un thread d'écoute (QueueListener) se charge des écritures
+sur stdout, hors du chemin des requêtes. Sorties JSON (ou texte), niveaux et
+échantillonnage réglables par sous-système, données sensibles masquées.
+
+Variables d'environnement:
+    LOG_LEVEL=INFO                       niveau par défaut
+    LOG_LEVELS=webhook=DEBUG,media=WARNING
+    LOG_SAMPLING=webhook=0.1,whatsapp=0.5   part des messages < WARNING conservés
+    LOG_FORMAT=json|text
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+ROOT_LOGGER = "sonaged"
+
+# Clés dont la valeur est masquée dans les payloads/headers journalisés
+SENSITIVE_KEYS = {
+    "authorization",
+    "cookie",
+    "x-telegram-bot-api-secret-token",
+    "x-admin-token",
+    "x-hub-signature-256",
+    "token",
+    "secret",
+    "secret_token",
+    "access_token",
+    "verify_token",
+    "hub.verify_token",
+    "password",
+}
+# Clés contenant des données personnelles (numéros, coordonnées)
+PERSONAL_KEYS = {"from", "wa_id", "phone_number", "latitude", "longitude"}
+# Token de bot Telegram (123456:ABC...) pouvant apparaître dans une URL ou une erreur
+_BOT_TOKEN_RE = re.compile(r"\d{6,}:[A-Za-z0-9_-]{30,}")
+_MAX_STRING = 200
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(value: Any, key: Optional[str] = None) -> Any:
+    """Copie d'un payload avec secrets masqués et chaînes tronquées."""
+    lowered = (key or "").lower()
+    if lowered in SENSITIVE_KEYS:
+        return "***"
+    if lowered in PERSONAL_KEYS and value is not None:
+        text = str(value)
+        return text[:3] + "…" if len(text) > 3 else "…"
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        value = _BOT_TOKEN_RE.sub("***", value)
+        return value if len(value) <= _MAX_STRING else value[:_MAX_STRING] + "…"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _STANDARD_ATTRS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Ne conserve qu'une fraction des messages sous WARNING."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def _parse_mapping(raw: Optional[str]) -> Dict[str, str]:
+    mapping = {}
+    for part in (raw or "").split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+def setup_logging(stream=None, force: bool = False) -> None:
+    """Configure le logger racine de l'application (idempotent)."""
+    global _listener
+    if _listener is not None and not force:
+        return
+    if _listener is not None:
+        _listener.stop()
+
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    else:
+        formatter = JsonFormatter()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+
+    for subsystem, level in _parse_mapping(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(f"{ROOT_LOGGER}.{subsystem}").setLevel(level.upper())
+    for subsystem, rate in _parse_mapping(os.getenv("LOG_SAMPLING")).items():
+        sub_logger = logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+        sub_logger.filters = [f for f in sub_logger.filters if not isinstance(f, SamplingFilter)]
+        sub_logger.addFilter(SamplingFilter(float(rate)))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
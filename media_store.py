@@ -0,0 +1,288 @@
+"""
+Stockage local des photos de signalements.
+
+Chaque photo (file_id Telegram ou media id WhatsApp) est téléchargée une seule
+fois après l'enregistrement du signalement, stockée sur disque sous son hash
+SHA-256 (déduplication) avec une miniature JPEG, puis servie par /media/<hash>.
+"""
+
+import hashlib
+import io
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from db_schema import ensure_schema
+from log_config import get_logger
+
+if TYPE_CHECKING:
+    import requests
+
+log = get_logger("media")
+
+# Par défaut: dossier "media" à côté de la base (cf. get_media_store)
+MEDIA_DIR = os.getenv("MEDIA_DIR")
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 1024 * 1024)))
+MEDIA_THUMB_SIZE = int(os.getenv("MEDIA_THUMB_SIZE", "320"))
+TELEGRAM_API_BASE = (os.getenv("TELEGRAM_API_BASE") or "https://api.telegram.org").rstrip("/")
+WA_GRAPH_BASE = (os.getenv("WA_GRAPH_BASE") or "https://graph.facebook.com").rstrip("/")
+WA_GRAPH_VERSION = os.getenv("WA_GRAPH_VERSION", "v20.0")
+
+_EXTENSION_MIME = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+}
+
+
+class MediaDownloadError(Exception):
+    pass
+
+
+_pil_image: Any = None
+
+
+def _image_module() -> Any:
+    """PIL.Image importé au premier usage (démarrage à froid); None sans Pillow."""
+    global _pil_image
+    if _pil_image is None:
+        try:
+            from PIL import Image
+        except ImportError:  # Pillow optionnel: pas de miniatures
+            Image = False
+        _pil_image = Image
+    return _pil_image or None
+
+
+class MediaStore:
+    """Télécharge, déduplique et sert les photos des signalements."""
+
+    def __init__(
+        self,
+        media_dir: str,
+        db_file: str,
+        bot_token: Optional[str] = None,
+        wa_access_token: Optional[str] = None,
+        telegram_api_base: str = TELEGRAM_API_BASE,
+        wa_graph_base: str = WA_GRAPH_BASE,
+        timeout: float = 20,
+    ) -> None:
+        self.media_dir = media_dir
+        self.db_file = db_file
+        self.bot_token = bot_token
+        self.wa_access_token = wa_access_token
+        self.telegram_api_base = telegram_api_base.rstrip("/")
+        self.wa_graph_base = wa_graph_base.rstrip("/")
+        self.timeout = timeout
+        self._queue: "queue.Queue[Tuple[str, Optional[str]]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._session: Optional["requests.Session"] = None
+
+    # ---- Base de données ----
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            ensure_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    def lookup(self, photo_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT photo_id, sha256, mime, size, has_thumb FROM media WHERE photo_id = ?", (photo_id,)
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def lookup_hash(self, sha256: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT sha256, mime, size, has_thumb FROM media WHERE sha256 = ? LIMIT 1", (sha256,)
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    # ---- Chemins ----
+    def path_for(self, sha256: str, thumb: bool = False) -> str:
+        name = f"{sha256}.thumb.jpg" if thumb else sha256
+        return os.path.join(self.media_dir, sha256[:2], name)
+
+    # ---- Téléchargement ----
+    @property
+    def session(self) -> "requests.Session":
+        # requests importé au premier téléchargement (démarrage à froid)
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> "requests.Response":
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        if response.status_code != 200:
+            # Ne pas inclure l'URL: elle contient le token du bot
+            raise MediaDownloadError(f"HTTP {response.status_code}")
+        return response
+
+    def _read_limited(self, response: "requests.Response") -> bytes:
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(64 * 1024):
+            total += len(chunk)
+            if total > MEDIA_MAX_BYTES:
+                raise MediaDownloadError(f"Média trop volumineux (> {MEDIA_MAX_BYTES} octets)")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _download_telegram(self, file_id: str) -> Tuple[bytes, Optional[str]]:
+        if not self.bot_token:
+            raise MediaDownloadError("BOT_TOKEN manquant")
+        info = self._get(f"{self.telegram_api_base}/bot{self.bot_token}/getFile?file_id={file_id}").json()
+        file_path = (info.get("result") or {}).get("file_path")
+        if not info.get("ok") or not file_path:
+            raise MediaDownloadError(f"getFile a échoué: {info.get('description')}")
+        response = self._get(f"{self.telegram_api_base}/file/bot{self.bot_token}/{file_path}")
+        mime = _EXTENSION_MIME.get(os.path.splitext(file_path)[1].lower())
+        return self._read_limited(response), mime or response.headers.get("Content-Type")
+
+    def _download_whatsapp(self, media_id: str) -> Tuple[bytes, Optional[str]]:
+        if not self.wa_access_token:
+            raise MediaDownloadError("WA_ACCESS_TOKEN manquant")
+        headers = {"Authorization": f"Bearer {self.wa_access_token}"}
+        # L'URL retournée par Graph API expire après quelques minutes: télécharger immédiatement
+        info = self._get(f"{self.wa_graph_base}/{WA_GRAPH_VERSION}/{media_id}", headers=headers).json()
+        url = info.get("url")
+        if not url:
+            raise MediaDownloadError("URL média WhatsApp absente")
+        response = self._get(url, headers=headers)
+        return self._read_limited(response), info.get("mime_type") or response.headers.get("Content-Type")
+
+    # ---- Stockage ----
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _make_thumbnail(self, data: bytes) -> Optional[bytes]:
+        Image = _image_module()
+        if Image is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = img.convert("RGB")
+                img.thumbnail((MEDIA_THUMB_SIZE, MEDIA_THUMB_SIZE))
+                out = io.BytesIO()
+                img.save(out, format="JPEG", quality=75, optimize=True)
+                return out.getvalue()
+        except Exception as e:
+            log.warning("Miniature impossible: %s", e)
+            return None
+
+    def store_bytes(self, photo_id: str, data: bytes, mime: Optional[str]) -> str:
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path_for(sha256)
+        has_thumb = os.path.exists(self.path_for(sha256, thumb=True))
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+        if not has_thumb:
+            thumb = self._make_thumbnail(data)
+            if thumb is not None:
+                self._write_atomic(self.path_for(sha256, thumb=True), thumb)
+                has_thumb = True
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO media (photo_id, sha256, mime, size, has_thumb, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (photo_id, sha256, mime, len(data), int(has_thumb), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return sha256
+
+    def ingest(self, photo_id: str, photo_kind: Optional[str] = None) -> Optional[str]:
+        """Télécharge et stocke une photo (synchrone). Retourne son hash."""
+        existing = self.lookup(photo_id)
+        if existing:
+            if os.path.exists(self.path_for(existing["sha256"])):
+                return existing["sha256"]
+            # Fichier perdu (dossier vidé, volume remplacé): nouveau téléchargement
+            log.info("Média absent du disque, nouveau téléchargement", extra={"photo_id": photo_id[:16]})
+        if photo_kind == "wa_image":
+            data, mime = self._download_whatsapp(photo_id)
+        else:
+            data, mime = self._download_telegram(photo_id)
+        return self.store_bytes(photo_id, data, mime)
+
+    # ---- Pipeline asynchrone ----
+    def enqueue(self, photo_id: Optional[str], photo_kind: Optional[str] = None) -> None:
+        """Planifie le téléchargement en arrière-plan (non bloquant)."""
+        if not photo_id:
+            return
+        self._ensure_worker()
+        self._queue.put((photo_id, photo_kind))
+
+    def enqueue_records(self, records: List[Dict[str, Any]]) -> None:
+        """Écouteur d'ingestion (un par base, partagé par l'API et le bot): photos des signalements validés."""
+        for record in records:
+            self.enqueue(record.get("photo_id"), record.get("photo_kind"))
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="media-ingest", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            photo_id, photo_kind = self._queue.get()
+            try:
+                sha256 = self.ingest(photo_id, photo_kind)
+                log.info("Média stocké", extra={"photo_id": photo_id[:16], "sha256": sha256})
+            except Exception as e:
+                message = str(e)
+                if self.bot_token:
+                    message = message.replace(self.bot_token, "***")
+                log.warning("Téléchargement média échoué: %s", message, extra={"photo_id": photo_id[:16]})
+            finally:
+                self._queue.task_done()
+
+    def join(self) -> None:
+        self._queue.join()
+
+
+_stores: Dict[Tuple[str, str], MediaStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_media_store(db_file: str, media_dir: Optional[str] = None) -> MediaStore:
+    """Retourne le MediaStore partagé pour ce couple (dossier, base)."""
+    media_dir = media_dir or MEDIA_DIR or os.path.join(os.path.dirname(os.path.abspath(db_file)), "media")
+    key = (os.path.abspath(media_dir), os.path.abspath(db_file))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = MediaStore(
+                media_dir,
+                db_file,
+                bot_token=os.getenv("BOT_TOKEN"),
+                wa_access_token=os.getenv("WA_ACCESS_TOKEN"),
+            )
+            _stores[key] = store
+        return store
@@ -0,0 +1,362 @@
+"""
+Métriques au format texte Prometheus.
+
+Compteurs, jauges et histogrammes en mémoire (un verrou, pas de dépendance).
+Avec plusieurs workers gunicorn, définir METRICS_DIR: chaque processus y
+écrit périodiquement son état (metrics_<pid>.json) et /metrics agrège les
+fichiers de tous les workers.
+"""
+
+import bisect
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Bornes (secondes) adaptées aux requêtes HTTP et appels SQLite/API
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {"values": [[list(k), v] for k, v in self._values.items()]}
+
+
+class Gauge(_Metric):
+    """Jauge; `aggregate` ('sum' ou 'max') définit la fusion entre workers."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), aggregate: str = "sum") -> None:
+        super().__init__(name, help_text, labels)
+        self.aggregate = aggregate
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {"values": [[list(k), v] for k, v in self._values.items()]}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # clé -> [compteurs par bucket (+Inf en dernier), somme]
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {"values": [[list(k), [list(v[0]), v[1]]] for k, v in self._values.items()]}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = (), aggregate: str = "sum") -> Gauge:
+        return self.register(Gauge(name, help_text, labels, aggregate))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    # ---- Multi-processus ----
+    def snapshot(self) -> Dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            m.name: {
+                "kind": m.kind,
+                "help": m.help,
+                "labels": list(m.labels),
+                "buckets": list(getattr(m, "buckets", ())),
+                "aggregate": getattr(m, "aggregate", None),
+                **m.state(),
+            }
+            for m in metrics
+        }
+
+    def flush(self, directory: Optional[str] = None) -> None:
+        directory = directory or METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "metrics": self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self, interval: float = METRICS_FLUSH_INTERVAL) -> None:
+        """Écrit l'état du processus dans METRICS_DIR à intervalle régulier."""
+        if not METRICS_DIR:
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, args=(interval,),
+                                             name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def collect(self, directory: Optional[str] = None) -> Dict:
+        """État agrégé: processus courant + fichiers des autres workers."""
+        directory = directory or METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush(directory)
+        states = []
+        for path in glob.glob(os.path.join(directory, "metrics_*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merge_states(states)
+
+    def render(self, directory: Optional[str] = None) -> str:
+        return render_text(self.collect(directory))
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def merge_states(states: List[Dict]) -> Dict:
+    """Additionne compteurs/histogrammes; jauges par 'sum' ou 'max' (workers vivants seulement)."""
+    merged: Dict[str, Dict] = {}
+    for state in states:
+        alive = _pid_alive(int(state.get("pid", 0)))
+        for name, metric in state.get("metrics", {}).items():
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "values": {}})
+            for key, value in metric["values"]:
+                key = tuple(key)
+                if metric["kind"] == "histogram":
+                    current = target["values"].get(key)
+                    if current is None:
+                        target["values"][key] = [list(value[0]), value[1]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                elif metric["kind"] == "gauge" and metric.get("aggregate") == "max":
+                    target["values"][key] = max(target["values"].get(key, value), value)
+                else:
+                    target["values"][key] = target["values"].get(key, 0) + value
+    for metric in merged.values():
+        metric["values"] = [[list(k), v] for k, v in metric["values"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: List[str], values: List[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_text(state: Dict) -> str:
+    lines = []
+    for name in sorted(state):
+        metric = state[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labels"]
+        for key, value in metric["values"]:
+            if metric["kind"] == "histogram":
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + [float("inf")], counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels_text(names, key, ('le', _format_float(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_labels_text(names, key)} {_format_float(total)}")
+                lines.append(f"{name}_count{_labels_text(names, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels_text(names, key)} {_format_float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ==== Métriques de l'application ====
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route", ("route", "method", "status"))
+SQLITE_QUERY_DURATION = REGISTRY.histogram(
+    "sqlite_query_duration_seconds", "Durée des requêtes SQLite par opération", ("op",))
+SNAPSHOT_WRITE_DURATION = REGISTRY.histogram(
+    "snapshot_write_duration_seconds", "Durée d'écriture du snapshot JSON")
+SNAPSHOT_SIZE_BYTES = REGISTRY.gauge(
+    "snapshot_size_bytes", "Taille du dernier snapshot JSON écrit", aggregate="max")
+WEBHOOK_QUEUE_DEPTH = REGISTRY.gauge(
+    "telegram_webhook_updates_in_flight", "Updates Telegram soumis à PTB et non terminés")
+OUTBOUND_REQUEST_DURATION = REGISTRY.histogram(
+    "outbound_request_duration_seconds", "Durée des appels sortants (Telegram Bot API, WhatsApp Graph API)",
+    ("service", "endpoint"))
+OUTBOUND_ERRORS = REGISTRY.counter(
+    "outbound_request_errors_total", "Appels sortants en erreur", ("service", "endpoint"))
+PTB_LOOP_LAG = REGISTRY.gauge(
+    "ptb_event_loop_lag_seconds", "Retard de la boucle asyncio PTB (dernière mesure)", aggregate="max")
+INGEST_BATCH_SIZE = REGISTRY.histogram(
+    "ingest_batch_size", "Signalements validés par transaction (group commit)",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+BACKUP_DURATION = REGISTRY.gauge(
+    "sqlite_backup_duration_seconds", "Durée de la dernière sauvegarde SQLite", aggregate="max")
+BACKUP_LAST_SUCCESS = REGISTRY.gauge(
+    "sqlite_backup_last_success_timestamp_seconds", "Horodatage de la dernière sauvegarde vérifiée", aggregate="max")
+BACKUP_AGE = REGISTRY.gauge(
+    "sqlite_backup_age_seconds", "Âge de la dernière sauvegarde vérifiée", aggregate="max")
+BACKUP_SIZE_BYTES = REGISTRY.gauge(
+    "sqlite_backup_size_bytes", "Taille de la dernière sauvegarde", aggregate="max")
+BACKUP_FAILURES = REGISTRY.counter(
+    "sqlite_backup_failures_total", "Sauvegardes échouées (copie, integrity_check) ou reportées (busy)", ("reason",))
+INGEST_DUPLICATES = REGISTRY.counter(
+    "ingest_duplicates_total", "Signalements détectés comme doublons (même type, même lieu, même fenêtre)")
+READ_CACHE_REQUESTS = REGISTRY.counter(
+    "read_cache_requests_total", "Lectures des modèles en cache (hit, miss, disabled)", ("cache", "result"))
+
+
+def _sql_operation(sql: str) -> str:
+    stripped = sql.lstrip()
+    return stripped[:stripped.find(" ")].upper() if " " in stripped else stripped.upper()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connexion SQLite qui mesure execute/executemany/commit (factory= de sqlite3.connect)."""
+
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, op=_sql_operation(sql))
+
+    def executemany(self, sql, parameters, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, op=_sql_operation(sql))
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, op="COMMIT")
+
+
+async def monitor_loop_lag(interval: float = 1.0) -> None:
+    """Tâche de fond: mesure le retard de réveil de la boucle asyncio."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        PTB_LOOP_LAG.set(max(0.0, loop.time() - start - interval))
@@ -0,0 +1,293 @@
+"""
+Dispatcher des notifications de groupe Telegram.
+
+Les notifications sont mises en file sur la boucle PTB et envoyées par une
+tâche de fond, hors du chemin critique de l'utilisateur. Pendant les rafales,
+plusieurs signalements peuvent être regroupés en un seul message (digest).
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from telegram.error import RetryAfter
+
+from log_config import get_logger
+
+log = get_logger("notify")
+
+CARTE_URL = os.getenv("CARTE_URL", "https://gamousonagedbot-production.up.railway.app/carte")
+
+# Fenêtre de regroupement (secondes) et taille minimale d'un digest (0 = désactivé)
+NOTIFY_DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "2"))
+NOTIFY_DIGEST_MIN = int(os.getenv("NOTIFY_DIGEST_MIN", "3"))
+NOTIFY_MAX_BATCH = int(os.getenv("NOTIFY_MAX_BATCH", "20"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+NOTIFY_QUEUE_MAX = int(os.getenv("NOTIFY_QUEUE_MAX", "1000"))
+# Nombre de file_id dont la méthode d'envoi validée est mémorisée
+NOTIFY_FILE_ID_CACHE = int(os.getenv("NOTIFY_FILE_ID_CACHE", "512"))
+
+# Issue d'un appel au bot (cf. NotificationDispatcher._call_status)
+_SENT, _FLOODED, _FAILED = "sent", "flooded", "failed"
+
+
+def parse_chat_ids(raw: Optional[str], fallback: Optional[int] = None) -> List[int]:
+    """Lit une liste d'IDs de chats séparés par des virgules (ex: "-100123,-100456")."""
+    chat_ids: List[int] = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            chat_id = int(part)
+        except ValueError:
+            log.warning("ID de chat ignoré (non numérique): %s", part)
+            continue
+        if chat_id not in chat_ids:
+            chat_ids.append(chat_id)
+    if fallback and fallback not in chat_ids:
+        chat_ids.insert(0, fallback)
+    return chat_ids
+
+
+def format_notification(report: Dict[str, Any]) -> str:
+    return f"""🚨 NOUVEAU SIGNALEMENT
+
+📍 Type: {report.get("type")}
+👤 Utilisateur: {report.get("utilisateur")}
+📝 Message: {report.get("message")}
+🌍 Localisation: {report.get("latitude")}, {report.get("longitude")}
+🕐 Date: {report.get("date_heure")}
+
+Voir sur la carte: {CARTE_URL}"""
+
+
+def format_digest(reports: List[Dict[str, Any]]) -> str:
+    lines = [f"🚨 {len(reports)} NOUVEAUX SIGNALEMENTS", ""]
+    for report in reports:
+        photo_flag = " 📸" if report.get("photo_id") else ""
+        lines.append(
+            f"• {report.get('type')} — {report.get('message')} "
+            f"({report.get('utilisateur')}, {report.get('latitude')}, {report.get('longitude')}, "
+            f"{report.get('date_heure')}){photo_flag}"
+        )
+    lines.extend(["", f"Voir sur la carte: {CARTE_URL}"])
+    # Limite Telegram: 4096 caractères par message
+    text = "\n".join(lines)
+    return text if len(text) <= 4096 else text[:4093] + "..."
+
+
+class NotificationDispatcher:
+    """File d'envoi des notifications vers un ou plusieurs chats de groupe.
+
+    Doit être utilisé depuis la boucle asyncio de l'application PTB: ``submit``
+    est non bloquant et démarre la tâche d'envoi au premier appel.
+    """
+
+    def __init__(
+        self,
+        bot,
+        chat_ids: List[int],
+        digest_window: float = NOTIFY_DIGEST_WINDOW,
+        digest_min: int = NOTIFY_DIGEST_MIN,
+        max_batch: int = NOTIFY_MAX_BATCH,
+        max_retries: int = NOTIFY_MAX_RETRIES,
+        queue_max: int = NOTIFY_QUEUE_MAX,
+        file_id_cache_size: int = NOTIFY_FILE_ID_CACHE,
+    ) -> None:
+        self.bot = bot
+        self.chat_ids = list(chat_ids)
+        self.digest_window = digest_window
+        self.digest_min = digest_min
+        self.max_batch = max(1, max_batch)
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_max)
+        self._worker_task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.digests = 0
+        self.failed = 0
+        self.dropped = 0
+        # LRU file_id -> 'photo' | 'document' (méthode ayant déjà réussi)
+        self._file_kinds: "OrderedDict[str, str]" = OrderedDict()
+        self._file_id_cache_size = file_id_cache_size
+        self.media_counters = {"photo": 0, "document": 0, "fallback": 0, "cache_hits": 0, "text_only": 0}
+
+    def submit(self, report: Dict[str, Any]) -> bool:
+        """Met un signalement en file. Retourne False si la file est pleine."""
+        if not self.chat_ids:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(report)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("File de notifications pleine, notification ignorée")
+            return False
+
+    def _ensure_worker(self) -> None:
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def join(self) -> None:
+        """Attend que toutes les notifications en file soient traitées."""
+        await self._queue.join()
+
+    async def aclose(self) -> None:
+        await self.join()
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chat_ids": self.chat_ids,
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "digests": self.digests,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "media": dict(self.media_counters),
+            "fallback_rate": self.fallback_rate(),
+            "file_id_cache": len(self._file_kinds),
+        }
+
+    def fallback_rate(self) -> float:
+        total = self.media_counters["photo"] + self.media_counters["document"]
+        return round(self.media_counters["fallback"] / total, 4) if total else 0.0
+
+    def _known_kind(self, file_id: str) -> Optional[str]:
+        kind = self._file_kinds.get(file_id)
+        if kind is not None:
+            self._file_kinds.move_to_end(file_id)
+            self.media_counters["cache_hits"] += 1
+        return kind
+
+    def _remember_kind(self, file_id: str, kind: str) -> None:
+        self._file_kinds[file_id] = kind
+        self._file_kinds.move_to_end(file_id)
+        while len(self._file_kinds) > self._file_id_cache_size:
+            self._file_kinds.popitem(last=False)
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            try:
+                for chat_id in self.chat_ids:
+                    # Un chat en erreur n'empêche pas l'envoi aux suivants
+                    try:
+                        await self._deliver(chat_id, batch)
+                    except Exception as e:
+                        log.exception("Erreur notification groupe %s: %s", chat_id, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _collect_batch(self) -> List[Dict[str, Any]]:
+        batch = [await self._queue.get()]
+        if self.digest_min <= 1:
+            return batch
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.digest_window
+        while len(batch) < self.max_batch:
+            # Récupérer d'abord ce qui est déjà en attente
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _deliver(self, chat_id: int, batch: List[Dict[str, Any]]) -> None:
+        if self.digest_min > 1 and len(batch) >= self.digest_min:
+            status = await self._call_status(self.bot.send_message, chat_id=chat_id, text=format_digest(batch),
+                                             disable_web_page_preview=True)
+            if status == _SENT:
+                self.digests += 1
+                self.sent += len(batch)
+                return
+            if status == _FLOODED:
+                # Flood control persistant: N envois individuels n'y changeraient rien
+                self.failed += len(batch)
+                log.warning("Digest non envoyé à %s (flood control), %d signalements abandonnés", chat_id, len(batch))
+                return
+            # Digest refusé: chaque signalement part seul et n'est compté qu'une fois
+            log.warning("Digest non envoyé à %s, repli sur %d envois individuels", chat_id, len(batch))
+        for report in batch:
+            await self._send_report(chat_id, report)
+
+    async def _send_report(self, chat_id: int, report: Dict[str, Any]) -> None:
+        notification = format_notification(report)
+        photo_id = report.get("photo_id")
+        # Les media ids WhatsApp ne sont pas utilisables côté Telegram
+        if photo_id and report.get("photo_kind") != "wa_image":
+            if await self._send_media(chat_id, photo_id, report.get("photo_kind"), notification):
+                self.sent += 1
+                return
+        self.media_counters["text_only"] += 1
+        if await self._call(self.bot.send_message, chat_id=chat_id, text=notification,
+                            disable_web_page_preview=True):
+            self.sent += 1
+        else:
+            self.failed += 1
+
+    async def _send_media(self, chat_id: int, file_id: str, kind: Optional[str], caption: str) -> bool:
+        """Envoie directement avec la méthode correspondant au type connu, l'autre en repli."""
+        kind = self._known_kind(file_id) or (kind if kind in ("photo", "document") else "photo")
+        order = [kind, "document" if kind == "photo" else "photo"]
+        for attempt, method_kind in enumerate(order):
+            if method_kind == "photo":
+                ok = await self._call(self.bot.send_photo, chat_id=chat_id, photo=file_id, caption=caption)
+            else:
+                ok = await self._call(self.bot.send_document, chat_id=chat_id, document=file_id, caption=caption)
+            if ok:
+                self.media_counters[method_kind] += 1
+                if attempt > 0:
+                    self.media_counters["fallback"] += 1
+                self._remember_kind(file_id, method_kind)
+                return True
+        return False
+
+    async def _call(self, method, **kwargs) -> bool:
+        return await self._call_status(method, **kwargs) == _SENT
+
+    async def _call_status(self, method, **kwargs) -> str:
+        """Appelle une méthode du bot en respectant les RetryAfter (flood control).
+
+        Retourne _SENT, _FLOODED (RetryAfter persistant) ou _FAILED (autre erreur).
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await method(**kwargs)
+                return _SENT
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    log.error("Flood control persistant (%s): %s", method.__name__, e)
+                    return _FLOODED
+                log.info("Flood control, nouvel essai dans %ss", e.retry_after)
+                await asyncio.sleep(float(e.retry_after))
+            except Exception as e:
+                log.warning("Erreur %s vers %s: %s", method.__name__, kwargs.get("chat_id"), e)
+                return _FAILED
+        return _FLOODED
+
+
+def get_dispatcher(application, chat_ids: List[int]) -> NotificationDispatcher:
+    """Retourne le dispatcher attaché à l'application PTB (créé au premier appel)."""
+    dispatcher = application.bot_data.get("notification_dispatcher")
+    if dispatcher is None:
+        dispatcher = NotificationDispatcher(application.bot, chat_ids)
+        application.bot_data["notification_dispatcher"] = dispatcher
+    return dispatcher
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cache des modèles de lecture invalidé entre workers par PRAGMA data_version.
+
+Chaque worker garde une connexion de veille qui n'écrit jamais: SQLite
+incrémente son data_version dès qu'une autre connexion (autre worker, thread
+du bot, pipeline d'ingestion, script) valide une écriture. Une requête lit ce
+compteur (quelques µs: en-tête de la base) et ne reconstruit la liste des
+signalements, les statistiques ou le modèle en colonnes que si la base a
+changé depuis la dernière construction.
+
+Le remplacement du fichier (restauration d'une sauvegarde) est détecté par
+son inode: la connexion de veille est alors rouverte.
+
+Variables d'environnement:
+    READ_CACHE=1   activer le cache (0: reconstruction à chaque requête)
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import READ_CACHE_REQUESTS
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE", "1").lower() in ("1", "true", "yes")
+
+Version = Tuple[int, int]
+
+
+class DataVersionWatch:
+    """Version courante de la base vue par une connexion dédiée en lecture seule."""
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inode: Optional[Tuple[int, int]] = None
+        # Incrémenté à chaque réouverture: data_version n'est comparable que sur une même connexion
+        self._generation = 0
+
+    def current(self) -> Version:
+        st = os.stat(self.db_file)
+        inode = (st.st_dev, st.st_ino)
+        with self._lock:
+            if self._conn is None or inode != self._inode:
+                self._reopen(inode)
+            return self._generation, self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _reopen(self, inode: Tuple[int, int]) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        self._inode = inode
+        self._generation += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Entry:
+    __slots__ = ("lock", "version", "value", "hits", "misses")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.version: Optional[Version] = None
+        self.value: Any = None
+        self.hits = 0
+        self.misses = 0
+
+
+class ReadCache:
+    """Valeurs nommées reconstruites seulement quand data_version change.
+
+    `build(previous)` reçoit la valeur précédente (None au premier appel) pour
+    pouvoir la mettre à jour au lieu de tout reconstruire.
+    """
+
+    def __init__(self, db_file: str, enabled: bool = READ_CACHE_ENABLED) -> None:
+        self.watch = DataVersionWatch(db_file)
+        self.enabled = enabled
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry()
+            return entry
+
+    def get(self, name: str, build: Callable[[Any], Any]) -> Any:
+        entry = self._entry(name)
+        if not self.enabled:
+            entry.misses += 1
+            READ_CACHE_REQUESTS.inc(cache=name, result="disabled")
+            return build(None)
+        # Version lue avant la construction: une écriture concurrente provoquera une reconstruction
+        version = self.watch.current()
+        with entry.lock:
+            if entry.version == version:
+                entry.hits += 1
+                READ_CACHE_REQUESTS.inc(cache=name, result="hit")
+                return entry.value
+            value = entry.value = build(entry.value)
+            entry.version = version
+            entry.misses += 1
+        READ_CACHE_REQUESTS.inc(cache=name, result="miss")
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            with entry.lock:
+                entry.version = None
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            entries = dict(self._entries)
+        summary = {}
+        for name, entry in sorted(entries.items()):
+            total = entry.hits + entry.misses
+            summary[name] = {
+                "hits": entry.hits,
+                "misses": entry.misses,
+                "hit_rate": round(entry.hits / total, 4) if total else None,
+                "version": list(entry.version) if entry.version else None,
+            }
+        return summary
+
+
+_caches: Dict[str, ReadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_read_cache(db_file: str) -> ReadCache:
+    """Cache du worker pour `db_file` (un par chemin)."""
+    with _caches_lock:
+        cache = _caches.get(db_file)
+        if cache is None:
+            cache = _caches[db_file] = ReadCache(db_file)
+        return cache
@@ -0,0 +1,378 @@
+"""
+Modèle de lecture en colonnes des signalements (un par worker et par base).
+
+Au lieu d'une liste de dicts à clés françaises par signalement, chaque
+champ est une colonne compacte: array('d') pour latitude/longitude (NaN si
+absente), array('i') pour l'instant UTC (colonne ts, cf. report_time.py),
+codes entiers pour le type (libellé canonique), la zone (zones.py) et
+l'utilisateur (tables de chaînes internées). Dates et dicts ne sont mis en forme qu'en sortie, pour
+les lignes réellement renvoyées.
+
+Rafraîchissement incrémental: lignes d'id supérieur au dernier chargé,
+tombstones depuis la dernière séquence, confirmations des signalements
+d'origine des nouveaux doublons et médias téléchargés depuis. Un écart de
+nombre de lignes (bascule d'édition, suppression hors tombstones) provoque
+un rechargement complet, de même qu'un changement du registre des zones;
+les lignes rattachées à une zone après leur chargement (écritures hors
+pipeline) sont relues.
+
+Utilisé par /api/stats, /api/signalements?bbox=&zone= et /api/export.
+"""
+
+import copy
+import heapq
+import math
+import sqlite3
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import TimedConnection
+from report_time import format_local, local_day, parse_bound
+from report_types import canonical_type
+from zones import zone_state
+
+_NO_DATE = -(2 ** 31)
+_NAN = float("nan")
+# Médias en attente de téléchargement vérifiés à chaque rafraîchissement
+_PENDING_MEDIA_MAX = 500
+
+_SELECT = """
+    SELECT s.id, s.date_heure, s.ts, s.utilisateur, COALESCE(t.label, s.type) AS type, s.message, s.photo_id, s.latitude, s.longitude,
+           s.confirmations, s.duplicate_of, s.zone_id, m.sha256 AS media_sha256
+    FROM signalements s
+    LEFT JOIN media m ON m.photo_id = s.photo_id
+    LEFT JOIN types t ON t.id = s.type_id
+"""
+
+
+class _StringTable:
+    """Chaînes internées: code entier ↔ chaîne."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+
+class ReportColumns:
+    """Signalements en colonnes, triés par id croissant; thread-safe (verrou par modèle).
+
+    Un rafraîchissement ajoute en fin de colonnes et remplace les colonnes en
+    cas de suppression: une vue (snapshot) garde des positions valides pendant
+    toute une réponse, même en flux.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids = array("q")
+        self.epoch = array("i")
+        self.latitude = array("d")
+        self.longitude = array("d")
+        self.type_code = array("H")
+        self.zone_code = array("H")  # code de "" : hors zone
+        self.user_code = array("I")
+        self.confirmations = array("I")
+        self.duplicate_of = array("q")  # 0: signalement d'origine
+        self.messages: List[str] = []
+        self.photos: List[Optional[str]] = []
+        self.media: List[Optional[str]] = []
+        self.types = _StringTable()
+        self.zones = _StringTable()
+        self.users = _StringTable()
+        # Dates hors format (imports anciens), conservées telles quelles par id
+        self._raw_dates: Dict[int, str] = {}
+        self._pending_media: Dict[str, int] = {}
+        self._tombstone_seq = 0
+        self._zone_state = ("", 0)
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def snapshot(self) -> "ReportColumns":
+        """Vue cohérente partageant les colonnes (copie superficielle)."""
+        with self._lock:
+            return copy.copy(self)
+
+    # ==== Chargement ====
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_file, timeout=30, factory=TimedConnection)
+
+    def _append(self, row: Sequence[Any]) -> None:
+        (row_id, date_heure, ts, utilisateur, type_value, message, photo_id, lat, lon, confirmations, duplicate_of,
+         zone_id, sha) = row
+        epoch = _NO_DATE if ts is None else ts
+        if ts is None and date_heure:
+            self._raw_dates[row_id] = date_heure
+        self.ids.append(row_id)
+        self.epoch.append(epoch)
+        self.latitude.append(_NAN if lat is None else lat)
+        self.longitude.append(_NAN if lon is None else lon)
+        self.type_code.append(self.types.code(type_value))
+        self.zone_code.append(self.zones.code(zone_id or ""))
+        self.user_code.append(self.users.code(utilisateur or ""))
+        self.confirmations.append(confirmations or 0)
+        self.duplicate_of.append(duplicate_of or 0)
+        self.messages.append(message)
+        self.photos.append(photo_id)
+        self.media.append(sha)
+        if photo_id and sha is None:
+            self._pending_media[photo_id] = row_id
+
+    def refresh(self) -> "ReportColumns":
+        """Applique les changements depuis le dernier appel (rechargement complet si nécessaire)."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                state = zone_state(conn)
+                if not self.loaded or state[0] != self._zone_state[0]:
+                    self._reset()
+                    self._load(conn, state)
+                else:
+                    self._apply_changes(conn, state)
+                    if conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0] != len(self):
+                        self._reset()
+                        self._load(conn, state)
+            finally:
+                conn.close()
+        return self
+
+    def _load(self, conn: sqlite3.Connection, state: Tuple[str, int]) -> None:
+        self._zone_state = state
+        self._tombstone_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM tombstones").fetchone()[0]
+        cursor = conn.execute(_SELECT + " ORDER BY s.id")
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            for row in rows:
+                self._append(row)
+        self.loaded = True
+
+    def _apply_changes(self, conn: sqlite3.Connection, state: Tuple[str, int]) -> None:
+        deleted = [
+            row[0] for row in conn.execute(
+                "SELECT signalement_id FROM tombstones WHERE seq > ? ORDER BY seq", (self._tombstone_seq,)
+            )
+        ]
+        self._tombstone_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM tombstones").fetchone()[0]
+        if deleted:
+            self._drop(set(deleted))
+
+        last_id = self.ids[-1] if self.ids else 0
+        start = len(self)
+        # Lignes déjà chargées, rattachées depuis par le balayage de zones.py
+        previous_tagged, self._zone_state = self._zone_state[1], state
+        if self._zone_state[1] > previous_tagged and last_id > previous_tagged:
+            for row_id, zone_id in conn.execute("SELECT id, zone_id FROM signalements WHERE id > ? AND id <= ?",
+                                                (previous_tagged, last_id)):
+                index = self.index_of(row_id)
+                if index is not None:
+                    self.zone_code[index] = self.zones.code(zone_id or "")
+        for row in conn.execute(_SELECT + " WHERE s.id > ? ORDER BY s.id", (last_id,)):
+            self._append(row)
+
+        # Nouveaux doublons: confirmations de leurs signalements d'origine
+        origins = {self.duplicate_of[i] for i in range(start, len(self)) if self.duplicate_of[i]}
+        if origins:
+            for row_id, confirmations in self._query_in(conn, "SELECT id, confirmations FROM signalements WHERE id IN ({})", origins):
+                index = self.index_of(row_id)
+                if index is not None:
+                    self.confirmations[index] = confirmations
+
+        # Photos téléchargées depuis le chargement (media_store, en arrière-plan)
+        if self._pending_media:
+            pending = list(self._pending_media)[-_PENDING_MEDIA_MAX:]
+            for photo_id, sha in self._query_in(conn, "SELECT photo_id, sha256 FROM media WHERE photo_id IN ({})", pending):
+                index = self.index_of(self._pending_media.pop(photo_id))
+                if index is not None:
+                    self.media[index] = sha
+
+    @staticmethod
+    def _query_in(conn: sqlite3.Connection, sql: str, values: Any) -> List[Tuple]:
+        values = list(values)
+        rows: List[Tuple] = []
+        for offset in range(0, len(values), 500):
+            chunk = values[offset:offset + 500]
+            rows.extend(conn.execute(sql.format(", ".join("?" for _ in chunk)), chunk).fetchall())
+        return rows
+
+    def _drop(self, deleted: set) -> None:
+        keep = [i for i, row_id in enumerate(self.ids) if row_id not in deleted]
+        if len(keep) == len(self):
+            return
+        for name, typecode in (("ids", "q"), ("epoch", "i"), ("latitude", "d"), ("longitude", "d"),
+                               ("type_code", "H"), ("zone_code", "H"), ("user_code", "I"), ("confirmations", "I"), ("duplicate_of", "q")):
+            column = getattr(self, name)
+            setattr(self, name, array(typecode, (column[i] for i in keep)))
+        for name in ("messages", "photos", "media"):
+            column = getattr(self, name)
+            setattr(self, name, [column[i] for i in keep])
+        for row_id in deleted:
+            self._raw_dates.pop(row_id, None)
+        self._pending_media = {p: i for p, i in self._pending_media.items() if i not in deleted}
+
+    # ==== Lecture ====
+
+    def index_of(self, row_id: int) -> Optional[int]:
+        index = bisect_left(self.ids, row_id)
+        return index if index < len(self.ids) and self.ids[index] == row_id else None
+
+    def date_heure(self, index: int) -> str:
+        epoch = self.epoch[index]
+        if epoch == _NO_DATE:
+            return self._raw_dates.get(self.ids[index], "")
+        return format_local(epoch)
+
+    def to_dict(self, index: int) -> Dict[str, Any]:
+        """Même forme que app.read_signalements_from_db."""
+        lat, lon, duplicate_of = self.latitude[index], self.longitude[index], self.duplicate_of[index]
+        return {
+            "id": self.ids[index],
+            "Date/Heure": self.date_heure(index),
+            "Utilisateur": self.users.values[self.user_code[index]],
+            "Type": self.types.values[self.type_code[index]],
+            "Message": self.messages[index],
+            "Photo": self.photos[index] or None,
+            "Media": self.media[index],
+            "Latitude": None if math.isnan(lat) else lat,
+            "Longitude": None if math.isnan(lon) else lon,
+            "Confirmations": self.confirmations[index],
+            "DoublonDe": duplicate_of or None,
+        }
+
+    def to_row(self, index: int) -> Tuple:
+        """Tuple dans l'ordre de export.FIELDS."""
+        lat, lon, duplicate_of = self.latitude[index], self.longitude[index], self.duplicate_of[index]
+        return (
+            self.ids[index], self.date_heure(index), self.users.values[self.user_code[index]],
+            self.types.values[self.type_code[index]], self.messages[index], self.photos[index], self.media[index],
+            None if math.isnan(lat) else lat, None if math.isnan(lon) else lon,
+            self.confirmations[index], duplicate_of or None,
+        )
+
+    def select(self, type_value: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+               bbox: Optional[Tuple[float, float, float, float]] = None, zone: Optional[str] = None) -> array:
+        """Positions des signalements retenus (ordre des ids). bbox: (min_lon, min_lat, max_lon, max_lat)."""
+        with self._lock:
+            candidates: Any = range(len(self))
+            if zone is not None:
+                code = self.zones.find(zone)
+                if code is None:
+                    return array("i")
+                zone_code = self.zone_code
+                candidates = [i for i in candidates if zone_code[i] == code]
+            if type_value is not None:
+                # « bac plein », « bac_plein » ou « 🗑 Bac plein »: même type canonique
+                code = self.types.find(canonical_type(type_value)[1])
+                if code is None:
+                    return array("i")
+                type_code = self.type_code
+                candidates = [i for i in candidates if type_code[i] == code]
+            if date_from or date_to:
+                low = parse_bound(date_from)
+                high = parse_bound(date_to, end_of_day=True)
+                low = _NO_DATE + 1 if low is None else low
+                high = 2 ** 31 - 1 if high is None else high
+                epoch = self.epoch
+                candidates = [i for i in candidates if epoch[i] != _NO_DATE and low <= epoch[i] <= high]
+            if bbox is not None:
+                min_lon, min_lat, max_lon, max_lat = bbox
+                lat, lon = self.latitude, self.longitude
+                # NaN échoue à toute comparaison: les signalements sans position sont exclus
+                candidates = [i for i in candidates if min_lat <= lat[i] <= max_lat and min_lon <= lon[i] <= max_lon]
+            return array("i", candidates)
+
+    def dicts(self, indexes: Sequence[int], newest_first: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            order = sorted(indexes, key=self._sort_key, reverse=True) if newest_first else indexes
+            return [self.to_dict(i) for i in order]
+
+    def _sort_key(self, index: int) -> Tuple[int, int]:
+        # Comme ORDER BY date_heure DESC, les ids départagent une même seconde
+        return self.epoch[index], self.ids[index]
+
+    def iter_row_chunks(self, indexes: Sequence[int], chunk_rows: int) -> Iterator[List[Tuple]]:
+        """Paquets de tuples (ordre de export.FIELDS), construits au fil de l'envoi."""
+        for offset in range(0, len(indexes), chunk_rows):
+            with self._lock:
+                yield [self.to_row(i) for i in indexes[offset:offset + chunk_rows]]
+
+    def stats(self, latest: int = 20, indexes: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """Total, répartition par type, par zone et par jour, derniers signalements (même forme que /api/stats).
+
+        `indexes`: positions retenues (select), toutes par défaut.
+        """
+        with self._lock:
+            rows: Sequence[int] = range(len(self)) if indexes is None else indexes
+            if indexes is None:
+                type_codes, zone_codes, epochs = self.type_code, self.zone_code, self.epoch
+            else:
+                type_codes = [self.type_code[i] for i in rows]
+                zone_codes = [self.zone_code[i] for i in rows]
+                epochs = [self.epoch[i] for i in rows]
+            by_type_codes = Counter(type_codes)
+            by_zone_codes = Counter(zone_codes)
+            # Heures UTC puis jours locaux: exact pour les fuseaux à décalage horaire entier
+            by_hour = Counter(map((3600).__rfloordiv__, epochs))
+            undated = by_hour.pop(_NO_DATE // 3600, 0)
+            by_day: Dict[str, int] = {}
+            for bucket, count in by_hour.items():
+                day = local_day(bucket * 3600)
+                by_day[day] = by_day.get(day, 0) + count
+            if undated:
+                # Dates hors format: préfixe du texte, comme l'ancien calcul
+                for index in (i for i in rows if self.epoch[i] == _NO_DATE):
+                    key = self.date_heure(index)[:10] or "inconnu"
+                    by_day[key] = by_day.get(key, 0) + 1
+            newest = heapq.nlargest(latest, rows, key=self._sort_key)
+            return {
+                "total": len(rows),
+                "by_type": {self.types.values[code]: count for code, count in by_type_codes.most_common()},
+                # Signalements hors zone (ou sans position) non comptés
+                "by_zone": {self.zones.values[code]: count for code, count in by_zone_codes.most_common()
+                            if self.zones.values[code]},
+                "by_day": dict(sorted(by_day.items())),
+                "latest": [self.to_dict(i) for i in newest],
+            }
+
+    def nbytes(self) -> int:
+        """Mémoire approximative des colonnes et tables de chaînes (octets)."""
+        total = sum(column.buffer_info()[1] * column.itemsize for column in (
+            self.ids, self.epoch, self.latitude, self.longitude, self.type_code, self.zone_code, self.user_code,
+            self.confirmations, self.duplicate_of,
+        ))
+        for strings in (self.messages, self.photos, self.media, self.types.values, self.zones.values, self.users.values):
+            total += sys.getsizeof(strings) + sum(sys.getsizeof(s) for s in strings if s is not None)
+        return total
+
+
+_models: Dict[str, ReportColumns] = {}
+_models_lock = threading.Lock()
+
+
+def get_read_model(db_file: str) -> ReportColumns:
+    """Modèle du worker pour `db_file`, rafraîchi (incrémental)."""
+    with _models_lock:
+        model = _models.get(db_file)
+        if model is None:
+            model = _models[db_file] = ReportColumns(db_file)
+    return model.refresh()
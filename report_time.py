@@ -0,0 +1,84 @@
+"""
+Horodatage des signalements: epoch UTC entier indexé (`signalements.ts`).
+
+`date_heure` reste le texte local historique (« AAAA-MM-JJ HH:MM:SS »);
+`ts` est l'instant correspondant en secondes UTC, écrit par tous les
+producteurs (pipeline d'ingestion, générateur de données) et rattrapé à
+l'ouverture de la base pour les anciennes lignes. Filtres de dates,
+regroupements par jour et « derniers N » travaillent sur `ts`; la mise en
+forme n'a lieu qu'en sortie.
+
+Le texte local est interprété dans APP_TIMEZONE (pas dans le fuseau du
+serveur, non défini sur Railway).
+
+Variables d'environnement:
+    APP_TIMEZONE=Africa/Dakar   fuseau des dates affichées et saisies
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone, tzinfo
+from typing import Optional
+
+from log_config import get_logger
+
+log = get_logger("db")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _load_zone(name: str) -> tzinfo:
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(name)
+    except Exception as e:
+        log.warning("Fuseau %s indisponible (%s), UTC utilisé", name, e)
+        return timezone.utc
+
+
+APP_TIMEZONE = os.getenv("APP_TIMEZONE", "Africa/Dakar")
+APP_TZ = _load_zone(APP_TIMEZONE)
+
+
+def parse_local(date_heure: Optional[str]) -> Optional[int]:
+    """Epoch UTC d'une date locale (ISO 8601, sans fuseau: APP_TIMEZONE); None si illisible."""
+    try:
+        moment = datetime.fromisoformat(date_heure)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=APP_TZ)
+    return int(moment.timestamp())
+
+
+def parse_bound(value: Optional[str], end_of_day: bool = False) -> Optional[int]:
+    """Borne d'un filtre (?from= / ?to=): une date seule couvre toute la journée."""
+    if not value:
+        return None
+    if len(value) <= 10:
+        value = f"{value} {'23:59:59' if end_of_day else '00:00:00'}"
+    return parse_local(value)
+
+
+def format_local(ts: int) -> str:
+    return datetime.fromtimestamp(ts, APP_TZ).strftime(DATE_FORMAT)
+
+
+def local_day(ts: int) -> str:
+    return datetime.fromtimestamp(ts, APP_TZ).strftime("%Y-%m-%d")
+
+
+def now_local() -> str:
+    """Date courante au format de date_heure, dans APP_TIMEZONE."""
+    return format_local(int(time.time()))
+
+
+def backfill_timestamps(conn: sqlite3.Connection, chunk: int = 5000) -> int:
+    """Renseigne `ts` des lignes qui n'en ont pas (anciennes lignes, écritures hors pipeline)."""
+    rows = conn.execute("SELECT id, date_heure FROM signalements WHERE ts IS NULL").fetchall()
+    updates = [(ts, row_id) for row_id, ts in ((row[0], parse_local(row[1])) for row in rows) if ts is not None]
+    for offset in range(0, len(updates), chunk):
+        conn.executemany("UPDATE signalements SET ts = ? WHERE id = ?", updates[offset:offset + chunk])
+    return len(updates)
@@ -0,0 +1,114 @@
+"""
+Types de signalement: table de référence `types` et normalisation à l'écriture.
+
+Le type saisi (bouton Telegram/WhatsApp, champ du formulaire, import) est
+ramené une seule fois, à l'insertion, à un type canonique: séquences \\uXXXX
+décodées, casse, accents, emoji et espaces ignorés pour la comparaison
+(« bac plein », « 🗑 Bac plein » et « \\ud83d\\uddd1 Bac plein » donnent le
+même type). Les enregistrements passifs WhatsApp ont leur propre type
+(« 💬 WhatsApp »), les types absents vont dans « 🔹 Autres ». Un libellé
+inconnu devient un nouveau type.
+
+`signalements.type_id` référence `types.id` (entier indexé). Les nouvelles
+lignes reçoivent le libellé canonique dans `signalements.type`; les anciennes
+lignes gardent leur libellé d'origine (seul `type_id` est rattrapé) et les
+lectures affichent `types.label`.
+"""
+
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+# Types proposés par les bots et le formulaire: (id, code, libellé), ids stables
+CANONICAL_TYPES = (
+    (1, "depot", "📍 Dépôt"),
+    (2, "bac_plein", "🗑 Bac plein"),
+    (3, "autres", "🔹 Autres"),
+    (4, "whatsapp", "💬 WhatsApp"),
+)
+_LABELS = {code: label for _, code, label in CANONICAL_TYPES}
+# Clés de comparaison -> code canonique
+_ALIASES = {
+    "depot": "depot",
+    "bac plein": "bac_plein",
+    "autres": "autres",
+    "autre": "autres",
+    "whatsapp": "whatsapp",
+    "": "autres",
+}
+
+_ESCAPE_RE = re.compile(r"\\u([0-9a-fA-F]{4})")
+
+
+def decode_escapes(text: str) -> str:
+    """Décode les séquences \\uXXXX (y compris les paires de substitution des emoji)."""
+    if "\\u" not in text:
+        return text
+    decoded = _ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)), text)
+    return decoded.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+
+
+def type_key(text: str) -> str:
+    """Clé de comparaison: lettres et chiffres sans accents, minuscules, espaces simples."""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    kept = "".join(c if c.isalnum() else " " for c in folded if not unicodedata.combining(c))
+    return " ".join(kept.split())
+
+
+def canonical_type(raw: Optional[str]) -> Tuple[str, str]:
+    """(code, libellé) canonique d'un type saisi."""
+    label = " ".join(decode_escapes(raw or "").split())
+    key = type_key(label)
+    code = _ALIASES.get(key)
+    if code is not None:
+        return code, _LABELS[code]
+    return key.replace(" ", "_"), label
+
+
+def ensure_types_table(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS types (
+            id INTEGER PRIMARY KEY,
+            code TEXT NOT NULL UNIQUE,
+            label TEXT NOT NULL
+        )
+    """)
+    conn.executemany("INSERT OR IGNORE INTO types (id, code, label) VALUES (?, ?, ?)", CANONICAL_TYPES)
+
+
+class TypeTable:
+    """Cache code -> (id, libellé) de la table `types` pour une connexion."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, Tuple[int, str]] = {}
+
+    def resolve(self, conn: sqlite3.Connection, raw: Optional[str]) -> Tuple[int, str]:
+        """(type_id, libellé) du type saisi; crée le type s'il est inconnu."""
+        code, label = canonical_type(raw)
+        cached = self._ids.get(code)
+        if cached is None:
+            conn.execute("INSERT OR IGNORE INTO types (code, label) VALUES (?, ?)", (code, label))
+            row = conn.execute("SELECT id, label FROM types WHERE code = ?", (code,)).fetchone()
+            cached = self._ids[code] = (row[0], row[1])
+        return cached
+
+    def clear(self) -> None:
+        # Après un ROLLBACK: les types créés dans la transaction n'existent plus
+        self._ids.clear()
+
+
+def backfill_type_ids(conn: sqlite3.Connection) -> int:
+    """Renseigne type_id des signalements qui n'en ont pas (anciennes lignes, écritures hors pipeline).
+
+    Le libellé d'origine (`type`) n'est pas modifié.
+    """
+    table = TypeTable()
+    raw_types = [row[0] for row in conn.execute("SELECT DISTINCT type FROM signalements WHERE type_id IS NULL")]
+    updated = 0
+    for raw in raw_types:
+        type_id, _ = table.resolve(conn, raw)
+        updated += conn.execute(
+            "UPDATE signalements SET type_id = ? WHERE type_id IS NULL AND type = ?", (type_id, raw)
+        ).rowcount
+    return updated
@@ -0,0 +1,166 @@
+"""
+Recherche plein texte des signalements (FTS5, cf. db_schema._ensure_fts).
+
+La saisie utilisateur n'est jamais passée telle quelle à MATCH: chaque mot
+devient un terme entre guillemets, tous requis, le dernier en préfixe pour
+la saisie incrémentale (« bac ple » → "bac" "ple"*). Le classement bm25
+porte sur les SEARCH_CANDIDATES correspondances les plus récentes: le coût
+reste borné quand un mot courant correspond à des centaines de milliers de
+lignes. Au-delà, la réponse porte `truncated: true` (les correspondances
+plus anciennes ne sont pas classées: affiner la requête ou les dates);
+`has_more` indique s'il reste une page parmi les résultats classés. Les
+extraits sont échappés pour le HTML et les correspondances entourées de
+<mark>.
+"""
+
+import html
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from report_time import parse_bound
+from report_types import canonical_type
+
+SEARCH_MAX_PER_PAGE = 100
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Requête MATCH sûre à partir de la saisie libre (None si aucun mot)."""
+    words = _WORD_RE.findall(q or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:16]]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def fts_available(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'signalements_fts'").fetchone() is not None
+
+
+def _fold(word: str) -> str:
+    # Même normalisation que le tokenizer unicode61 remove_diacritics
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _matches(token: str, words: List[str]) -> bool:
+    folded = _fold(token)
+    # Le dernier mot est un préfixe (saisie incrémentale)
+    return folded in words[:-1] or folded.startswith(words[-1])
+
+
+def highlight(text: Optional[str], words: List[str], context: int = 12) -> str:
+    """Extrait HTML de `text` (au plus `context` mots) avec les mots recherchés entourés de <mark>.
+
+    Calculé en Python pour la page de résultats seulement: snippet() de FTS5
+    relancerait la requête MATCH sur toutes les correspondances.
+    """
+    text = text or ""
+    tokens = list(_WORD_RE.finditer(text))
+    if not tokens or not words:
+        return html.escape(text)
+    hits = {i for i, m in enumerate(tokens) if _matches(m.group(), words)}
+    first = min(hits) if hits else 0
+    start_tok = max(0, first - context // 2)
+    end_tok = min(len(tokens), start_tok + context)
+    begin = tokens[start_tok].start() if start_tok else 0
+    end = tokens[end_tok - 1].end() if end_tok < len(tokens) else len(text)
+
+    parts, pos = [], begin
+    for i in range(start_tok, end_tok):
+        if i in hits:
+            m = tokens[i]
+            parts.append(html.escape(text[pos:m.start()]))
+            parts.append(f"<mark>{html.escape(m.group())}</mark>")
+            pos = m.end()
+    parts.append(html.escape(text[pos:end]))
+    return ("…" if begin else "") + "".join(parts) + ("…" if end < len(text) else "")
+
+
+def search_signalements(
+    conn: sqlite3.Connection,
+    q: str,
+    type_signalement: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 20,
+) -> Dict[str, Any]:
+    """Signalements correspondant à `q`, classés par pertinence (bm25), une page à la fois."""
+    match = build_match_query(q)
+    per_page = max(1, min(per_page, SEARCH_MAX_PER_PAGE))
+    page = max(1, page)
+    if match is None:
+        return {"page": page, "per_page": per_page, "has_more": False, "truncated": False, "results": []}
+
+    conditions = ["signalements_fts MATCH ?"]
+    params: List[Any] = [match]
+    if type_signalement:
+        conditions.append("s.type_id = (SELECT id FROM types WHERE code = ?)")
+        params.append(canonical_type(type_signalement)[0])
+    # Bornes converties une fois en epoch UTC: comparaisons entières sur l'index de ts
+    if date_from:
+        conditions.append("s.ts >= ?")
+        params.append(parse_bound(date_from))
+    if date_to:
+        conditions.append("s.ts <= ?")
+        # Date seule: journée incluse
+        params.append(parse_bound(date_to, end_of_day=True))
+    # Un candidat de plus que la limite: indique, sans COUNT(*), si des correspondances n'ont pas été classées
+    params.append(SEARCH_CANDIDATES + 1)
+
+    candidates = conn.execute(
+        f"""
+        SELECT signalements_fts.rowid AS id, bm25(signalements_fts) AS score
+        FROM signalements_fts
+        JOIN signalements s ON s.id = signalements_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY signalements_fts.rowid DESC
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+    truncated = len(candidates) > SEARCH_CANDIDATES
+    # Au plus SEARCH_CANDIDATES lignes: classement et pagination en mémoire
+    ranked = sorted(candidates[:SEARCH_CANDIDATES], key=lambda row: (row[1], -row[0]))
+    offset = (page - 1) * per_page
+    page_rows = ranked[offset:offset + per_page]
+    has_more = len(ranked) > offset + per_page
+    if not page_rows:
+        return {"page": page, "per_page": per_page, "has_more": False, "truncated": truncated, "results": []}
+
+    ids = [row[0] for row in page_rows]
+    details = {
+        row["id"]: row
+        for row in conn.execute(
+            f"""
+            SELECT s.id, s.date_heure, s.utilisateur, COALESCE(t.label, s.type) AS type, s.message, s.latitude, s.longitude
+            FROM signalements s LEFT JOIN types t ON t.id = s.type_id
+            WHERE s.id IN ({", ".join("?" for _ in ids)})
+            """,
+            ids,
+        )
+    }
+    words = [_fold(word) for word in _WORD_RE.findall(q)[:16]]
+    results = [
+        {
+            "id": row_id,
+            "Date/Heure": details[row_id]["date_heure"],
+            "Utilisateur": details[row_id]["utilisateur"],
+            "Type": details[row_id]["type"],
+            "Message": details[row_id]["message"],
+            "Latitude": details[row_id]["latitude"],
+            "Longitude": details[row_id]["longitude"],
+            "Extrait": highlight(details[row_id]["message"], words),
+            "Score": round(-score, 4),
+        }
+        for row_id, score in page_rows
+        if row_id in details
+    ]
+    return {"page": page, "per_page": per_page, "has_more": has_more, "truncated": truncated, "results": results}
@@ -0,0 +1,202 @@
+"""
+Version du snapshot JSON et vérification de cohérence base ↔ snapshot.
+
+Une version est (nombre de lignes, id maximal, empreinte des ids): l'empreinte
+est la somme de id_hash(id) sur les lignes, indépendante de l'ordre et mise à
+jour par addition/soustraction. Côté base, des triggers l'entretiennent à
+chaque insertion et suppression (table snapshot_version, une ligne) ainsi que
+par tranche de BUCKET_IDS ids (table snapshot_buckets). Côté snapshot,
+l'écrivain dépose l'en-tête et les tranches à côté du fichier
+(<snapshot>.version.json), après le renommage du snapshot, avec la taille,
+le mtime_ns et le SHA-256 de ses octets: le fichier reste la liste attendue
+par ses consommateurs, et un en-tête qui ne correspond plus au fichier
+(écriture interrompue entre les deux renommages, fichier remplacé à la
+main) est détecté et ignoré. Vérification courante par stat() en O(1);
+l'empreinte n'est recalculée que sur demande (deep).
+
+Vérification: comparaison des en-têtes en O(1); en cas d'écart, comparaison
+des tranches (style Merkle) puis lecture des seuls ids des tranches
+différentes (plage d'ids côté base, snapshot parcouru une fois).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Taille d'une tranche d'ids (figée: utilisée par les triggers)
+BUCKET_IDS = 1024
+
+# Mélange non linéaire (deux congruences, produit < 2^62, résultat < 2^32):
+# calculable en SQL sans dépassement, la somme sur 2^31 lignes tient en 64 bits
+_P1, _P2, _P3 = 2147483647, 2147483629, 4294967291
+
+
+def id_hash(row_id: int) -> int:
+    return ((row_id * 2654435761) % _P1) * ((row_id * 40503 + 12345) % _P2) % _P3
+
+
+def _id_hash_sql(column: str) -> str:
+    return f"((({column} * 2654435761) % {_P1}) * (({column} * 40503 + 12345) % {_P2}) % {_P3})"
+
+
+def ensure_version_tables(conn: sqlite3.Connection) -> None:
+    """Tables et triggers de version; initialisés par un parcours des ids à la création."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'snapshot_version'").fetchone():
+        return
+    new_hash, old_hash = _id_hash_sql("new.id"), _id_hash_sql("old.id")
+    # Une transaction d'écriture: un autre processus qui initialise en même temps recalcule le même état
+    conn.executescript(f"""
+        BEGIN IMMEDIATE;
+        CREATE TABLE IF NOT EXISTS snapshot_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            row_count INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            id_sum INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS snapshot_buckets (
+            bucket INTEGER PRIMARY KEY,
+            row_count INTEGER NOT NULL,
+            id_sum INTEGER NOT NULL
+        );
+        DELETE FROM snapshot_version;
+        DELETE FROM snapshot_buckets;
+        INSERT INTO snapshot_version (id, row_count, max_id, id_sum)
+            SELECT 1, COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM({_id_hash_sql("id")}), 0) FROM signalements;
+        INSERT INTO snapshot_buckets (bucket, row_count, id_sum)
+            SELECT id / {BUCKET_IDS}, COUNT(*), SUM({_id_hash_sql("id")}) FROM signalements GROUP BY id / {BUCKET_IDS};
+
+        CREATE TRIGGER IF NOT EXISTS signalements_version_ai AFTER INSERT ON signalements BEGIN
+            UPDATE snapshot_version SET row_count = row_count + 1, max_id = MAX(max_id, new.id),
+                                        id_sum = id_sum + {new_hash} WHERE id = 1;
+            INSERT INTO snapshot_buckets (bucket, row_count, id_sum) VALUES (new.id / {BUCKET_IDS}, 1, {new_hash})
+                ON CONFLICT(bucket) DO UPDATE SET row_count = row_count + 1, id_sum = id_sum + excluded.id_sum;
+        END;
+        CREATE TRIGGER IF NOT EXISTS signalements_version_ad AFTER DELETE ON signalements BEGIN
+            UPDATE snapshot_version SET row_count = row_count - 1, id_sum = id_sum - {old_hash},
+                                        max_id = (SELECT COALESCE(MAX(id), 0) FROM signalements) WHERE id = 1;
+            UPDATE snapshot_buckets SET row_count = row_count - 1, id_sum = id_sum - {old_hash}
+                WHERE bucket = old.id / {BUCKET_IDS};
+            DELETE FROM snapshot_buckets WHERE bucket = old.id / {BUCKET_IDS} AND row_count = 0;
+        END;
+        COMMIT;
+    """)
+
+
+def db_version(conn: sqlite3.Connection) -> Dict[str, int]:
+    row = conn.execute("SELECT row_count, max_id, id_sum FROM snapshot_version WHERE id = 1").fetchone()
+    return {"count": row[0], "max_id": row[1], "id_sum": row[2]}
+
+
+def db_buckets(conn: sqlite3.Connection) -> Dict[int, List[int]]:
+    return {row[0]: [row[1], row[2]] for row in conn.execute("SELECT bucket, row_count, id_sum FROM snapshot_buckets")}
+
+
+def version_of(ids: Iterable[int]) -> Dict[str, Any]:
+    """En-tête et tranches d'une liste d'ids (celle écrite dans le snapshot)."""
+    count = max_id = id_sum = 0
+    buckets: Dict[int, List[int]] = {}
+    for row_id in ids:
+        h = id_hash(row_id)
+        count += 1
+        id_sum += h
+        max_id = max(max_id, row_id)
+        entry = buckets.get(row_id // BUCKET_IDS)
+        if entry is None:
+            buckets[row_id // BUCKET_IDS] = [1, h]
+        else:
+            entry[0] += 1
+            entry[1] += h
+    return {"count": count, "max_id": max_id, "id_sum": id_sum, "bucket_ids": BUCKET_IDS, "buckets": buckets}
+
+
+def header_path(snapshot_file: str) -> str:
+    return snapshot_file + ".version.json"
+
+
+def file_sha256(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _file_stamp(path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_header(snapshot_file: str, version: Dict[str, Any], sha256: Optional[str] = None) -> None:
+    """Écrit l'en-tête d'un snapshot déjà en place (taille et mtime relevés); `sha256`: empreinte de ses octets."""
+    path = header_path(snapshot_file)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**version, "stamp": _file_stamp(snapshot_file), "sha256": sha256,
+                   "buckets": {str(b): v for b, v in version["buckets"].items()}}, f)
+    os.replace(tmp, path)
+
+
+def header_matches(snapshot_file: str, header: Dict[str, Any], deep: bool = False) -> bool:
+    """L'en-tête décrit-il le fichier actuel? Taille et mtime_ns (O(1)), ou SHA-256 des octets avec `deep`."""
+    if deep:
+        return header.get("sha256") is not None and header["sha256"] == file_sha256(snapshot_file)
+    return header.get("stamp") is not None and header["stamp"] == _file_stamp(snapshot_file)
+
+
+def read_header(snapshot_file: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(header_path(snapshot_file), "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if header.get("bucket_ids") != BUCKET_IDS:
+        return None
+    header["buckets"] = {int(b): v for b, v in header["buckets"].items()}
+    return header
+
+
+def _root(version: Dict[str, Any]) -> Dict[str, int]:
+    return {k: version[k] for k in ("count", "max_id", "id_sum")}
+
+
+def compare(conn: sqlite3.Connection, header: Dict[str, Any], snapshot_ids: Callable[[], Iterable[int]],
+            snapshot_file: Optional[str] = None, deep: bool = False) -> Dict[str, Any]:
+    """Compare la base à l'en-tête d'un snapshot; `snapshot_ids` n'est appelé qu'en cas d'écart.
+
+    Avec `snapshot_file`, l'en-tête est vérifié sur le fichier (header_matches):
+    un en-tête périmé est remplacé par la version recalculée depuis le fichier.
+    """
+    stale = snapshot_file is not None and not header_matches(snapshot_file, header, deep)
+    if stale:
+        ids = list(snapshot_ids())
+        header, snapshot_ids = version_of(ids), lambda: ids
+    db_root = db_version(conn)
+    result: Dict[str, Any] = {"db": db_root, "snapshot": _root(header), "consistent": db_root == _root(header),
+                              "stale_header": stale}
+    if result["consistent"]:
+        return result
+    db_side = db_buckets(conn)
+    snap_side = header["buckets"]
+    differing = sorted(b for b in set(db_side) | set(snap_side) if db_side.get(b) != snap_side.get(b))
+    result["differing_buckets"] = len(differing)
+    if not differing:
+        return result
+    wanted = set(differing)
+    snap_ids = {i for i in snapshot_ids() if i // BUCKET_IDS in wanted}
+    db_ids = set()
+    for bucket in differing:
+        db_ids.update(row[0] for row in conn.execute(
+            "SELECT id FROM signalements WHERE id BETWEEN ? AND ?",
+            (bucket * BUCKET_IDS, (bucket + 1) * BUCKET_IDS - 1),
+        ))
+    result["missing_in_snapshot"] = sorted(db_ids - snap_ids)
+    result["extra_in_snapshot"] = sorted(snap_ids - db_ids)
+    return result
@@ -0,0 +1,258 @@
+"""
+Écriture du snapshot JSON (signalements.json), une par processus et par fichier.
+
+Le pipeline d'ingestion ne fait que déposer les signalements validés
+(`add`): un thread d'écriture regroupe les lots arrivés pendant
+SNAPSHOT_COALESCE_MS et les applique à la liste gardée en mémoire (plus
+récents d'abord, confirmations des originaux des doublons), sans relire la
+table. Les suppressions (`remove`) suivent le même chemin et attendent
+l'écriture. Avant chaque écriture, la version des ids de la liste est
+comparée à celle de la base (snapshot_version.py, O(1) côté base): un écart
+(écriture d'un autre worker, script, restauration) provoque une relecture
+complète. Les photos téléchargées depuis l'ajout (media_store.py) sont
+reportées au passage.
+
+Le fichier est écrit dans un temporaire puis renommé (jamais lu à moitié
+écrit), l'en-tête de version ensuite, avec l'empreinte SHA-256 des octets
+écrits.
+
+Variables d'environnement:
+    SNAPSHOT_COALESCE_MS=200   fenêtre de regroupement des écritures
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from log_config import get_logger
+from metrics import SNAPSHOT_SIZE_BYTES, SNAPSHOT_WRITE_DURATION
+from report_time import parse_local
+from snapshot_version import db_version, version_of, write_header
+
+log = get_logger("db")
+
+SNAPSHOT_COALESCE_MS = float(os.getenv("SNAPSHOT_COALESCE_MS", "200"))
+# Photos en attente de téléchargement vérifiées à chaque écriture
+_PENDING_MEDIA_MAX = 500
+
+Entries = List[Dict[str, Any]]
+
+
+def snapshot_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrée du snapshot (forme de app.read_signalements_from_db) d'un signalement validé par le pipeline."""
+    return {
+        "id": record["id"],
+        "Date/Heure": record["date_heure"],
+        "Utilisateur": record["utilisateur"],
+        "Type": record["type"],
+        "Message": record["message"],
+        "Photo": record.get("photo_id") or None,
+        "Media": None,
+        "Latitude": record.get("latitude"),
+        "Longitude": record.get("longitude"),
+        "Confirmations": 0,
+        "DoublonDe": record.get("duplicate_of"),
+    }
+
+
+def _sort_key(entry: Dict[str, Any]) -> Tuple[bool, int, int]:
+    # Comme ORDER BY s.ts DESC, s.id DESC (dates illisibles en dernier)
+    ts = parse_local(entry["Date/Heure"])
+    return ts is not None, ts or 0, entry["id"]
+
+
+def write_snapshot_file(json_file: str, entries: Entries) -> None:
+    """Écriture atomique du snapshot puis de son en-tête de version."""
+    parent = os.path.dirname(json_file)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    tmp = json_file + ".tmp"
+    with SNAPSHOT_WRITE_DURATION.time():
+        data = json.dumps(entries, ensure_ascii=False, indent=4).encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        SNAPSHOT_SIZE_BYTES.set(len(data))
+        os.replace(tmp, json_file)
+        write_header(json_file, version_of(item["id"] for item in entries if item.get("id") is not None),
+                     hashlib.sha256(data).hexdigest())
+
+
+class SnapshotWriter:
+    """Snapshot JSON d'une base, mis à jour par différence sur un thread dédié."""
+
+    def __init__(self, db_file: str, json_file: str, load_all: Callable[[], Entries],
+                 coalesce_ms: float = SNAPSHOT_COALESCE_MS) -> None:
+        self.db_file = db_file
+        self.json_file = json_file
+        self.load_all = load_all
+        self.coalesce = coalesce_ms / 1000
+        self._cond = threading.Condition()
+        # Sérialise les écritures du fichier (thread d'écriture, relectures complètes)
+        self._io = threading.Lock()
+        self._added: List[Dict[str, Any]] = []
+        self._removed: set = set()
+        # Demandes déposées / appliquées (flush attend que les deux se rejoignent)
+        self._requested = 0
+        self._written = 0
+        self._entries: Optional[Entries] = None
+        self._pending_media: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"writes": 0, "rebuilds": 0, "errors": 0}
+
+    # ---- API ----
+    def add(self, records: List[Dict[str, Any]]) -> None:
+        """Écouteur d'ingestion: signalements validés, appliqués au prochain passage du thread."""
+        with self._cond:
+            self._added.extend(snapshot_entry(r) for r in records)
+            self._request()
+
+    def remove(self, ids: List[int], timeout: float = 30) -> bool:
+        """Retire des signalements supprimés et attend l'écriture du fichier."""
+        with self._cond:
+            self._removed.update(ids)
+            self._request()
+        return self.flush(timeout)
+
+    def rebuild(self, entries: Optional[Entries] = None) -> int:
+        """Relecture complète (ou liste fournie) écrite immédiatement; retourne le nombre d'entrées."""
+        with self._io:
+            with self._cond:
+                # Les changements en attente sont déjà dans la base relue
+                target = self._requested
+                self._added, self._removed = [], set()
+            entries = self.load_all() if entries is None else entries
+            self._set_entries(entries)
+            write_snapshot_file(self.json_file, entries)
+            self.stats["rebuilds"] += 1
+        with self._cond:
+            self._written = max(self._written, target)
+            self._cond.notify_all()
+        return len(entries)
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Attend que les changements déposés soient écrits (False si le délai expire)."""
+        with self._cond:
+            target = self._requested
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    # ---- Thread d'écriture ----
+    def _request(self) -> None:
+        self._requested += 1
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._written < self._requested)
+            # Fenêtre de regroupement: les lots suivants partent dans la même écriture
+            time.sleep(self.coalesce)
+            with self._io:
+                with self._cond:
+                    target = self._requested
+                    added, removed = self._added, self._removed
+                    self._added, self._removed = [], set()
+                try:
+                    self._apply(added, removed)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    self._entries = None
+                    log.error("Erreur écriture du snapshot %s: %s", self.json_file, e)
+            with self._cond:
+                self._written = max(self._written, target)
+                self._cond.notify_all()
+
+    def _set_entries(self, entries: Entries) -> None:
+        self._entries = entries
+        self._pending_media = {e["Photo"]: e["id"] for e in entries if e.get("Photo") and not e.get("Media")}
+
+    def _apply(self, added: Entries, removed: set) -> None:
+        entries = self._entries
+        if entries is None:
+            entries = self._load()
+        by_id = {e["id"]: e for e in entries}
+        if removed:
+            entries = [e for e in entries if e["id"] not in removed]
+        fresh = []
+        for entry in added:
+            if entry["id"] in by_id or entry["id"] in removed:
+                continue
+            original = by_id.get(entry["DoublonDe"]) if entry["DoublonDe"] else None
+            if original is not None:
+                original["Confirmations"] = (original.get("Confirmations") or 0) + 1
+            if entry["Photo"]:
+                self._pending_media[entry["Photo"]] = entry["id"]
+            by_id[entry["id"]] = entry
+            fresh.append(entry)
+        if fresh:
+            fresh.sort(key=_sort_key, reverse=True)
+            if entries and _sort_key(fresh[-1]) < _sort_key(entries[0]):
+                # Signalements antidatés (file d'attente hors ligne): tri complet
+                entries = sorted(entries + fresh, key=_sort_key, reverse=True)
+            else:
+                entries = fresh + entries
+
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            version = version_of(e["id"] for e in entries)
+            if {k: version[k] for k in ("count", "max_id", "id_sum")} != db_version(conn):
+                # Écritures hors de ce processus: relecture complète
+                log.info("Snapshot désynchronisé de la base, relecture complète", extra={"path": self.json_file})
+                self.stats["rebuilds"] += 1
+                entries = self.load_all()
+                self._set_entries(entries)
+            else:
+                self._entries = entries
+                self._refresh_media(conn, entries)
+        finally:
+            conn.close()
+        write_snapshot_file(self.json_file, entries)
+        self.stats["writes"] += 1
+
+    def _load(self) -> Entries:
+        try:
+            with open(self.json_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = None
+        if not isinstance(entries, list) or any("id" not in item for item in entries):
+            # Snapshot absent ou antérieur aux ids
+            self.stats["rebuilds"] += 1
+            entries = self.load_all()
+        self._set_entries(entries)
+        return entries
+
+    def _refresh_media(self, conn: sqlite3.Connection, entries: Entries) -> None:
+        if not self._pending_media:
+            return
+        pending = list(self._pending_media)[-_PENDING_MEDIA_MAX:]
+        rows = conn.execute(
+            f"SELECT photo_id, sha256 FROM media WHERE photo_id IN ({', '.join('?' for _ in pending)})", pending
+        ).fetchall()
+        if not rows:
+            return
+        by_id = {e["id"]: e for e in entries}
+        for photo_id, sha in rows:
+            entry = by_id.get(self._pending_media.pop(photo_id))
+            if entry is not None:
+                entry["Media"] = sha
+
+
+_writers: Dict[str, SnapshotWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_snapshot_writer(db_file: str, json_file: str, load_all: Callable[[], Entries]) -> SnapshotWriter:
+    """Écrivain unique du processus pour `json_file` (app et bot partagent le même)."""
+    key = os.path.abspath(json_file)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or os.path.abspath(writer.db_file) != os.path.abspath(db_file):
+            writer = _writers[key] = SnapshotWriter(db_file, json_file, load_all)
+        return writer
@@ -0,0 +1,173 @@
+"""
+Assets statiques empreintés (fingerprinting) et pages HTML.
+
+Au démarrage, chaque fichier de ./static reçoit un nom versionné par son
+contenu (leaflet.js → leaflet.<sha256[:10]>.js), servi avec un cache
+immuable d'un an. Les références url(...) des CSS sont réécrites vers les
+noms versionnés. Les pages HTML référencent les chemins logiques
+(/static/vendor/...), réécrits au service; elles reçoivent un cache court,
+un ETag et un en-tête Link de préchargement dérivé de leurs balises
+<link rel="preload">. Les contenus texte sont pré-compressés en gzip.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+HTML_CACHE_CONTROL = os.getenv("HTML_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+# Assets demandés sous leur nom logique (non versionné)
+LOGICAL_CACHE_CONTROL = "public, max-age=300"
+
+_COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".map", ".txt"}
+_CSS_URL_RE = re.compile(r"url\((['\"]?)(?!data:|https?:|#|/)([^'\")]+)\1\)")
+_STATIC_REF_RE = re.compile(r"/static/([\w@./-]+\.\w+)")
+_PRELOAD_RE = re.compile(r"<link\s+[^>]*rel=[\"']preload[\"'][^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"(\w[\w-]*)=[\"']([^\"']*)[\"']")
+
+
+@dataclass
+class Asset:
+    path: str  # chemin servi (versionné ou non), relatif à /static/
+    content: bytes
+    gzipped: Optional[bytes]
+    mimetype: str
+    etag: str
+
+
+def _make_asset(path: str, content: bytes) -> Asset:
+    ext = os.path.splitext(path)[1].lower()
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mimetype.startswith("text/") or mimetype in ("application/javascript", "application/json"):
+        mimetype += "; charset=utf-8"
+    gzipped = gzip.compress(content, compresslevel=9, mtime=0) if ext in _COMPRESSIBLE else None
+    if gzipped is not None and len(gzipped) >= len(content):
+        gzipped = None
+    return Asset(path, content, gzipped, mimetype, hashlib.sha256(content).hexdigest()[:32])
+
+
+def _fingerprinted_name(rel_path: str, content: bytes) -> str:
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+
+class AssetRegistry:
+    """Index des assets de STATIC_DIR: nom logique → nom versionné, contenu en mémoire."""
+
+    def __init__(self, root: str = STATIC_DIR) -> None:
+        self.root = root
+        self.urls: Dict[str, str] = {}  # logique → versionné
+        self.assets: Dict[str, Asset] = {}  # versionné et logique → Asset
+        self.immutable: set = set()
+        self._build()
+
+    def _build(self) -> None:
+        files: List[str] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".") or name in ("LICENSE", "README.md"):
+                    continue
+                files.append(os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/"))
+        # Les CSS en dernier: leurs url(...) pointent vers des fichiers déjà versionnés
+        files.sort(key=lambda p: (p.endswith(".css"), p))
+        for rel_path in files:
+            with open(os.path.join(self.root, rel_path), "rb") as f:
+                content = f.read()
+            if rel_path.endswith(".css"):
+                content = self._rewrite_css(rel_path, content)
+            hashed = _fingerprinted_name(rel_path, content)
+            self.urls[rel_path] = hashed
+            self.assets[hashed] = _make_asset(hashed, content)
+            self.assets[rel_path] = self.assets[hashed]
+            self.immutable.add(hashed)
+
+    def _rewrite_css(self, rel_path: str, content: bytes) -> bytes:
+        base = os.path.dirname(rel_path)
+
+        def replace(match: "re.Match[str]") -> str:
+            quote, target = match.group(1), match.group(2)
+            resolved = os.path.normpath(os.path.join(base, target)).replace(os.sep, "/")
+            hashed = self.urls.get(resolved)
+            if hashed is None:
+                return match.group(0)
+            return f"url({quote}{os.path.relpath(hashed, base or '.').replace(os.sep, '/')}{quote})"
+
+        return _CSS_URL_RE.sub(replace, content.decode("utf-8")).encode("utf-8")
+
+    def url(self, logical: str) -> str:
+        return "/static/" + self.urls.get(logical, logical)
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path)
+
+    def rewrite_html(self, html: str) -> str:
+        """Remplace les chemins /static/<logique> par leurs noms versionnés."""
+        return _STATIC_REF_RE.sub(lambda m: self.url(m.group(1)), html)
+
+
+def preload_link_header(html: str) -> Optional[str]:
+    """En-tête HTTP Link équivalent aux balises <link rel="preload"> de la page."""
+    links = []
+    for tag in _PRELOAD_RE.findall(html):
+        attrs = dict(_ATTR_RE.findall(tag))
+        href = attrs.get("href")
+        if not href:
+            continue
+        link = f"<{href}>; rel=preload"
+        if attrs.get("as"):
+            link += f"; as={attrs['as']}"
+        links.append(link)
+    return ", ".join(links) or None
+
+
+@dataclass
+class Page:
+    asset: Asset
+    link_header: Optional[str]
+    mtime: float
+
+
+class PageCache:
+    """Pages HTML réécrites, recalculées si le fichier source change."""
+
+    def __init__(self, registry: Optional[AssetRegistry], pages_dir: str) -> None:
+        # None: registre partagé construit au premier usage (démarrage à froid)
+        self._registry = registry
+        self.pages_dir = pages_dir
+        self._pages: Dict[str, Page] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self) -> AssetRegistry:
+        return self._registry or get_registry()
+
+    def get(self, filename: str) -> Page:
+        path = os.path.join(self.pages_dir, filename)
+        mtime = os.path.getmtime(path)
+        page = self._pages.get(filename)
+        if page is not None and page.mtime == mtime:
+            return page
+        with open(path, "r", encoding="utf-8") as f:
+            html = self.registry.rewrite_html(f.read())
+        page = Page(_make_asset(filename, html.encode("utf-8")), preload_link_header(html), mtime)
+        with self._lock:
+            self._pages[filename] = page
+        return page
+
+
+_registry: Optional[AssetRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AssetRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AssetRegistry()
+        return _registry
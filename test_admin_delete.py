@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests de la suppression groupée par ids (tombstones, snapshot incrémental)
+"""
+
+import json
+import os
+import sqlite3
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    return app_module.app.test_client()
+
+
+def _create(client, n):
+    items = [
+        {"Utilisateur": f"Équipe {i}", "Type": "🗑 Bac plein", "Message": f"Bac {i}", "Latitude": 14.15, "Longitude": -16.07}
+        for i in range(n)
+    ]
+    body = client.post("/api/signalements/batch", json=items).get_json()
+    # Snapshot écrit en arrière-plan
+    assert app_module._snapshot_writer().flush(5)
+    return [r["signalement"]["id"] for r in body["results"]]
+
+
+def test_suppression_par_ids_une_transaction_snapshot_incremental(client, monkeypatch):
+    """Ids présents partout; suppression groupée journalisée; snapshot mis à jour sans relire la table"""
+    ids = _create(client, 4)
+    assert sorted(s["id"] for s in client.get("/api/signalements").get_json()) == sorted(ids)
+    assert sorted(s["id"] for s in client.get("/api/admin/signalements").get_json()) == sorted(ids)
+
+    monkeypatch.setattr(app_module, "read_signalements_from_db", lambda: pytest.fail("reconstruction complète"))
+    resp = client.post("/api/signalements/delete", json={"ids": [ids[0], ids[2], 9999]})
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert body["deleted_ids"] == sorted([ids[0], ids[2]])
+    assert body["not_found"] == [9999]
+
+    with open(app_module.JSON_FILE, encoding="utf-8") as f:
+        assert sorted(item["id"] for item in json.load(f)) == [ids[1], ids[3]]
+    with sqlite3.connect(app_module.DB_FILE) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0] == 2
+
+    tombstones = client.get("/api/signalements/tombstones?since=0").get_json()
+    assert sorted(t["id"] for t in tombstones["tombstones"]) == sorted([ids[0], ids[2]])
+    assert client.get(f"/api/signalements/tombstones?since={tombstones['last_seq']}").get_json()["tombstones"] == []
+
+
+def test_suppression_ids_invalides(client):
+    assert client.post("/api/signalements/delete", json={"ids": ["1"]}).status_code == 400
+    assert client.post("/api/signalements/delete", json={"ids": []}).status_code == 400
+    assert client.post("/api/signalements/delete", json={"ids": [12345]}).status_code == 404
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests de l'ingestion groupée POST /api/signalements/batch
+"""
+
+import json
+import os
+import sqlite3
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    return app_module.app.test_client()
+
+
+def _item(**overrides):
+    item = {"Utilisateur": "Équipe A", "Type": "🗑 Bac plein", "Message": "Bac plein", "Latitude": 14.15, "Longitude": -16.07}
+    item.update(overrides)
+    return item
+
+
+def test_lot_partiel_une_transaction_un_snapshot(client, monkeypatch):
+    """Éléments valides insérés, invalides rapportés par index, snapshot écrit une fois"""
+    batch = [
+        _item(**{"Date/Heure": "2025-08-30 21:15:00"}),
+        _item(Latitude=None),
+        _item(Message="Dépôt", Type="📍 Dépôt"),
+        _item(**{"Date/Heure": "hier soir"}),
+    ]
+    response = client.post("/api/signalements/batch", json=batch)
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body["created"], body["rejected"]) == (2, 2)
+    assert [r["status"] for r in body["results"]] == ["created", "error", "created", "error"]
+    assert "location" in body["results"][1]["errors"]
+    assert "Date/Heure" in body["results"][3]["errors"]
+    assert body["results"][0]["signalement"]["Date/Heure"] == "2025-08-30 21:15:00"
+    # Snapshot écrit hors du thread d'écriture, une fois pour le lot
+    writer = app_module._snapshot_writer()
+    assert writer.flush(5)
+    assert writer.stats["writes"] == 1
+
+    with sqlite3.connect(app_module.DB_FILE) as conn:
+        rows = conn.execute("SELECT date_heure, type FROM signalements ORDER BY id").fetchall()
+    assert rows[0] == ("2025-08-30 21:15:00", "🗑 Bac plein")
+    assert rows[1][1] == "📍 Dépôt"
+    with open(app_module.JSON_FILE, encoding="utf-8") as f:
+        assert len(json.load(f)) == 2
+
+
+def test_lot_invalide_ou_trop_grand(client, monkeypatch):
+    assert client.post("/api/signalements/batch", json={"Utilisateur": "x"}).status_code == 400
+    assert client.post("/api/signalements/batch", json=[_item(Message="")]).status_code == 400
+    monkeypatch.setattr(app_module, "BATCH_MAX_ITEMS", 2)
+    assert client.post("/api/signalements/batch", json=[_item()] * 3).status_code == 413
+    response = client.post("/api/signalements/batch", json={"signalements": [_item(), _item()]})
+    assert response.status_code == 201
+    assert response.get_json()["created"] == 2
+
+
+def test_renvoi_idempotent_par_client_id(client):
+    """Lot renvoyé après une réponse perdue: aucune nouvelle ligne, lignes existantes renvoyées"""
+    batch = [_item(ClientId="a1b2", Message="Premier"), _item(ClientId="c3d4", Message="Second")]
+    first = client.post("/api/signalements/batch", json=batch).get_json()
+    assert first["created"] == 2
+
+    again = client.post("/api/signalements/batch", json=batch + [_item(ClientId="e5f6")])
+    body = again.get_json()
+    assert again.status_code == 201 and (body["created"], body["replayed"]) == (1, 2)
+    assert [r.get("replayed", False) for r in body["results"]] == [True, True, False]
+    assert [r["signalement"]["id"] for r in body["results"][:2]] == [r["signalement"]["id"] for r in first["results"]]
+    assert body["results"][1]["signalement"]["Message"] == "Second"
+
+    # Même identifiant deux fois dans un lot: une seule ligne, le second élément est un doublon
+    twice = client.post("/api/signalements/batch", json=[_item(ClientId="g7"), _item(ClientId="g7")]).get_json()
+    assert twice["results"][0]["signalement"]["id"] == twice["results"][1]["signalement"]["id"]
+    assert [r["status"] for r in twice["results"]] == ["created", "duplicate"]
+    assert (twice["created"], twice["replayed"]) == (1, 1)
+    assert client.post("/api/signalements/batch", json=[_item(ClientId="")]).status_code == 400
+    with sqlite3.connect(app_module.DB_FILE) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0] == 4
+
+
+def test_photo_kind_inconnu_refuse(client):
+    assert "PhotoKind" in client.post("/api/signalements", json=_item(Photo="x", PhotoKind="sticker")).get_json()["errors"]
+    body = client.post("/api/signalements/batch", json=[_item(Photo="AgAC", PhotoKind="photo"),
+                                                         _item(Photo="x", PhotoKind=["photo"])]).get_json()
+    assert [r["status"] for r in body["results"]] == ["created", "error"]
+    assert "PhotoKind" in body["results"][1]["errors"]
+
+
+def test_echec_d_ecriture_limite_a_l_element(client, monkeypatch):
+    """Un élément dont l'écriture échoue est rapporté seul (retry), les autres sont créés"""
+    from concurrent.futures import Future
+
+    service = app_module._ingestion()
+    submit_many = service.submit_many
+
+    def failing_submit_many(records):
+        futures = submit_many(records[:1] + records[2:])
+        failed = Future()
+        failed.set_exception(RuntimeError("disk I/O error"))
+        return futures[:1] + [failed] + futures[1:]
+
+    monkeypatch.setattr(service, "submit_many", failing_submit_many)
+    batch = [_item(ClientId="x1"), _item(ClientId="x2"), _item(ClientId="x3"), _item(ClientId="x2")]
+    response = client.post("/api/signalements/batch", json=batch)
+    assert response.status_code == 207
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == ["created", "error", "created", "error"]
+    assert body["results"][1]["retry"] is True and body["results"][3]["retry"] is True
+    assert (body["created"], body["failed"]) == (2, 2)
+    with sqlite3.connect(app_module.DB_FILE) as conn:
+        assert conn.execute("SELECT client_id FROM signalements ORDER BY id").fetchall() == [("x1",), ("x3",)]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests des archives par édition (bascule, ATTACH en lecture seule, statistiques)
+"""
+
+import json
+import os
+import sqlite3
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import pytest
+
+import app as app_module
+import archives
+from db_schema import ensure_schema
+
+
+def test_bascule_edition_et_lecture_historique(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    client = app_module.app.test_client()
+    items = [
+        {"Utilisateur": f"U{i}", "Type": "🗑 Bac plein", "Message": "Bac plein", "Latitude": 14.1 + i / 10, "Longitude": -16.0,
+         "Date/Heure": date}
+        for i, date in enumerate(["2024-09-10 10:00:00", "2024-09-11 10:00:00", "2025-08-30 10:00:00"])
+    ]
+    client.post("/api/signalements/batch", json=items)
+
+    resp = client.post("/api/admin/rollover", json={"edition": "gamou-2024", "until": "2024-12-31 23:59:59"})
+    assert resp.get_json()["moved"] == 2
+    # Rejouer la bascule est sans effet
+    assert client.post("/api/admin/rollover", json={"edition": "gamou-2024", "until": "2024-12-31 23:59:59"}).get_json()["moved"] == 0
+    assert client.post("/api/admin/rollover", json={"edition": "../x"}).status_code == 400
+
+    assert [s["Utilisateur"] for s in client.get("/api/signalements").get_json()] == ["U2"]
+    with open(app_module.JSON_FILE, encoding="utf-8") as f:
+        assert len(json.load(f)) == 1
+
+    editions = {e["edition"]: e for e in client.get("/api/editions").get_json()["editions"]}
+    assert editions["gamou-2024"]["total"] == 2 and editions["courante"]["total"] == 1
+
+    lines = client.get("/api/export?format=ndjson&edition=gamou-2024").get_data(as_text=True).splitlines()
+    assert [json.loads(line)["utilisateur"] for line in lines] == ["U0", "U1"]
+    assert client.get("/api/export?edition=gamou-1999").status_code == 404
+
+    # L'archive est ouverte en lecture seule par les requêtes historiques
+    with app_module.attached_editions(app_module.DB_FILE, ["gamou-2024"]) as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM ed_0.signalements")
+
+
+def test_archive_migree_a_la_bascule_et_lue_en_lecture_seule(tmp_path):
+    # Caractères réservés des URI dans le chemin: échappés par Path.as_uri()
+    db_file = str(tmp_path / "dossier #1 ?" / "signalements.db")
+    os.makedirs(os.path.dirname(db_file))
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        conn.execute("INSERT INTO signalements (date_heure, ts, utilisateur, type, message) "
+                     "VALUES ('2024-09-10 10:00:00', 1725962400, 'U0', 'Autres', 'm')")
+    conn.close()
+    path = archives.rollover(db_file, "gamou-2024")["path"]
+    with sqlite3.connect(path) as archive:
+        assert archive.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    archive.close()
+
+    before = os.stat(path).st_mtime_ns
+    stats = {s["edition"]: s["total"] for s in archives.editions_stats(db_file)}
+    with archives.attached_editions(db_file, ["gamou-2024"]) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ed_0.signalements").fetchone()[0] == 1
+    assert stats == {"gamou-2024": 1, "courante": 0}
+    # Lectures sans écriture dans l'archive (ni migration, ni fichiers -wal/-shm)
+    assert os.stat(path).st_mtime_ns == before
+    assert sorted(os.listdir(os.path.dirname(path))) == ["signalements-gamou-2024.db"]
+
+
+def test_bascule_ts_manquant_et_id_deja_archive(tmp_path):
+    """--until: ts rattrapé avant la sélection; id déjà archivé avec un autre contenu non supprimé"""
+    db_file = str(tmp_path / "signalements.db")
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        # Écritures hors pipeline: ts absent (date lisible, puis illisible)
+        conn.executemany("INSERT INTO signalements (id, date_heure, ts, utilisateur, type, message) VALUES (?, ?, ?, ?, 'Autres', 'm')",
+                         [(1, "2024-09-10 10:00:00", None, "U1"), (2, "hier", None, "U2"),
+                          (3, "2024-09-11 10:00:00", 1726048800, "U3")])
+    conn.close()
+    path = archives.archive_path(db_file, "gamou-2024")
+    os.makedirs(os.path.dirname(path))
+    archives.migrate_archive(path)
+    with sqlite3.connect(path) as archive:
+        archive.execute("INSERT INTO signalements (id, date_heure, ts, utilisateur, type, message) "
+                        "VALUES (3, '2023-09-01 10:00:00', 1693562400, 'autre', 'Autres', 'm')")
+    archive.close()
+
+    result = archives.rollover(db_file, "gamou-2024", until="2024-12-31 23:59:59")
+    assert (result["moved"], result["conflicts"], result["undated"]) == (1, 1, 1)
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT id, utilisateur FROM signalements ORDER BY id").fetchall() == [(2, "U2"), (3, "U3")]
+    conn.close()
+    with sqlite3.connect(path) as archive:
+        assert archive.execute("SELECT id, utilisateur FROM signalements ORDER BY id").fetchall() == [(1, "U1"), (3, "autre")]
+    archive.close()
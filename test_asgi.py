@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests du point d'entrée ASGI (routes Flask relayées, webhook Telegram natif, envois WhatsApp)
+"""
+
+import asyncio
+import os
+import threading
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import httpx
+
+import app as app_module
+import asgi
+
+
+class _FakeTelegramApp:
+    bot = None
+
+    def __init__(self):
+        self.processed = []
+        self.loops = []
+
+    async def process_update(self, update):
+        await asyncio.sleep(0.01)
+        self.loops.append(asyncio.get_running_loop())
+        self.processed.append(update.update_id)
+
+
+def test_routes_flask_et_webhook_sur_la_meme_boucle(monkeypatch):
+    fake = _FakeTelegramApp()
+    monkeypatch.setattr(app_module, "telegram_app", fake)
+    monkeypatch.setattr(app_module, "TG_WEBHOOK_SECRET", "s3cret")
+    server = asgi.BotASGI(threads=2, warmup=False)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            health = await client.get("/health")
+            forbidden = await client.post("/webhook", json={"update_id": 1})
+            ok = await client.post("/webhook", json={"update_id": 2},
+                                   headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+        await server.shutdown()
+        return health, forbidden, ok, asyncio.get_running_loop()
+
+    health, forbidden, ok, loop = asyncio.run(scenario())
+    assert health.status_code == 200 and health.text == "ok"
+    assert forbidden.status_code == 403
+    # L'update est traité avant la réponse, sur la boucle du serveur
+    assert ok.json() == {"status": "ok"}
+    assert fake.processed == [2] and fake.loops == [loop]
+
+
+def test_envois_whatsapp_non_bloquants_et_ordonnes(monkeypatch):
+    monkeypatch.setattr(app_module, "WA_ACCESS_TOKEN", "token")
+    monkeypatch.setattr(app_module, "WA_PHONE_NUMBER_ID", "1234")
+    sent = []
+
+    async def graph(request):
+        await asyncio.sleep(0.02)
+        sent.append(request.read())
+        return httpx.Response(200, json={"messages": [{"id": "wamid.1"}]})
+
+    server = asgi.BotASGI(threads=2, warmup=False)
+
+    async def scenario():
+        await server.startup()
+        await server._http.aclose()
+        server._http = httpx.AsyncClient(transport=httpx.MockTransport(graph))
+        returned = []
+
+        def handler():
+            # Comme une route Flask exécutée dans le pool
+            app_module._wa_send_message("221770000000", "premier")
+            app_module._wa_send_message("221770000000", "second")
+            returned.append(len(sent))
+
+        thread = threading.Thread(target=handler)
+        thread.start()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        await server.shutdown()
+        return returned
+
+    returned = asyncio.run(scenario())
+    assert returned == [0]
+    assert app_module.WA_SEND_HOOK is None
+    assert [b"premier" in body for body in sent] == [True, False]
+
+
+def _update(update_id, text):
+    message = {"message_id": update_id, "date": 1756548000, "text": text,
+               "chat": {"id": 42, "type": "private"}, "from": {"id": 42, "is_bot": False, "first_name": "U"}}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+def test_webhook_wsgi_updates_dun_chat_dans_l_ordre(monkeypatch):
+    """Deux updates consécutifs d'un chat: le second voit l'état posé par le premier"""
+    from telegram import User
+    from telegram.ext import ApplicationBuilder, CommandHandler, ConversationHandler, MessageHandler, filters
+
+    seen = []
+
+    async def start(update, context):
+        # Réponse envoyée (et reçue par l'utilisateur) avant que l'état ne soit enregistré
+        await asyncio.sleep(0.05)
+        return 1
+
+    async def choix(update, context):
+        seen.append(update.message.text)
+        return ConversationHandler.END
+
+    application = ApplicationBuilder().token("123:ABC").updater(None).build()
+
+    async def get_me(bot, *args, **kwargs):
+        # Pas d'appel réseau à l'initialisation
+        bot._bot_user = User(123, "Bot", True, username="bot")
+        return bot._bot_user
+
+    monkeypatch.setattr(type(application.bot), "get_me", get_me)
+    application.add_handler(ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={1: [MessageHandler(filters.TEXT & ~filters.COMMAND, choix)]},
+        fallbacks=[],
+    ))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(application.initialize(), loop).result(5)
+    monkeypatch.setattr(app_module, "telegram_app", application)
+    monkeypatch.setattr(app_module, "_tg_loop", loop)
+    monkeypatch.setattr(app_module, "TG_WEBHOOK_SECRET", None)
+    try:
+        client = app_module.app.test_client()
+        assert client.post("/webhook", json=_update(1, "/start")).status_code == 200
+        assert client.post("/webhook", json=_update(2, "🗑 Bac plein")).status_code == 200
+        for _ in range(100):
+            if seen:
+                break
+            threading.Event().wait(0.02)
+        assert seen == ["🗑 Bac plein"]
+        assert app_module._tg_chat_locks == {}
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
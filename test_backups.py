@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests des sauvegardes en ligne (API backup, vérification, rétention)
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import backups
+from db_schema import ensure_schema
+
+
+def _seed(path, n):
+    conn = sqlite3.connect(path)
+    ensure_schema(conn)
+    conn.executemany(
+        "INSERT INTO signalements (date_heure, utilisateur, type, message) VALUES (?, ?, ?, ?)",
+        [("2025-08-30 10:00:00", f"U{i}", "🗑 Bac plein", "x" * 200) for i in range(n)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_sauvegarde_verifiee_pendant_les_ecritures(tmp_path):
+    db = str(tmp_path / "signalements.db")
+    _seed(db, 5000)
+    stop = threading.Event()
+    writes = []
+
+    def writer():
+        conn = sqlite3.connect(db, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO signalements (date_heure, utilisateur, type, message) VALUES ('2025-08-30 11:00:00', 'W', 'Autre', '')")
+            conn.commit()
+            writes.append(1)
+            time.sleep(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        path = backups.backup_once(db, str(tmp_path / "backups"), pages=8, sleep_ms=1)
+    finally:
+        stop.set()
+        thread.join()
+
+    # Les écritures ont continué pendant la copie (verrou tenu par pas seulement)
+    assert writes
+    copy = sqlite3.connect(path)
+    assert copy.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert copy.execute("SELECT COUNT(*) FROM signalements WHERE utilisateur != 'W'").fetchone()[0] == 5000
+    copy.close()
+    assert not list((tmp_path / "backups").glob("*.tmp"))
+
+
+def test_sauvegarde_reportee_en_mode_journal(tmp_path, monkeypatch):
+    db = str(tmp_path / "signalements.db")
+    _seed(db, 30000)
+    with sqlite3.connect(db) as conn:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    monkeypatch.setattr(backups, "BACKUP_MAX_RESTARTS", 0)
+    stop, started = threading.Event(), threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(db, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO signalements (date_heure, utilisateur, type, message) VALUES ('2025-08-30 11:00:00', 'W', 'Autre', '')")
+            conn.commit()
+            started.set()
+            time.sleep(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    started.wait(5)
+    try:
+        # Jamais de copie en un seul pas: la sauvegarde est reportée
+        with pytest.raises(backups.BackupBusy):
+            backups.backup_once(db, str(tmp_path / "backups"), pages=1)
+    finally:
+        stop.set()
+        thread.join()
+    assert not list((tmp_path / "backups").glob("*"))
+
+
+def test_rotation_des_sauvegardes(tmp_path, monkeypatch):
+    db = str(tmp_path / "signalements.db")
+    _seed(db, 10)
+    directory = tmp_path / "backups"
+    directory.mkdir()
+    for day in range(1, 5):
+        (directory / f"signalements-2025080{day}-120000.db").write_bytes(b"")
+    monkeypatch.setattr(backups, "BACKUP_DIR", str(directory))
+
+    path = backups.backup_once(db, retention=3)
+
+    names = [b["path"] for b in backups.list_backups(db)]
+    assert names[0] == path
+    assert [n.rsplit("-", 2)[1] for n in names[1:]] == ["20250804", "20250803"]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests du démarrage à froid (webhook Telegram déjà enregistré, préchauffage)
+"""
+
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+
+
+class _FakeBot:
+    def __init__(self):
+        self.url = ""
+        self.set_calls = []
+
+    async def get_webhook_info(self):
+        return SimpleNamespace(url=self.url, pending_update_count=3)
+
+    async def set_webhook(self, url, secret_token=None, drop_pending_updates=None):
+        self.set_calls.append((url, secret_token, drop_pending_updates))
+        self.url = url
+        return True
+
+
+def test_webhook_enregistre_une_seule_fois(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "TG_WEBHOOK_SECRET", "s1")
+    bot = _FakeBot()
+    url = "https://example.org/webhook"
+
+    assert asyncio.run(app_module._ensure_webhook(bot, url)) is True
+    # Redémarrage (ou autre worker): rien à faire, les updates en attente sont conservées
+    assert asyncio.run(app_module._ensure_webhook(bot, url)) is False
+    # Secret changé: getWebhookInfo ne le montre pas, l'empreinte locale oui
+    monkeypatch.setattr(app_module, "TG_WEBHOOK_SECRET", "s2")
+    assert asyncio.run(app_module._ensure_webhook(bot, url)) is True
+    assert bot.set_calls == [(url, "s1", False), (url, "s2", False)]
+
+
+def test_prechauffage_reconstruit_le_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    client = app_module.app.test_client()
+    client.post("/api/signalements/batch", json=[{"Utilisateur": "U", "Type": "🗑 Bac plein", "Message": "Bac plein",
+                                                         "Latitude": 14.1, "Longitude": -16.0}])
+    if os.path.exists(tmp_path / "signalements.json"):
+        os.remove(tmp_path / "signalements.json")
+
+    app_module.warm_caches()
+
+    with open(tmp_path / "signalements.json", encoding="utf-8") as f:
+        assert [item["Utilisateur"] for item in json.load(f)] == ["U"]
+    phases = client.get("/debug/boot").get_json()
+    assert {"imports", "warm_assets", "warm_snapshot", "warm_stats"} <= set(phases)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests de l'export en flux /api/export
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import export
+
+
+def test_export_formats_filtres_gzip(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 2)
+    client = app_module.app.test_client()
+    items = [
+        {"Utilisateur": f"U{i}", "Type": "🗑 Bac plein" if i % 2 else "📍 Dépôt", "Message": f"Message, {i}",
+         "Latitude": 14.1 + i / 100, "Longitude": -16.0, "Date/Heure": f"2025-08-3{i % 2} 10:00:00"}
+        for i in range(5)
+    ]
+    assert client.post("/api/signalements/batch", json=items).status_code == 201
+
+    resp = client.get("/api/export?format=csv")
+    assert resp.is_streamed and resp.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [r["message"] for r in rows] == [f"Message, {i}" for i in range(5)]
+
+    geo = json.loads(client.get("/api/export?format=geojson&type=🗑 Bac plein").get_data())
+    assert [f["properties"]["utilisateur"] for f in geo["features"]] == ["U1", "U3"]
+    assert geo["features"][0]["geometry"]["coordinates"] == [-16.0, 14.11]
+
+    resp = client.get("/api/export?format=ndjson&gzip=1&to=2025-08-30")
+    assert resp.headers["Content-Disposition"].endswith('.ndjson.gz"')
+    lines = gzip.decompress(resp.get_data()).decode("utf-8").splitlines()
+    assert [json.loads(line)["utilisateur"] for line in lines] == ["U0", "U2", "U4"]
+
+    assert client.get("/api/export?format=xml").status_code == 400
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests du générateur de signalements synthétiques
+"""
+
+import sqlite3
+
+from telegram import Update
+
+from generate_signalements import CHANNELS, generate_reports, replay_streams, write_to_db
+
+
+def test_generation_deterministe_et_insertion(tmp_path):
+    """Même seed → mêmes signalements; insertion en masse dans le schéma courant"""
+    first = list(generate_reports(500, seed=7))
+    assert first == list(generate_reports(500, seed=7))
+    assert first != list(generate_reports(500, seed=8))
+    assert [r["date_heure"] for r in first] == sorted(r["date_heure"] for r in first)
+    assert {r["channel"] for r in first} == {c for c, _ in CHANNELS}
+    assert all(14.10 < r["latitude"] < 14.19 and -16.11 < r["longitude"] < -16.04 for r in first)
+
+    db_file = str(tmp_path / "synthetique.db")
+    assert write_to_db(db_file, iter(first), batch_size=64) == 500
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0] == 500
+        kinds = {k for (k,) in conn.execute("SELECT DISTINCT photo_kind FROM signalements")}
+    assert kinds == {None, "photo", "document", "wa_image"}
+
+
+def test_flux_de_rejeu():
+    """Updates Telegram valides et ordonnées; webhooks WhatsApp au format Cloud API"""
+    reports = list(generate_reports(200, seed=3))
+    tg_stream, wa_stream = replay_streams(reports)
+
+    n_telegram = sum(1 for r in reports if r["channel"] == "telegram")
+    locations = [u for u in tg_stream if "location" in u["message"]]
+    assert len(locations) == n_telegram
+    assert [u["update_id"] for u in tg_stream] == list(range(1, len(tg_stream) + 1))
+    dates = [u["message"]["date"] for u in tg_stream]
+    assert dates == sorted(dates)
+    update = Update.de_json(locations[0], None)
+    assert update.message.location is not None
+
+    n_whatsapp = sum(1 for r in reports if r["channel"] == "whatsapp")
+    messages = [p["entry"][0]["changes"][0]["value"]["messages"][0] for p in wa_stream]
+    assert sum(1 for m in messages if m["type"] == "location") == n_whatsapp
+    assert {m["interactive"]["button_reply"]["id"] for m in messages if m["type"] == "interactive"} <= {
+        "TYPE_DEPOT", "TYPE_BAC", "TYPE_AUTRES"}
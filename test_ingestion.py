@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests du pipeline d'écriture groupée (group commit)
+"""
+
+import os
+import sqlite3
+import threading
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import pytest
+
+from dedup import DuplicateIndex
+from ingestion import IngestionService
+
+
+def _record(i, **overrides):
+    record = {
+        "date_heure": "2025-08-30 20:00:00", "utilisateur": f"u{i}", "type": "🗑 Bac plein",
+        "message": f"signalement {i}", "photo_id": None, "photo_kind": None,
+        "latitude": 14.15, "longitude": -16.07, "source": "web",
+    }
+    record.update(overrides)
+    return record
+
+
+def test_producteurs_concurrents_regroupes(tmp_path):
+    """Insertions concurrentes: ids distincts, moins de transactions que d'insertions, écouteur par lot"""
+    db_file = str(tmp_path / "s.db")
+    service = IngestionService(db_file, window_ms=20)
+    batches = []
+    listener = lambda records: batches.append([r["id"] for r in records])  # noqa: E731
+    service.add_listener("snapshot", listener)
+    service.add_listener("snapshot", listener)
+    # Un second écouteur sous le même nom serait ignoré en silence: refusé
+    with pytest.raises(ValueError):
+        service.add_listener("snapshot", lambda records: pytest.fail("écouteur en double"))
+
+    ids = []
+    lock = threading.Lock()
+
+    def producer(p):
+        for i in range(10):
+            row_id = service.insert(_record(p * 100 + i))
+            with lock:
+                ids.append(row_id)
+
+    threads = [threading.Thread(target=producer, args=(p,)) for p in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    service.close()
+
+    assert sorted(ids) == list(range(1, 101))
+    assert sorted(i for batch in batches for i in batch) == sorted(ids)
+    assert service.stats["batches"] == len(batches) < 100
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0] == 100
+
+
+def test_ligne_invalide_isolee_et_groupe_indivisible(tmp_path):
+    """Une ligne rejetée par SQLite n'empêche pas les autres; submit_many reste dans un lot"""
+    service = IngestionService(str(tmp_path / "s.db"), window_ms=1, max_batch=2)
+    batches = []
+    service.add_listener("count", lambda records: batches.append(len(records)))
+    futures = service.submit_many([_record(1), _record(2, utilisateur=None), _record(3), _record(4)])
+    assert futures[0].result(5) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(5)
+    assert [f.result(5) for f in futures[2:]] == [2, 3]
+    service.close()
+    assert batches == [3]
+    assert service.stats["failed"] == 1
+
+
+def test_doublons_spatio_temporels(tmp_path):
+    """Même type à moins du rayon dans la fenêtre: doublon de l'original, confirmations incrémentées"""
+    db_file = str(tmp_path / "s.db")
+    service = IngestionService(db_file, window_ms=1, dedup=DuplicateIndex(radius_m=50, window_s=900))
+    flagged = []
+    service.add_listener("notifications", lambda records: flagged.extend(r["duplicate_of"] for r in records))
+    original = service.insert(_record(1))
+    service.insert(_record(2, latitude=14.1502, date_heure="2025-08-30 20:05:00"))  # ~22 m, +5 min
+    service.insert(_record(3, type="📍 Dépôt"))  # autre type
+    service.insert(_record(4, latitude=14.16))  # ~1,1 km
+    service.insert(_record(5, date_heure="2025-08-30 20:30:00"))  # hors fenêtre
+    service.close()
+
+    assert flagged == [None, original, None, None, None]
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT confirmations FROM signalements WHERE id = ?", (original,)).fetchone()[0] == 1
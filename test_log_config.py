@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests de la journalisation structurée (masquage, JSON, échantillonnage)
+"""
+
+import io
+import json
+import logging
+
+import log_config
+from log_config import SamplingFilter, redact
+
+
+def test_redact_masque_les_secrets():
+    """Tokens, secrets et numéros sont masqués, le reste est conservé"""
+    payload = {
+        "headers": {"X-Telegram-Bot-Api-Secret-Token": "s3cr3t", "Content-Type": "application/json"},
+        "entry": [{"messages": [{"from": "221770000000", "text": {"body": "Bac plein"}}]}],
+        "error": "https://api.telegram.org/bot123456789:AAHdqTcvCH1vGWJxfSeofSAs0K5PALDsaw/getMe",
+    }
+    cleaned = redact(payload)
+    assert cleaned["headers"]["X-Telegram-Bot-Api-Secret-Token"] == "***"
+    assert cleaned["headers"]["Content-Type"] == "application/json"
+    assert cleaned["entry"][0]["messages"][0]["from"] == "221…"
+    assert cleaned["entry"][0]["messages"][0]["text"]["body"] == "Bac plein"
+    assert "AAHdqTcv" not in cleaned["error"]
+
+
+def test_sortie_json_via_listener(monkeypatch):
+    """Les messages passent par la file et sortent en JSON avec les champs extra"""
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_LEVELS", "testsub=DEBUG")
+    stream = io.StringIO()
+    log_config.setup_logging(stream=stream, force=True)
+    try:
+        log_config.get_logger("testsub").debug("bonjour %s", "Medina", extra={"count": 3})
+    finally:
+        log_config.stop_logging()
+        log_config.setup_logging(force=True)
+    entry = json.loads(stream.getvalue().strip().splitlines()[-1])
+    assert entry["msg"] == "bonjour Medina"
+    assert entry["level"] == "DEBUG"
+    assert entry["logger"] == "sonaged.testsub"
+    assert entry["count"] == 3
+
+
+def test_echantillonnage_conserve_les_erreurs():
+    """Le filtre d'échantillonnage ne supprime jamais WARNING et au-dessus"""
+    sampler = SamplingFilter(0.0)
+    info = logging.makeLogRecord({"levelno": logging.INFO})
+    error = logging.makeLogRecord({"levelno": logging.ERROR})
+    assert not sampler.filter(info)
+    assert sampler.filter(error)
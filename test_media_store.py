@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests du stockage local des photos (serveur média factice en local)
+"""
+
+import io
+import json
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+from PIL import Image
+
+import media_store
+from db_schema import ensure_schema
+from media_store import MediaStore
+
+
+def _jpeg_bytes(color="red", size=(800, 600)):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, format="JPEG")
+    return out.getvalue()
+
+
+PHOTO = _jpeg_bytes()
+
+
+class FakeMediaHandler(BaseHTTPRequestHandler):
+    """Imite getFile/file de l'API Telegram et /<media_id> de Graph API"""
+
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        FakeMediaHandler.hits.append(self.path)
+        host = f"http://127.0.0.1:{self.server.server_port}"
+        if self.path.startswith("/botTOKEN/getFile"):
+            payload = {"ok": True, "result": {"file_path": "photos/file_1.jpg"}}
+            self._send(200, json.dumps(payload).encode())
+        elif self.path == "/file/botTOKEN/photos/file_1.jpg":
+            self._send(200, PHOTO, "image/jpeg")
+        elif self.path == "/v20.0/123456":
+            if self.headers.get("Authorization") != "Bearer WA":
+                self._send(401, b"{}")
+                return
+            payload = {"url": f"{host}/wa-cdn/123456", "mime_type": "image/jpeg"}
+            self._send(200, json.dumps(payload).encode())
+        elif self.path == "/wa-cdn/123456":
+            self._send(200, PHOTO, "image/jpeg")
+        else:
+            self._send(404, b"{}")
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeMediaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_ingestion_telegram_et_whatsapp_dedupliquee(tmp_path):
+    """Même contenu via Telegram et WhatsApp → un seul fichier, une miniature"""
+    server, base = _start_server()
+    try:
+        store = MediaStore(
+            str(tmp_path / "media"), str(tmp_path / "s.db"),
+            bot_token="TOKEN", wa_access_token="WA",
+            telegram_api_base=base, wa_graph_base=base,
+        )
+        store.enqueue("AgACfile", "photo")
+        store.enqueue("123456", "wa_image")
+        store.join()
+
+        tg = store.lookup("AgACfile")
+        wa = store.lookup("123456")
+        assert tg and wa and tg["sha256"] == wa["sha256"]
+        assert tg["mime"] == "image/jpeg" and tg["has_thumb"] == 1
+        assert open(store.path_for(tg["sha256"]), "rb").read() == PHOTO
+        with Image.open(store.path_for(tg["sha256"], thumb=True)) as thumb:
+            assert max(thumb.size) <= media_store.MEDIA_THUMB_SIZE
+
+        # Déjà stocké: aucun nouveau téléchargement
+        hits = len(FakeMediaHandler.hits)
+        assert store.ingest("AgACfile", "photo") == tg["sha256"]
+        assert len(FakeMediaHandler.hits) == hits
+
+        # Fichier perdu alors que la ligne media existe: nouveau téléchargement
+        os.remove(store.path_for(tg["sha256"]))
+        assert store.ingest("AgACfile", "photo") == tg["sha256"]
+        assert len(FakeMediaHandler.hits) > hits
+        assert open(store.path_for(tg["sha256"]), "rb").read() == PHOTO
+    finally:
+        server.shutdown()
+
+
+def test_dossier_media_par_defaut_a_cote_de_la_base(tmp_path, monkeypatch):
+    """Sans MEDIA_DIR, les médias vont dans "media" à côté de la base"""
+    monkeypatch.setattr(media_store, "MEDIA_DIR", None)
+    store = media_store.get_media_store(str(tmp_path / "data" / "s.db"))
+    assert store.media_dir == str(tmp_path / "data" / "media")
+
+
+def test_endpoint_media_cache_immuable(tmp_path, monkeypatch):
+    """/media/<hash> sert le fichier avec des en-têtes de cache immuables"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "s.db"))
+    monkeypatch.setattr(media_store, "MEDIA_DIR", str(tmp_path / "media"))
+    store = media_store.get_media_store(app_module.DB_FILE)
+    sha256 = store.store_bytes("AgACx", PHOTO, "image/jpeg")
+
+    client = app_module.app.test_client()
+    resp = client.get(f"/media/{sha256}")
+    assert resp.status_code == 200
+    assert resp.data == PHOTO
+    assert "immutable" in resp.headers["Cache-Control"]
+    assert resp.headers["Content-Type"] == "image/jpeg"
+    assert resp.headers["X-Content-Type-Options"] == "nosniff"
+
+    thumb = client.get(f"/media/{sha256}/thumb")
+    assert thumb.status_code == 200 and len(thumb.data) < len(PHOTO)
+
+    not_modified = client.get(f"/media/{sha256}", headers={"If-None-Match": resp.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert client.get("/media/" + "0" * 64).status_code == 404
+    assert client.get("/media/nothex").status_code == 400
+
+
+def test_endpoint_media_type_et_304_controles(tmp_path, monkeypatch):
+    """Mime hors liste servi en octet-stream; pas de 304 pour un hash inconnu"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "s.db"))
+    monkeypatch.setattr(media_store, "MEDIA_DIR", str(tmp_path / "media"))
+    store = media_store.get_media_store(app_module.DB_FILE)
+    sha256 = store.store_bytes("BQACx", b"<script>alert(1)</script>", "text/html")
+
+    client = app_module.app.test_client()
+    resp = client.get(f"/media/{sha256}")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == "application/octet-stream"
+    assert resp.headers["X-Content-Type-Options"] == "nosniff"
+    unknown = "f" * 64
+    assert client.get(f"/media/{unknown}", headers={"If-None-Match": f'"{unknown}"'}).status_code == 404
+
+
+def test_migration_photo_kind_par_prefixe(tmp_path):
+    """Ancienne base sans photo_kind: préfixes Ag*/BQ* (toutes variantes), media ids WhatsApp, inconnus NULL"""
+    db_file = str(tmp_path / "ancienne.db")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("""CREATE TABLE signalements (id INTEGER PRIMARY KEY AUTOINCREMENT, date_heure TEXT NOT NULL,
+                        utilisateur TEXT NOT NULL, type TEXT NOT NULL, message TEXT NOT NULL, photo_id TEXT,
+                        latitude REAL, longitude REAL)""")
+        conn.executemany(
+            "INSERT INTO signalements (date_heure, utilisateur, type, message, photo_id) VALUES ('2025-08-01 10:00:00', 'u', 'Autres', 'm', ?)",
+            [("AgACAgQ",), ("AgADBAA",), ("BQACAgQ",), ("BQADBAA",), ("123456",), ("CAACAgI",), (None,)],
+        )
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        kinds = [k for (k,) in conn.execute("SELECT photo_kind FROM signalements ORDER BY id")]
+    conn.close()
+    assert kinds == ["photo", "photo", "document", "document", "wa_image", None, None]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests des métriques Prometheus (rendu texte, agrégation multi-workers)
+"""
+
+import json
+import os
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+from metrics import Registry
+
+
+def test_rendu_histogramme_cumulatif():
+    """Les buckets sont cumulés et terminés par +Inf, _count et _sum"""
+    registry = Registry()
+    hist = registry.histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, route="/a")
+    hist.observe(0.5, route="/a")
+    hist.observe(5, route="/a")
+    text = registry.render()
+    assert 't_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 't_seconds_count{route="/a"} 3' in text
+    assert 't_seconds_sum{route="/a"} 5.55' in text
+
+
+def test_agregation_multi_workers(tmp_path):
+    """Compteurs additionnés entre workers; jauges des workers morts ignorées"""
+    registry = Registry()
+    counter = registry.counter("req_total", "test")
+    gauge = registry.gauge("depth", "test")
+    counter.inc(2)
+    gauge.set(3)
+
+    dead_worker = {"pid": 999999999, "metrics": registry.snapshot()}
+    with open(tmp_path / "metrics_999999999.json", "w") as f:
+        json.dump(dead_worker, f)
+
+    text = registry.render(str(tmp_path))
+    assert "req_total 4" in text
+    assert "depth 3" in text
+    assert os.path.exists(tmp_path / f"metrics_{os.getpid()}.json")
+
+
+def test_endpoint_metrics_et_latence_par_route(tmp_path, monkeypatch):
+    """/metrics expose la latence par route Flask et les requêtes SQLite"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "s.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "s.json"))
+    client = app_module.app.test_client()
+    assert client.get("/api/signalements").status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = resp.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/api/signalements",method="GET",status="200"}' in text
+    assert 'sqlite_query_duration_seconds_count{op="SELECT"}' in text
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests du dispatcher de notifications de groupe
+"""
+
+import asyncio
+
+from telegram.error import RetryAfter
+
+from notifications import NotificationDispatcher, parse_chat_ids
+
+
+class FakeBot:
+    """Bot factice qui enregistre les appels et peut simuler des erreurs"""
+
+    def __init__(self, fail_photo=False, retry_after_once=False, fail_digest=False, flood_digest=False):
+        self.calls = []
+        self.fail_photo = fail_photo
+        self.retry_after_once = retry_after_once
+        self.fail_digest = fail_digest
+        self.flood_digest = flood_digest
+
+    async def send_message(self, **kwargs):
+        if self.fail_digest and "NOUVEAUX SIGNALEMENTS" in kwargs["text"]:
+            raise ValueError("message trop long")
+        if self.flood_digest and "NOUVEAUX SIGNALEMENTS" in kwargs["text"]:
+            raise RetryAfter(0)
+        if self.retry_after_once:
+            self.retry_after_once = False
+            raise RetryAfter(0)
+        self.calls.append(("message", kwargs))
+
+    async def send_photo(self, **kwargs):
+        if self.fail_photo:
+            raise ValueError("type de fichier incorrect")
+        self.calls.append(("photo", kwargs))
+
+    async def send_document(self, **kwargs):
+        self.calls.append(("document", kwargs))
+
+
+def _report(i, photo_id=None):
+    return {
+        "date_heure": f"2025-08-25 11:48:{i:02d}",
+        "utilisateur": f"user{i}",
+        "type": "🗑 Bac plein",
+        "message": f"message {i}",
+        "photo_id": photo_id,
+        "latitude": 14.14,
+        "longitude": -16.07,
+    }
+
+
+def test_parse_chat_ids():
+    """GROUP_CHAT_ID en premier, doublons et valeurs invalides ignorés"""
+    assert parse_chat_ids("-100, -200,abc,-100", -300) == [-300, -100, -200]
+    assert parse_chat_ids(None, None) == []
+
+
+def test_envoi_individuel_multi_chats():
+    """Sans rafale, chaque signalement est envoyé à chaque chat"""
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(bot, [-1, -2], digest_window=0.01, digest_min=3)
+        dispatcher.submit(_report(1))
+        await dispatcher.aclose()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert [(kind, kw["chat_id"]) for kind, kw in bot.calls] == [("message", -1), ("message", -2)]
+
+
+def test_digest_en_rafale():
+    """Une rafale de signalements produit un seul message groupé"""
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(bot, [-1], digest_window=0.05, digest_min=3)
+        for i in range(5):
+            dispatcher.submit(_report(i))
+        await dispatcher.aclose()
+        return bot, dispatcher
+
+    bot, dispatcher = asyncio.run(scenario())
+    assert len(bot.calls) == 1
+    assert "5 NOUVEAUX SIGNALEMENTS" in bot.calls[0][1]["text"]
+    assert dispatcher.digests == 1 and dispatcher.sent == 5
+
+
+def test_digest_refuse_repli_individuel():
+    """Un digest refusé n'est pas compté en échec: chaque signalement part seul, compté une fois"""
+    async def scenario():
+        bot = FakeBot(fail_digest=True)
+        dispatcher = NotificationDispatcher(bot, [-1], digest_window=0.05, digest_min=3)
+        for i in range(4):
+            dispatcher.submit(_report(i))
+        await dispatcher.aclose()
+        return bot, dispatcher
+
+    bot, dispatcher = asyncio.run(scenario())
+    assert [kw["text"].splitlines()[0] for _, kw in bot.calls] == ["🚨 NOUVEAU SIGNALEMENT"] * 4
+    assert dispatcher.digests == 0 and dispatcher.failed == 0 and dispatcher.sent == 4
+
+
+def test_digest_flood_control_sans_repli():
+    """RetryAfter persistant sur le digest: pas de rafale d'envois individuels"""
+    async def scenario():
+        bot = FakeBot(flood_digest=True)
+        dispatcher = NotificationDispatcher(bot, [-1], digest_window=0.05, digest_min=3, max_retries=1)
+        for i in range(4):
+            dispatcher.submit(_report(i))
+        await dispatcher.aclose()
+        return bot, dispatcher
+
+    bot, dispatcher = asyncio.run(scenario())
+    assert bot.calls == []
+    assert dispatcher.failed == 4 and dispatcher.sent == 0
+
+
+def test_erreur_d_un_chat_n_arrete_pas_les_suivants():
+    """Une exception pour un chat n'empêche pas l'envoi aux autres"""
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(bot, [-1, -2], digest_min=0)
+        deliver = dispatcher._deliver
+
+        async def failing_deliver(chat_id, batch):
+            if chat_id == -1:
+                raise RuntimeError("chat indisponible")
+            await deliver(chat_id, batch)
+
+        dispatcher._deliver = failing_deliver
+        dispatcher.submit(_report(1))
+        await dispatcher.aclose()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert [kw["chat_id"] for _, kw in bot.calls] == [-2]
+
+
+def test_fallback_document_et_retry_after():
+    """Photo refusée → document; RetryAfter → nouvel essai"""
+    async def scenario():
+        bot = FakeBot(fail_photo=True, retry_after_once=True)
+        dispatcher = NotificationDispatcher(bot, [-1], digest_min=0)
+        dispatcher.submit(_report(1, photo_id="BQAD"))
+        dispatcher.submit(_report(2))
+        await dispatcher.aclose()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert [kind for kind, _ in bot.calls] == ["document", "message"]
+
+
+def test_type_media_connu_evite_le_fallback():
+    """photo_kind='document' → send_document direct; le file_id validé est mémorisé"""
+    async def scenario():
+        bot = FakeBot(fail_photo=True)
+        dispatcher = NotificationDispatcher(bot, [-1], digest_min=0)
+        dispatcher.submit({**_report(1, photo_id="BQAD"), "photo_kind": "document"})
+        dispatcher.submit({**_report(2, photo_id="AgAC")})
+        dispatcher.submit({**_report(3, photo_id="AgAC")})
+        await dispatcher.aclose()
+        return bot, dispatcher
+
+    bot, dispatcher = asyncio.run(scenario())
+    assert [kind for kind, _ in bot.calls] == ["document", "document", "document"]
+    counters = dispatcher.stats()["media"]
+    assert counters["document"] == 3
+    assert counters["fallback"] == 1
+    assert counters["cache_hits"] == 1
+    assert dispatcher.fallback_rate() == round(1 / 3, 4)
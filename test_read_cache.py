@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests du cache des modèles de lecture (invalidation par PRAGMA data_version)
+"""
+
+import os
+import shutil
+import sqlite3
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import read_cache
+
+
+def _insert_from_other_worker(db_file, user):
+    # Connexion indépendante, comme un autre worker gunicorn ou un script
+    with sqlite3.connect(db_file) as conn:
+        conn.execute(
+            "INSERT INTO signalements (date_heure, utilisateur, type, message, latitude, longitude) VALUES (?, ?, ?, ?, ?, ?)",
+            ("2025-08-31 12:00:00", user, "🗑 Bac plein", "Bac plein", 14.1, -16.0),
+        )
+    conn.close()
+
+
+def test_cache_invalide_par_une_ecriture_externe(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    client = app_module.app.test_client()
+    client.post("/api/signalements/batch", json=[{"Utilisateur": "U1", "Type": "🗑 Bac plein", "Message": "Bac",
+                                                         "Latitude": 14.1, "Longitude": -16.0}])
+
+    for _ in range(3):
+        assert [s["Utilisateur"] for s in client.get("/signalements.json").get_json()] == ["U1"]
+        assert client.get("/api/stats").get_json()["total"] == 1
+    summary = client.get("/debug/read-cache").get_json()
+    assert (summary["report_list"]["hits"], summary["report_list"]["misses"]) == (2, 1)
+    assert (summary["stats"]["hits"], summary["stats"]["misses"]) == (2, 1)
+
+    _insert_from_other_worker(app_module.DB_FILE, "U2")
+    assert {s["Utilisateur"] for s in client.get("/api/admin/signalements").get_json()} == {"U1", "U2"}
+    assert client.get("/api/stats").get_json()["total"] == 2
+    assert 'read_cache_requests_total{cache="stats",result="hit"}' in client.get("/metrics").get_data(as_text=True)
+
+
+def test_fichier_remplace_rouvre_la_connexion(tmp_path):
+    db_file = str(tmp_path / "signalements.db")
+    with sqlite3.connect(db_file) as conn:
+        app_module.ensure_schema(conn)
+    # Base en WAL: fermeture (point de contrôle) avant la copie du fichier
+    conn.close()
+    restored = shutil.copy(db_file, str(tmp_path / "restore.db"))
+    _insert_from_other_worker(restored, "U1")
+    cache = read_cache.ReadCache(db_file, enabled=True)
+
+    def count(previous):
+        with sqlite3.connect(db_file) as conn:
+            return conn.execute("SELECT COUNT(*) FROM signalements").fetchone()[0]
+
+    assert cache.get("count", count) == 0
+    # Restauration d'une sauvegarde: nouveau fichier, data_version d'une autre connexion
+    os.replace(restored, db_file)
+    assert cache.get("count", count) == 1
+    assert cache.get("count", count) == 1
+    assert cache.summary()["count"]["misses"] == 2
+    cache.watch.close()
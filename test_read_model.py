@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests du modèle de lecture en colonnes (rafraîchissement incrémental, stats, bbox)
+"""
+
+import os
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import read_model
+
+
+def _item(i, **overrides):
+    item = {"Utilisateur": f"U{i}", "Type": "🗑 Bac plein", "Message": f"Message {i}",
+            "Latitude": 14.10 + i / 100, "Longitude": -16.0, "Date/Heure": f"2025-08-3{i % 2} 10:00:0{i}"}
+    item.update(overrides)
+    return item
+
+
+def test_modele_incremental_et_requetes(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    client = app_module.app.test_client()
+    client.post("/api/signalements/batch", json=[_item(i) for i in range(4)])
+    model = app_module._read_model()
+    assert len(model) == 4
+    # Même forme que la lecture en dicts depuis la base
+    expected = app_module.read_signalements_from_db()
+    assert model.dicts(range(len(model))) == expected
+
+    ids = [item["id"] for item in client.get("/api/signalements").get_json()]
+    client.post("/api/signalements/delete", json={"ids": [min(ids)]})
+    client.post("/api/signalements/batch", json=[_item(5, Type="📍 Dépôt", Longitude=-16.5)])
+    stats = client.get("/api/stats").get_json()
+    # La vue prise avant les écritures garde ses positions
+    assert model.dicts(range(len(model))) == expected
+    assert len(read_model.get_read_model(app_module.DB_FILE)) == 4
+    assert stats["total"] == 4
+    assert stats["by_type"] == {"🗑 Bac plein": 3, "📍 Dépôt": 1}
+    assert stats["by_day"] == {"2025-08-30": 1, "2025-08-31": 3}
+    assert [e["Utilisateur"] for e in stats["latest"]] == ["U5", "U3", "U1", "U2"]
+
+    resp = client.get("/api/signalements?bbox=-16.1,14.105,-15.9,14.2")
+    assert [e["Utilisateur"] for e in resp.get_json()] == ["U3", "U1", "U2"]
+    assert client.get("/api/signalements?bbox=1,2,3").status_code == 400
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests des horodatages UTC (colonne ts, fuseau APP_TIMEZONE, migration)
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import report_time
+from db_schema import ensure_schema
+
+
+def test_ts_ecrit_migre_et_utilise(tmp_path, monkeypatch):
+    # UTC+1 sans heure d'été: minuit local tombe la veille en UTC
+    monkeypatch.setattr(report_time, "APP_TZ", report_time._load_zone("Africa/Lagos"))
+    utc = lambda text: int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp())
+    assert report_time.parse_local("2025-08-30 00:30:00") == utc("2025-08-29 23:30:00")
+    assert report_time.parse_local("pas une date") is None
+
+    db_file = str(tmp_path / "signalements.db")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("""CREATE TABLE signalements (id INTEGER PRIMARY KEY AUTOINCREMENT, date_heure TEXT NOT NULL,
+                        utilisateur TEXT NOT NULL, type TEXT NOT NULL, message TEXT NOT NULL,
+                        latitude REAL, longitude REAL)""")
+        conn.executemany(
+            "INSERT INTO signalements (date_heure, utilisateur, type, message) VALUES (?, 'ancien', 'Dépôt', 'm')",
+            [("2025-08-29 23:00:00",), ("30/08/2025",)],
+        )
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        assert conn.execute("SELECT ts FROM signalements ORDER BY id").fetchall() == [(utc("2025-08-29 22:00:00"),), (None,)]
+
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    client = app_module.app.test_client()
+    client.post("/api/signalements/batch", json=[{"Utilisateur": "nuit", "Type": "🗑 Bac plein", "Message": "Bac",
+                                                         "Latitude": 14.1, "Longitude": -16.0,
+                                                         "Date/Heure": "2025-08-30 00:30:00"}])
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT ts FROM signalements WHERE utilisateur = 'nuit'").fetchone()[0] == utc("2025-08-29 23:30:00")
+
+    stats = client.get("/api/stats").get_json()
+    # Jours locaux; la date illisible garde son texte
+    assert stats["by_day"] == {"2025-08-29": 1, "2025-08-30": 1, "30/08/2025": 1}
+    assert [e["Date/Heure"] for e in stats["latest"]] == ["2025-08-30 00:30:00", "2025-08-29 23:00:00", "30/08/2025"]
+    body = client.get("/api/export?format=ndjson&from=2025-08-30&to=2025-08-30").get_data(as_text=True)
+    assert [json.loads(line)["utilisateur"] for line in body.splitlines()] == ["nuit"]
+
+
+def test_migration_une_fois_par_fichier(tmp_path, monkeypatch):
+    import db_schema
+
+    calls = []
+    monkeypatch.setattr(db_schema, "backfill_timestamps", lambda conn: calls.append(conn) or 0)
+    db_file = str(tmp_path / "signalements.db")
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        # Date illisible: ts reste NULL, sans nouveau balayage aux ouvertures suivantes
+        conn.execute("INSERT INTO signalements (date_heure, utilisateur, type, message) VALUES ('hier', 'u', 'Autres', 'm')")
+        conn.commit()
+    for _ in range(3):
+        with sqlite3.connect(db_file) as conn:
+            ensure_schema(conn)
+    assert calls == []
+
+    # Fichier remplacé (restauration): nouvelle migration
+    conn.close()
+    os.replace(shutil.copy(db_file, str(tmp_path / "restore.db")), db_file)
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+    conn.close()
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests de la recherche plein texte /api/search (FTS5)
+"""
+
+import os
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DB_FILE", str(tmp_path / "signalements.db"))
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    items = [
+        {"Utilisateur": "Awa", "Type": "📍 Dépôt", "Message": "Dépôt sauvage près de la Mosquée", "Latitude": 14.15, "Longitude": -16.07,
+         "Date/Heure": "2025-08-30 10:00:00"},
+        {"Utilisateur": "Modou", "Type": "🗑 Bac plein", "Message": "Bac plein <script>alert(1)</script> mosquée", "Latitude": 14.2, "Longitude": -16.1,
+         "Date/Heure": "2025-08-31 10:00:00"},
+        {"Utilisateur": "Fatou", "Type": "🔹 Autres", "Message": "Caniveau bouché", "Latitude": 14.3, "Longitude": -16.2},
+    ]
+    test_client = app_module.app.test_client()
+    assert test_client.post("/api/signalements/batch", json=items).status_code == 201
+    return test_client
+
+
+def test_recherche_sans_accents_filtres_extraits(client):
+    body = client.get("/api/search?q=mosquee").get_json()
+    assert {r["Utilisateur"] for r in body["results"]} == {"Awa", "Modou"}
+    extrait = next(r["Extrait"] for r in body["results"] if r["Utilisateur"] == "Modou")
+    assert "<mark>mosquée</mark>" in extrait and "<script>" not in extrait
+
+    assert [r["Utilisateur"] for r in client.get("/api/search?q=mosq&type=📍 Dépôt").get_json()["results"]] == ["Awa"]
+    assert [r["Utilisateur"] for r in client.get("/api/search?q=mosquee&from=2025-08-31").get_json()["results"]] == ["Modou"]
+    page = client.get("/api/search?q=mosquee&per_page=1").get_json()
+    assert len(page["results"]) == 1 and page["has_more"] is True
+
+
+def test_index_suit_les_suppressions(client):
+    ids = [r["id"] for r in client.get("/api/search?q=caniveau").get_json()["results"]]
+    assert len(ids) == 1
+    client.post("/api/signalements/delete", json={"ids": ids})
+    assert client.get("/api/search?q=caniveau").get_json()["results"] == []
+    assert client.get('/api/search?q=" OR *').status_code == 200
+    assert client.get("/api/search").status_code == 400
+
+
+def test_limite_de_candidats_signalee(client, monkeypatch):
+    """Au-delà de SEARCH_CANDIDATES: truncated, has_more juste sur les résultats classés"""
+    import search
+
+    monkeypatch.setattr(search, "SEARCH_CANDIDATES", 1)
+    body = client.get("/api/search?q=mosquee").get_json()
+    assert [r["Utilisateur"] for r in body["results"]] == ["Modou"]
+    assert body["truncated"] is True and body["has_more"] is False
+    assert client.get("/api/search?q=mosquee&page=2").get_json()["truncated"] is True
+    assert client.get("/api/search?q=caniveau").get_json()["truncated"] is False
+
+
+def test_dates_invalides_recherche_et_export(client):
+    for url in ("/api/search?q=mosquee&from=31/08/2025", "/api/export?to=2025-13-01"):
+        resp = client.get(url)
+        assert resp.status_code == 400
+        assert "AAAA-MM-JJ" in resp.get_json()["message"]
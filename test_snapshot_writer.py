@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests de l'écrivain du snapshot JSON (mise à jour par différence, regroupement, désynchronisation)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from types import SimpleNamespace
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import gamousonagedbot
+from ingestion import IngestionService
+from snapshot_writer import SnapshotWriter
+
+
+def _record(user, date_heure, lat=14.0):
+    return {"date_heure": date_heure, "utilisateur": user, "type": "📍 Dépôt", "message": "m",
+            "latitude": lat, "longitude": -16.0}
+
+
+def test_snapshot_par_difference(tmp_path):
+    db_file, json_file = str(tmp_path / "s.db"), str(tmp_path / "s.json")
+    service = IngestionService(db_file)
+    full_reads = []
+
+    def load_all():
+        full_reads.append(1)
+        with sqlite3.connect(db_file) as conn:
+            return [{"id": row[0], "Date/Heure": row[1], "Utilisateur": row[2], "Type": "📍 Dépôt", "Message": "m",
+                     "Photo": None, "Media": None, "Latitude": 14.0, "Longitude": -16.0,
+                     "Confirmations": row[3], "DoublonDe": None}
+                    for row in conn.execute("SELECT id, date_heure, utilisateur, confirmations FROM signalements "
+                                            "ORDER BY ts DESC, id DESC")]
+
+    writer = SnapshotWriter(db_file, json_file, load_all, coalesce_ms=50)
+    service.add_listener("snapshot", writer.add)
+    try:
+        service.insert(_record("a", "2025-08-30 10:00:00"))
+        assert writer.flush(5) and len(full_reads) == 1
+        # Lots suivants: sans relecture, écrits ensemble; antidaté trié, doublon confirmé
+        futures = service.submit_many([_record("b", "2025-08-30 10:05:00", lat=15.0)])
+        futures += service.submit_many([_record("c", "2025-08-30 09:00:00", lat=16.0), _record("a2", "2025-08-30 10:01:00")])
+        [future.result(5) for future in futures]
+        assert writer.flush(5)
+        with open(json_file, encoding="utf-8") as f:
+            data = json.load(f)
+        assert [e["Utilisateur"] for e in data] == ["b", "a2", "a", "c"]
+        assert data[2]["Confirmations"] == 1 and data[1]["DoublonDe"] == data[2]["id"]
+        assert len(full_reads) == 1 and writer.stats["writes"] <= 3
+
+        # Écriture d'un autre processus: détectée par la version des ids, relecture complète
+        with sqlite3.connect(db_file) as conn:
+            conn.execute("DELETE FROM signalements WHERE utilisateur = 'c'")
+        service.insert(_record("d", "2025-08-30 13:00:00", lat=17.0))
+        assert writer.flush(5) and len(full_reads) == 2
+        with open(json_file, encoding="utf-8") as f:
+            assert [e["Utilisateur"] for e in json.load(f)] == ["d", "b", "a2", "a"]
+    finally:
+        service.close()
+
+
+def test_api_et_bot_partagent_les_ecouteurs(tmp_path, monkeypatch):
+    """Un seul snapshot et un seul écouteur média par base, réenregistrements sans effet"""
+    for module in (app_module, gamousonagedbot):
+        monkeypatch.setattr(module, "DB_FILE", str(tmp_path / "signalements.db"))
+        monkeypatch.setattr(module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    service = app_module._ingestion()
+    assert gamousonagedbot._ingestion() is service
+    assert app_module._snapshot_writer() is gamousonagedbot._snapshot_writer()
+
+    application = SimpleNamespace(bot=None, bot_data={})
+
+    async def each_report():
+        for _ in range(2):
+            gamousonagedbot._register_notifications(service, application)
+
+    asyncio.run(each_report())
+    assert set(service._listeners) == {"snapshot", "media", "telegram_notifications"}
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests des assets statiques versionnés et des en-têtes de cache des pages
+"""
+
+import os
+import re
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+from static_assets import HTML_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL
+
+
+def test_page_carte_reecrite_et_asset_immuable():
+    """La carte référence des assets versionnés servis avec un cache d'un an; le CSS pointe vers des images versionnées"""
+    client = app_module.app.test_client()
+    resp = client.get("/carte")
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"] == HTML_CACHE_CONTROL
+    html = resp.get_data(as_text=True)
+    assert "unpkg.com" not in html and "githubusercontent" not in html
+
+    script = re.search(r'src="(/static/vendor/leaflet-1\.9\.3/leaflet\.[0-9a-f]{10}\.js)"', html).group(1)
+    assert f"<{script}>; rel=preload; as=script" in resp.headers["Link"]
+
+    asset = client.get(script, headers={"Accept-Encoding": "gzip"})
+    assert asset.status_code == 200
+    assert asset.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert asset.headers["Content-Encoding"] == "gzip"
+
+    css_url = re.search(r'href="(/static/vendor/leaflet-1\.9\.3/leaflet\.[0-9a-f]{10}\.css)"', html).group(1)
+    css = client.get(css_url).get_data(as_text=True)
+    assert re.search(r"url\(images/layers\.[0-9a-f]{10}\.png\)", css)
+
+    assert client.get("/static/vendor/inconnu.js").status_code == 404
+
+
+def test_page_revalidee_par_etag():
+    client = app_module.app.test_client()
+    etag = client.get("/dashboard").headers["ETag"]
+    resp = client.get("/dashboard", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["Cache-Control"] == HTML_CACHE_CONTROL
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests des zones (registre GeoJSON, index en grille, rattachement et filtres)
+"""
+
+import json
+import os
+import sqlite3
+
+os.environ.setdefault("START_TG_ON_BOOT", "0")
+
+import app as app_module
+import zones
+from db_schema import run_backfills
+
+
+def _square(zone_id, lon, lat, size, hole=None):
+    rings = [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+    if hole:
+        h_lon, h_lat, h_size = hole
+        rings.append([[h_lon, h_lat], [h_lon + h_size, h_lat], [h_lon + h_size, h_lat + h_size], [h_lon, h_lat + h_size]])
+    return {"type": "Feature", "properties": {"id": zone_id, "name": zone_id.title()},
+            "geometry": {"type": "Polygon", "coordinates": rings}}
+
+
+def _write(path, features):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+def test_zones_rattachement_et_filtres(tmp_path, monkeypatch):
+    zones_file = str(tmp_path / "zones.geojson")
+    # Ouest avec un trou (la mosquée), est adjacent
+    _write(zones_file, [_square("ouest", -16.10, 14.10, 0.05, hole=(-16.08, 14.12, 0.01)),
+                        _square("est", -16.05, 14.10, 0.05)])
+    monkeypatch.setattr(zones, "ZONES_FILE", zones_file)
+    index = zones.get_zones()
+    assert index.locate(14.11, -16.09) == "ouest"
+    assert index.locate(14.125, -16.075) is None  # dans le trou
+    assert index.locate(14.11, -16.01) == "est"
+    assert index.locate(14.5, -16.09) is None and index.locate(None, None) is None
+
+    db_file = str(tmp_path / "signalements.db")
+    monkeypatch.setattr(app_module, "DB_FILE", db_file)
+    monkeypatch.setattr(app_module, "JSON_FILE", str(tmp_path / "signalements.json"))
+    client = app_module.app.test_client()
+    client.post("/api/signalements/batch", json=[
+        {"Utilisateur": f"u{i}", "Type": "📍 Dépôt", "Message": "m", "Latitude": lat, "Longitude": lon,
+         "Date/Heure": "2025-08-30 10:00:00"}
+        for i, (lat, lon) in enumerate([(14.11, -16.09), (14.14, -16.09), (14.11, -16.01), (14.5, -16.0)])
+    ])
+    with sqlite3.connect(db_file) as conn:
+        assert [r[0] for r in conn.execute("SELECT zone_id FROM signalements ORDER BY id")] == ["ouest", "ouest", "est", None]
+        # Écriture hors pipeline: rattachée par la maintenance (python zones.py backfill)
+        conn.execute("INSERT INTO signalements (date_heure, utilisateur, type, message, latitude, longitude) "
+                     "VALUES ('2025-08-30 11:00:00', 'externe', 'Autres', 'm', 14.12, -16.02)")
+        run_backfills(conn)
+
+    stats = client.get("/api/stats").get_json()
+    assert stats["by_zone"] == {"ouest": 2, "est": 2}
+    est = client.get("/api/stats?zone=est").get_json()
+    assert est["total"] == 2 and [e["Utilisateur"] for e in est["latest"]] == ["externe", "u2"]
+    assert [e["Utilisateur"] for e in client.get("/api/signalements?zone=ouest").get_json()] == ["u1", "u0"]
+    assert client.get("/api/stats?zone=nord").status_code == 404
+    counts = {f["id"]: f["properties"]["count"] for f in client.get("/api/zones").get_json()["features"]}
+    assert counts == {"ouest": 2, "est": 2}
+
+    # Nouveau registre: tout est rattaché à nouveau, le modèle de lecture rechargé
+    _write(zones_file, [_square("tout", -16.2, 14.0, 0.6)])
+    os.utime(zones_file, ns=(1, 1))
+    with sqlite3.connect(db_file) as conn:
+        run_backfills(conn)
+        assert conn.execute("SELECT COUNT(*) FROM signalements WHERE zone_id = 'tout'").fetchone()[0] == 5
+    assert client.get("/api/stats").get_json()["by_zone"] == {"tout": 5}
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Vendoring des bibliothèques front (Leaflet, Chart.js) dans ./static/vendor
+
+Les fichiers sont téléchargés à des versions figées, vérifiés par SHA-256 et
+versionnés dans le dépôt: les pages ne dépendent plus d'unpkg, jsDelivr ni de
+raw.githubusercontent.com. Les marqueurs colorés (rouge/vert/bleu) sont
+générés localement à partir du marqueur Leaflet par rotation de teinte.
+
+Usage:
+    python vendor_static.py            # télécharge les fichiers manquants, génère les marqueurs
+    python vendor_static.py --check    # vérifie seulement les empreintes
+
+Pour monter de version: changer les URL, supprimer les anciens fichiers,
+relancer le script et mettre à jour les empreintes affichées.
+"""
+
+import argparse
+import colorsys
+import hashlib
+import io
+import os
+import sys
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "vendor")
+
+LEAFLET = "leaflet-1.9.3"
+CHARTJS = "chart.js-4.4.0"
+
+# (chemin local, URL, sha256)
+VENDORED = [
+    (f"{LEAFLET}/leaflet.js", "https://unpkg.com/leaflet@1.9.3/dist/leaflet.js",
+     "5819285cec137b229c94e1ee5ad73e8b6b84345a4367d60f75fe477fe0fb7b03"),
+    (f"{LEAFLET}/leaflet.css", "https://unpkg.com/leaflet@1.9.3/dist/leaflet.css",
+     "90b693d86392a4779c861b28cf307e7e59c3fb35328c4d8b95f58f814d38c722"),
+    (f"{LEAFLET}/images/layers.png", "https://unpkg.com/leaflet@1.9.3/dist/images/layers.png",
+     "1dbbe9d028e292f36fcba8f8b3a28d5e8932754fc2215b9ac69e4cdecf5107c6"),
+    (f"{LEAFLET}/images/layers-2x.png", "https://unpkg.com/leaflet@1.9.3/dist/images/layers-2x.png",
+     "066daca850d8ffbef007af00b06eac0015728dee279c51f3cb6c716df7c42edf"),
+    (f"{LEAFLET}/images/marker-icon.png", "https://unpkg.com/leaflet@1.9.3/dist/images/marker-icon.png",
+     "574c3a5cca85f4114085b6841596d62f00d7c892c7b03f28cbfa301deb1dc437"),
+    (f"{LEAFLET}/images/marker-icon-2x.png", "https://unpkg.com/leaflet@1.9.3/dist/images/marker-icon-2x.png",
+     "00179c4c1ee830d3a108412ae0d294f55776cfeb085c60129a39aa6fc4ae2528"),
+    (f"{LEAFLET}/images/marker-shadow.png", "https://unpkg.com/leaflet@1.9.3/dist/images/marker-shadow.png",
+     "264f5c640339f042dd729062cfc04c17f8ea0f29882b538e3848ed8f10edb4da"),
+    (f"{CHARTJS}/chart.umd.js", "https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.js",
+     "db65ba70511147e08494c38a46030c89cb9e3153f455fec50440581fc67cb429"),
+]
+
+# Teintes des marqueurs colorés (degrés); le marqueur Leaflet d'origine est bleu
+MARKER_HUES = {"red": 0, "green": 120, "blue": None}
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def download(check_only: bool = False) -> bool:
+    ok = True
+    for rel_path, url, expected in VENDORED:
+        path = os.path.join(VENDOR_DIR, rel_path)
+        if not os.path.exists(path):
+            if check_only:
+                print(f"❌ Manquant: {rel_path}")
+                ok = False
+                continue
+            print(f"⬇️  {url}")
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(response.content)
+        digest = _sha256(path)
+        if expected and digest != expected:
+            print(f"❌ Empreinte inattendue pour {rel_path}: {digest}")
+            ok = False
+        else:
+            print(f"✅ {rel_path} {digest[:16]}…")
+    return ok
+
+
+def _shift_hue(img: "Image.Image", hue_degrees: float) -> "Image.Image":
+    img = img.convert("RGBA")
+    pixels = img.load()
+    target = hue_degrees / 360
+    for y in range(img.height):
+        for x in range(img.width):
+            r, g, b, a = pixels[x, y]
+            h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+            if s < 0.25:  # contour blanc / gris inchangé
+                continue
+            r2, g2, b2 = colorsys.hsv_to_rgb(target, s, v)
+            pixels[x, y] = (round(r2 * 255), round(g2 * 255), round(b2 * 255), a)
+    return img
+
+
+def generate_markers() -> None:
+    if Image is None:
+        print("⚠️ Pillow absent: marqueurs colorés non générés")
+        return
+    out_dir = os.path.join(VENDOR_DIR, "markers")
+    os.makedirs(out_dir, exist_ok=True)
+    for suffix in ("", "-2x"):
+        source = os.path.join(VENDOR_DIR, LEAFLET, "images", f"marker-icon{suffix}.png")
+        with Image.open(source) as base:
+            for color, hue in MARKER_HUES.items():
+                img = base.convert("RGBA") if hue is None else _shift_hue(base, hue)
+                out = io.BytesIO()
+                img.save(out, format="PNG", optimize=True)
+                path = os.path.join(out_dir, f"marker-icon{suffix}-{color}.png")
+                with open(path, "wb") as f:
+                    f.write(out.getvalue())
+                print(f"🎨 {os.path.relpath(path, VENDOR_DIR)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vendoring des assets front")
+    parser.add_argument("--check", action="store_true", help="vérifier sans télécharger")
+    args = parser.parse_args()
+    ok = download(check_only=args.check)
+    if not args.check:
+        generate_markers()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,10 @@
 Point d'entrée WSGI pour Railway
 """
 
-from app import app
+from app import app, start_warmup
+
+# Caches préchauffés en arrière-plan: le healthcheck n'attend pas
+start_warmup()
 
 if __name__ == "__main__":
-    app.run() 
\ No newline at end of file
+    app.run()
@@ -0,0 +1,247 @@
+"""
+Zones (quartiers / secteurs de Medina Baye) et rattachement des signalements.
+
+Registre chargé depuis un GeoJSON local: FeatureCollection de Polygon ou
+MultiPolygon (trous compris), identifiant properties.id, sinon l'id de la
+feature, sinon properties.name. Les zones sont indexées dans une grille
+régulière sur leur emprise: une recherche ne teste que les polygones dont la
+boîte englobante couvre la cellule du point (premier polygone contenant le
+point, dans l'ordre du fichier).
+
+Chaque signalement reçoit `zone_id` à l'insertion (pipeline d'ingestion).
+Les lignes anciennes ou écrites hors pipeline sont rattachées à la première
+ouverture de la base par le processus ou par `python zones.py backfill`
+(zone_state.tagged_max_id); un changement du fichier de zones (empreinte
+SHA-256) provoque alors un nouveau rattachement complet. Sans fichier,
+aucun rattachement (zone_id NULL).
+
+Variables d'environnement:
+    ZONES_FILE=./zones.geojson   registre des zones
+    ZONES_GRID=64                cellules de la grille par côté
+
+Rattachement manuel: python zones.py backfill [--db signalements.db]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from log_config import get_logger
+
+log = get_logger("db")
+
+ZONES_FILE = os.getenv("ZONES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "zones.geojson"))
+ZONES_GRID = int(os.getenv("ZONES_GRID", "64"))
+
+Ring = List[Tuple[float, float]]
+
+
+class Zone(NamedTuple):
+    id: str
+    name: str
+    bbox: Tuple[float, float, float, float]  # min_lon, min_lat, max_lon, max_lat
+    polygons: List[List[Ring]]  # par polygone: anneau extérieur puis trous
+    geometry: Dict[str, Any]
+
+
+def _in_ring(lon: float, lat: float, ring: Ring) -> bool:
+    """Lancer de rayon (règle pair-impair)."""
+    inside = False
+    prev_lon, prev_lat = ring[-1]
+    for cur_lon, cur_lat in ring:
+        if (cur_lat > lat) != (prev_lat > lat) and \
+                lon < (prev_lon - cur_lon) * (lat - cur_lat) / (prev_lat - cur_lat) + cur_lon:
+            inside = not inside
+        prev_lon, prev_lat = cur_lon, cur_lat
+    return inside
+
+
+def _contains(zone: Zone, lon: float, lat: float) -> bool:
+    min_lon, min_lat, max_lon, max_lat = zone.bbox
+    if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+        return False
+    return any(_in_ring(lon, lat, rings[0]) and not any(_in_ring(lon, lat, hole) for hole in rings[1:])
+               for rings in zone.polygons)
+
+
+def _parse_feature(feature: Dict[str, Any]) -> Optional[Zone]:
+    props = feature.get("properties") or {}
+    geometry = feature.get("geometry") or {}
+    zone_id = props.get("id") or feature.get("id") or props.get("name")
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        polygons = []
+    polygons = [[[(float(p[0]), float(p[1])) for p in ring] for ring in rings if len(ring) >= 3] for rings in polygons]
+    polygons = [rings for rings in polygons if rings]
+    if zone_id is None or not polygons:
+        return None
+    points = [p for rings in polygons for p in rings[0]]
+    bbox = (min(p[0] for p in points), min(p[1] for p in points), max(p[0] for p in points), max(p[1] for p in points))
+    return Zone(str(zone_id), str(props.get("name") or zone_id), bbox, polygons, geometry)
+
+
+class ZoneIndex:
+    """Zones indexées en grille: locate(lat, lon) -> zone_id ou None."""
+
+    def __init__(self, zones: List[Zone], grid: int = ZONES_GRID, fingerprint: str = "") -> None:
+        self.zones = zones
+        self.fingerprint = fingerprint
+        self.by_id = {zone.id: zone for zone in zones}
+        self.grid = max(1, grid)
+        self._cells: List[Tuple[int, ...]] = []
+        if not zones:
+            return
+        self.extent = (min(z.bbox[0] for z in zones), min(z.bbox[1] for z in zones),
+                       max(z.bbox[2] for z in zones), max(z.bbox[3] for z in zones))
+        self._cell_w = (self.extent[2] - self.extent[0]) / self.grid or 1.0
+        self._cell_h = (self.extent[3] - self.extent[1]) / self.grid or 1.0
+        cells: List[List[int]] = [[] for _ in range(self.grid * self.grid)]
+        for position, zone in enumerate(zones):
+            x0, y0 = self._cell(zone.bbox[0], zone.bbox[1])
+            x1, y1 = self._cell(zone.bbox[2], zone.bbox[3])
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    cells[y * self.grid + x].append(position)
+        self._cells = [tuple(c) for c in cells]
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        x = int((lon - self.extent[0]) / self._cell_w)
+        y = int((lat - self.extent[1]) / self._cell_h)
+        return min(max(x, 0), self.grid - 1), min(max(y, 0), self.grid - 1)
+
+    def locate(self, lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+        if not self.zones or lat is None or lon is None:
+            return None
+        min_lon, min_lat, max_lon, max_lat = self.extent
+        # NaN échoue aussi à la comparaison
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return None
+        x, y = self._cell(lon, lat)
+        for position in self._cells[y * self.grid + x]:
+            zone = self.zones[position]
+            if _contains(zone, lon, lat):
+                return zone.id
+        return None
+
+    def feature_collection(self) -> Dict[str, Any]:
+        """Zones au format GeoJSON (carte): id et nom en propriétés."""
+        return {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "id": z.id, "properties": {"id": z.id, "name": z.name}, "geometry": z.geometry}
+            for z in self.zones
+        ]}
+
+
+def load_zones(path: str, grid: int = ZONES_GRID) -> ZoneIndex:
+    """Registre depuis un fichier GeoJSON; vide (avec avertissement) si absent ou illisible."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return ZoneIndex([], grid)
+    try:
+        features = json.loads(raw.decode("utf-8")).get("features") or []
+    except (ValueError, AttributeError) as e:
+        log.warning("Fichier de zones illisible, aucun rattachement", extra={"path": path, "error": str(e)})
+        return ZoneIndex([], grid)
+    zones: List[Zone] = []
+    seen = set()
+    for feature in features:
+        zone = _parse_feature(feature)
+        if zone is None or zone.id in seen:
+            log.warning("Zone ignorée (sans id, sans polygone ou en double)", extra={"path": path})
+            continue
+        seen.add(zone.id)
+        zones.append(zone)
+    return ZoneIndex(zones, grid, hashlib.sha256(raw).hexdigest())
+
+
+_cache: Dict[str, Tuple[Tuple[int, int], ZoneIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_zones() -> ZoneIndex:
+    """Registre de ZONES_FILE, rechargé quand le fichier change."""
+    try:
+        stat = os.stat(ZONES_FILE)
+        key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = (0, 0)
+    with _cache_lock:
+        cached = _cache.get(ZONES_FILE)
+        if cached is None or cached[0] != key:
+            cached = _cache[ZONES_FILE] = (key, load_zones(ZONES_FILE))
+        return cached[1]
+
+
+def backfill_zone_ids(conn: sqlite3.Connection, index: Optional[ZoneIndex] = None, chunk: int = 5000) -> int:
+    """Rattache les lignes non traitées (ou toutes si le registre a changé); retourne le nombre de lignes modifiées."""
+    index = get_zones() if index is None else index
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS zone_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            fingerprint TEXT NOT NULL,
+            tagged_max_id INTEGER NOT NULL
+        )
+    """)
+    state = conn.execute("SELECT fingerprint, tagged_max_id FROM zone_state WHERE id = 1").fetchone()
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM signalements").fetchone()[0]
+    since = state[1] if state is not None and state[0] == index.fingerprint else 0
+    if state is not None and state[0] == index.fingerprint and since >= max_id:
+        return 0
+    rows = conn.execute(
+        "SELECT id, latitude, longitude, zone_id FROM signalements WHERE id > ? AND id <= ?", (since, max_id)
+    ).fetchall()
+    updates = [(zone_id, row[0]) for row, zone_id in ((row, index.locate(row[1], row[2])) for row in rows)
+               if zone_id != row[3]]
+    for offset in range(0, len(updates), chunk):
+        conn.executemany("UPDATE signalements SET zone_id = ? WHERE id = ?", updates[offset:offset + chunk])
+    conn.execute("INSERT OR REPLACE INTO zone_state (id, fingerprint, tagged_max_id) VALUES (1, ?, ?)",
+                 (index.fingerprint, max_id))
+    return len(updates)
+
+
+def zone_state(conn: sqlite3.Connection) -> Tuple[str, int]:
+    """(empreinte du registre appliqué, dernier id rattaché)."""
+    try:
+        row = conn.execute("SELECT fingerprint, tagged_max_id FROM zone_state WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    return (row[0], row[1]) if row else ("", 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rattachement des signalements aux zones")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "./signalements.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="rattacher les signalements au registre ZONES_FILE")
+    sub.add_parser("list", help="zones du registre")
+    args = parser.parse_args()
+
+    index = get_zones()
+    if args.command == "backfill":
+        from db_schema import ensure_schema, run_backfills
+
+        with sqlite3.connect(args.db, timeout=30) as conn:
+            ensure_schema(conn)
+            run_backfills(conn)
+            counts = conn.execute("SELECT zone_id, COUNT(*) FROM signalements GROUP BY zone_id").fetchall()
+        print(f"🗺️ {len(index)} zones ({ZONES_FILE})")
+        for zone_id, count in counts:
+            print(f"  {zone_id or 'hors zone'}: {count}")
+    else:
+        for zone in index.zones:
+            print(json.dumps({"id": zone.id, "name": zone.name, "bbox": zone.bbox}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()